@@ -3,115 +3,165 @@ Audio transcription using Gemini 2.5 Flash
 Supports microphone recording via Streamlit
 """
 from google import genai
+from google.genai import errors, types
+import httpx
+import atexit
+from concurrent.futures import Future, ThreadPoolExecutor
 import tempfile
+from typing import Optional
+import time
 import os
-from config import GEMINI_API_KEY
+from config import (
+    GEMINI_API_KEY, GEMINI_INLINE_AUDIO_MAX_BYTES, TRANSCRIPTION_MAX_ATTEMPTS,
+    TRANSCRIPTION_SEGMENT_SECONDS, TRANSCRIPTION_SEGMENT_OVERLAP_MS, TRANSCRIPTION_MAX_WORKERS,
+    TRANSCRIPTION_CACHE_SIZE, TRANSCRIPTION_CACHE_PATH, TRANSCRIPTION_CACHE_SAVE_SECONDS, AUDIO_PREPROCESSING_ENABLED,
+    TRANSCRIPTION_BACKGROUND_WORKERS
+)
+from audio_processing import (
+    pydub_available, load_audio, prepare_speech, split_audio,
+    stitch_transcripts, transcribe_segments_parallel
+)
+from transcription_cache import TranscriptionCache, audio_content_hash
+from shared_cache import shared_cache
 
 # Initialize Gemini client
 if not GEMINI_API_KEY:
     raise ValueError("GEMINI_API_KEY not configured")
 client = genai.Client(api_key=GEMINI_API_KEY)
 
+# Shared by all sessions in this process
+transcription_cache = TranscriptionCache(TRANSCRIPTION_CACHE_SIZE, TRANSCRIPTION_CACHE_PATH or None,
+                                         TRANSCRIPTION_CACHE_SAVE_SECONDS)
+atexit.register(transcription_cache.flush)
+
+# Background pool so transcription never blocks a Streamlit script run
+_background_pool = ThreadPoolExecutor(max_workers=TRANSCRIPTION_BACKGROUND_WORKERS,
+                                      thread_name_prefix="transcription")
+
+TRANSCRIPTION_PROMPT = "Please transcribe this audio file word for word. Return only the transcribed text, nothing else. Do not add any explanations or formatting."
+MODEL_NAME = "models/gemini-flash-latest"
+
+# How long to wait for an uploaded file to leave the PROCESSING state
+FILE_ACTIVE_TIMEOUT_SECONDS = 120
+
+def _audio_suffix(mime_type: str) -> str:
+    """Get a temp file suffix for an audio MIME type"""
+    suffix = ".webm"  # Default for browser recordings
+    if mime_type:
+        if "wav" in mime_type:
+            suffix = ".wav"
+        elif "mp3" in mime_type:
+            suffix = ".mp3"
+        elif "ogg" in mime_type:
+            suffix = ".ogg"
+        elif "flac" in mime_type:
+            suffix = ".flac"
+    return suffix
+
+def _upload_audio_file(audio_bytes: bytes, mime_type: str) -> types.File:
+    """
+    Upload audio through the Gemini Files API.
+
+    The SDK sends the file with the resumable upload protocol in 8 MB chunks,
+    so large recordings never travel inside a generate_content request body.
+    Waits until the file is ACTIVE before returning the handle.
+    """
+    with tempfile.NamedTemporaryFile(delete=False, suffix=_audio_suffix(mime_type)) as tmp_file:
+        tmp_file.write(audio_bytes)
+        tmp_path = tmp_file.name
+
+    try:
+        uploaded = client.files.upload(
+            file=tmp_path,
+            config=types.UploadFileConfig(mime_type=mime_type)
+        )
+    finally:
+        if os.path.exists(tmp_path):
+            try:
+                os.remove(tmp_path)
+            except:
+                pass
+
+    deadline = time.monotonic() + FILE_ACTIVE_TIMEOUT_SECONDS
+    while uploaded.state == types.FileState.PROCESSING:
+        if time.monotonic() > deadline:
+            raise Exception(f"Uploaded audio file {uploaded.name} is still processing")
+        time.sleep(1)
+        uploaded = client.files.get(name=uploaded.name)
+
+    if uploaded.state == types.FileState.FAILED:
+        raise Exception(f"Gemini failed to process uploaded audio file {uploaded.name}")
+
+    return uploaded
+
+def _is_transient(error: Exception) -> bool:
+    """True for errors worth retrying: 5xx responses, timeouts and dropped connections"""
+    if isinstance(error, errors.APIError):
+        return isinstance(error, errors.ServerError)  # 4xx (auth, quota, bad request) won't change on retry
+    return isinstance(error, (httpx.TransportError, TimeoutError, ConnectionError))
+
+def _generate_transcript(audio_content) -> str:
+    """
+    Ask Gemini for a transcript of the given audio content, retrying transient
+    failures (and empty transcripts); other errors are raised at once.
+
+    audio_content is either an inline Part or an uploaded File handle; the same
+    object is reused on every attempt so retries never re-send the audio bytes.
+    """
+    last_error = None
+    for attempt in range(TRANSCRIPTION_MAX_ATTEMPTS):
+        try:
+            response = client.models.generate_content(
+                model=MODEL_NAME,
+                contents=[TRANSCRIPTION_PROMPT, audio_content]
+            )
+            transcript = (getattr(response, "text", "") or "").strip()
+            if transcript:
+                return transcript
+            last_error = "Gemini returned empty transcript"
+        except Exception as e:
+            if not _is_transient(e):
+                raise
+            last_error = str(e)
+        if attempt < TRANSCRIPTION_MAX_ATTEMPTS - 1:
+            time.sleep(2 ** attempt)
+
+    raise Exception(f"All transcription attempts failed. Last error: {last_error}")
+
 def transcribe_audio_bytes(audio_bytes: bytes, mime_type: str = "audio/webm") -> str:
     """
     Transcribe audio bytes using Gemini 2.5 Flash
-    
+
+    Recordings up to GEMINI_INLINE_AUDIO_MAX_BYTES are sent inline. Larger
+    recordings are uploaded once through the Files API, the file handle is
+    reused for retries, and the uploaded file is deleted afterwards.
+
     Args:
         audio_bytes: Audio data as bytes
         mime_type: MIME type of audio (default: "audio/webm" for browser recordings)
-    
+
     Returns:
         Transcribed text
     """
     if not GEMINI_API_KEY:
         raise ValueError("GEMINI_API_KEY not configured. Please set GEMINI_API_KEY in your .env file.")
-    
+
     try:
-        # Save audio bytes temporarily
-        suffix = ".webm"  # Default for browser recordings
-        if mime_type:
-            if "wav" in mime_type:
-                suffix = ".wav"
-            elif "mp3" in mime_type:
-                suffix = ".mp3"
-            elif "ogg" in mime_type:
-                suffix = ".ogg"
-            elif "flac" in mime_type:
-                suffix = ".flac"
-        
-        with tempfile.NamedTemporaryFile(delete=False, suffix=suffix) as tmp_file:
-            tmp_file.write(audio_bytes)
-            tmp_path = tmp_file.name
-        
+        if len(audio_bytes) <= GEMINI_INLINE_AUDIO_MAX_BYTES:
+            return _generate_transcript(
+                types.Part.from_bytes(data=audio_bytes, mime_type=mime_type)
+            )
+
+        uploaded = _upload_audio_file(audio_bytes, mime_type)
         try:
-            # Create prompt for transcription
-            prompt = "Please transcribe this audio file word for word. Return only the transcribed text, nothing else. Do not add any explanations or formatting."
-            
-            # Generate transcription using Gemini 2.5 Flash
-            model_name = "models/gemini-flash-latest"
-            
-            # Try different methods to pass audio to Gemini
-            response = None
-            last_error = None
-            
-            # Method 1: Try using types.Part.from_bytes (new API)
-            try:
-                from google.genai import types
-                response = client.models.generate_content(
-                    model=model_name,
-                    contents=[
-                        prompt,
-                        types.Part.from_bytes(
-                            data=audio_bytes,
-                            mime_type=mime_type
-                        )
-                    ]
-                )
-            except Exception as e1:
-                last_error = str(e1)
-                # Method 2: Try passing file path as string
-                try:
-                    response = client.models.generate_content(
-                        model=model_name,
-                        contents=[prompt, tmp_path]
-                    )
-                except Exception as e2:
-                    last_error = str(e2)
-                    # Method 3: Try reading file and creating Part object
-                    try:
-                        from google.genai import types
-                        with open(tmp_path, 'rb') as f:
-                            file_bytes = f.read()
-                        response = client.models.generate_content(
-                            model=model_name,
-                            contents=[
-                                prompt,
-                                types.Part.from_bytes(
-                                    data=file_bytes,
-                                    mime_type=mime_type
-                                )
-                            ]
-                        )
-                    except Exception as e3:
-                        last_error = str(e3)
-                        raise Exception(f"All transcription methods failed. Last error: {last_error}")
-            
-            if response is None:
-                raise Exception(f"Failed to get response. Last error: {last_error}")
-            
-            transcript = (getattr(response, "text", "") or "").strip()
-            if not transcript:
-                raise Exception("Gemini returned empty transcript")
-            
-            return transcript
+            return _generate_transcript(uploaded)
         finally:
-            # Clean up temp file
-            if os.path.exists(tmp_path):
-                try:
-                    os.remove(tmp_path)
-                except:
-                    pass
-                
+            # Uploaded files expire after 48h anyway, but don't leave recordings around
+            try:
+                client.files.delete(name=uploaded.name)
+            except:
+                pass
+
     except Exception as e:
         error_details = str(e)
         # Provide more helpful error messages
@@ -124,3 +174,87 @@ def transcribe_audio_bytes(audio_bytes: bytes, mime_type: str = "audio/webm") ->
         else:
             raise Exception(f"Error transcribing audio with Gemini: {error_details}")
 
+def _decode_audio(audio_bytes: bytes, mime_type: str, preprocess: bool):
+    """
+    Decode the recording once for preprocessing and segmentation (with
+    preprocess, already trimmed and downsampled); None if it can't be decoded
+    locally (e.g. ffmpeg not installed for webm).
+    """
+    if not pydub_available():
+        return None
+    try:
+        audio = load_audio(audio_bytes, mime_type)
+        return prepare_speech(audio) if preprocess else audio
+    except Exception:
+        return None
+
+def transcribe_audio_segmented(audio_bytes: bytes, mime_type: str = "audio/webm",
+                               max_workers: int = TRANSCRIPTION_MAX_WORKERS,
+                               preprocess: bool = AUDIO_PREPROCESSING_ENABLED,
+                               user_id: Optional[str] = None) -> str:
+    """
+    Transcribe a long recording as parallel segments
+
+    The audio is split on silence into ~TRANSCRIPTION_SEGMENT_SECONDS segments,
+    which are transcribed concurrently (at most max_workers Gemini calls in
+    flight) and stitched back together in order. Short recordings, or audio
+    that can't be decoded locally, go through transcribe_audio_bytes as one clip.
+    Audio that was transcribed before (same content hash) is served from
+    transcription_cache (or, with user_id, the user's shared-cache namespace)
+    without calling Gemini. With preprocess, silence is
+    trimmed and the audio downsampled to mono speech quality before upload.
+
+    Args:
+        audio_bytes: Audio data as bytes
+        mime_type: MIME type of audio (default: "audio/webm" for browser recordings)
+        max_workers: Maximum number of segments transcribed at once
+        preprocess: Trim silence and downsample before upload
+
+    Returns:
+        Transcribed text
+    """
+    audio_hash = audio_content_hash(audio_bytes)
+    cached = transcription_cache.get(audio_hash)
+    if cached is not None:
+        return cached
+    if user_id:
+        # Transcribed in another replica (shared cache), in the user's namespace
+        cached = shared_cache.get("transcripts", audio_hash, user_id=user_id)
+        if cached is not None:
+            transcription_cache.set(audio_hash, cached)
+            return cached
+
+    segments = None
+    audio = _decode_audio(audio_bytes, mime_type, preprocess)
+    if audio is not None:
+        try:
+            segments = split_audio(audio, segment_ms=TRANSCRIPTION_SEGMENT_SECONDS * 1000,
+                                   overlap_ms=TRANSCRIPTION_SEGMENT_OVERLAP_MS)
+            if len(segments) < 2 and preprocess and len(segments[0][0]) < len(audio_bytes):
+                # One clip: upload the preprocessed encoding when it's smaller
+                audio_bytes, mime_type = segments[0]
+        except Exception:
+            # Encoding failed - fall back to a single request with the original bytes
+            segments = None
+
+    if not segments or len(segments) < 2:
+        transcript = transcribe_audio_bytes(audio_bytes, mime_type)
+    else:
+        parts = transcribe_segments_parallel(segments, transcribe_audio_bytes, max_workers)
+        transcript = stitch_transcripts(parts)
+
+    transcription_cache.set(audio_hash, transcript)
+    if user_id:
+        shared_cache.set("transcripts", audio_hash, transcript, user_id=user_id, ttl=24 * 3600)
+    return transcript
+
+def submit_transcription(audio_bytes: bytes, mime_type: str = "audio/webm",
+                         user_id: Optional[str] = None) -> Future:
+    """
+    Transcribe audio on the background worker pool
+
+    Returns a Future resolving to the transcript (or raising the transcription
+    error). The caller keeps the Future in session state and polls it; the
+    worker thread never touches Streamlit state itself.
+    """
+    return _background_pool.submit(transcribe_audio_segmented, audio_bytes, mime_type, user_id=user_id)
@@ -0,0 +1,481 @@
+"""
+Local performance benchmarks for Skkadoosh
+Runs without Supabase, Gemini or SMTP - external services are replaced by local fakes.
+
+Usage:
+    python benchmark.py                          # run all benchmarks
+    python benchmark.py segmented                # run one benchmark by name
+    python benchmark.py preprocess a.webm b.wav  # extra arguments are passed to the benchmark
+"""
+import sys
+import time
+
+def _timed(fn, *args, **kwargs):
+    """Run fn and return (result, elapsed_ms)"""
+    start = time.perf_counter()
+    result = fn(*args, **kwargs)
+    return result, (time.perf_counter() - start) * 1000
+
+def _synthetic_memo(minutes: int):
+    """Build a WAV voice-memo stand-in: 8s tone 'sentences' separated by 0.8s pauses"""
+    from pydub import AudioSegment
+    from pydub.generators import Sine
+
+    sentence = Sine(220).to_audio_segment(duration=8000, volume=-12).set_channels(1).set_frame_rate(16000)
+    pause = AudioSegment.silent(duration=800, frame_rate=16000)
+    audio = AudioSegment.empty()
+    while len(audio) < minutes * 60 * 1000:
+        audio += sentence + pause
+    return audio
+
+class FakeGemini:
+    """Stand-in for Gemini transcription: latency grows with clip length"""
+
+    def __init__(self, base_latency_s: float = 0.05, latency_per_audio_s: float = 0.005):
+        self.base_latency_s = base_latency_s
+        self.latency_per_audio_s = latency_per_audio_s
+        self.calls = 0
+
+    def transcribe(self, audio_bytes: bytes, mime_type: str) -> str:
+        # 16 kHz mono 16-bit WAV = 32000 bytes per second
+        audio_seconds = len(audio_bytes) / 32000
+        time.sleep(self.base_latency_s + audio_seconds * self.latency_per_audio_s)
+        self.calls += 1
+        return f"segment {self.calls} of the memo"
+
+def bench_segmented():
+    """Parallel segmented transcription of a 10-minute memo against a fake Gemini"""
+    import io
+    from audio_processing import segment_audio, transcribe_segments_parallel
+
+    buf = io.BytesIO()
+    _synthetic_memo(10).export(buf, format="wav")
+    audio_bytes = buf.getvalue()
+
+    segments, split_ms = _timed(segment_audio, audio_bytes, "audio/wav", 60000, 1500)
+    print(f"  split 10 min memo into {len(segments)} segments in {split_ms:.0f} ms")
+
+    fake = FakeGemini()
+    _, serial_ms = _timed(fake.transcribe, audio_bytes, "audio/wav")
+    print(f"  single request: {serial_ms:.0f} ms")
+    for workers in (1, 2, 4, 8):
+        _, ms = _timed(transcribe_segments_parallel, segments, FakeGemini().transcribe, workers)
+        print(f"  {workers} worker(s): {ms:.0f} ms")
+
+def bench_preprocess(*paths):
+    """Bytes and milliseconds saved per clip by silence trimming + downsampling"""
+    import io
+    import os
+    from pydub import AudioSegment
+    from audio_processing import preprocess_audio
+
+    clips = []
+    for path in paths:
+        with open(path, "rb") as f:
+            clips.append((os.path.basename(path), f.read(), "audio/" + path.rsplit(".", 1)[-1]))
+    if not clips:
+        # Browser-like clip: 48 kHz stereo with 2s of silence before and 3s after speaking
+        speech = _synthetic_memo(1)[:20000].set_frame_rate(48000).set_channels(2)
+        clip = AudioSegment.silent(2000, 48000).set_channels(2) + speech + AudioSegment.silent(3000, 48000).set_channels(2)
+        buf = io.BytesIO()
+        clip.export(buf, format="wav")
+        clips.append(("synthetic 25s 48kHz stereo", buf.getvalue(), "audio/wav"))
+
+    uplink_bytes_per_ms = 1_000_000 / 8 / 1000  # 1 Mbit/s mobile uplink
+    for name, audio_bytes, mime_type in clips:
+        original_ms = len(AudioSegment.from_file(io.BytesIO(audio_bytes), format=mime_type.split("/")[1]))
+        (processed, processed_mime), cost_ms = _timed(preprocess_audio, audio_bytes, mime_type)
+        processed_ms = len(AudioSegment.from_file(io.BytesIO(processed), format=processed_mime.split("/")[1]))
+        saved_bytes = len(audio_bytes) - len(processed)
+        print(f"  {name}: {len(audio_bytes):,} -> {len(processed):,} bytes ({processed_mime}), "
+              f"saved {saved_bytes:,} bytes")
+        print(f"    audio trimmed {original_ms - processed_ms} ms, preprocessing took {cost_ms:.0f} ms, "
+              f"upload saved ~{saved_bytes / uplink_bytes_per_ms - cost_ms:.0f} ms at 1 Mbit/s")
+
+def bench_datetime():
+    """normalize_datetime_to_timezone over 100k ISO strings, plus batch plan normalization"""
+    import random
+    from datetime_normalization import normalize_datetime_to_timezone, normalize_plan_datetimes
+
+    random.seed(0)
+    suffixes = ["Z", "-05:00", "+00:00", ".000Z", ""]
+    values = [
+        f"2026-{random.randint(1, 12):02d}-{random.randint(1, 28):02d}T"
+        f"{random.randint(0, 23):02d}:{random.choice((0, 15, 30, 45)):02d}:00{random.choice(suffixes)}"
+        for _ in range(100_000)
+    ]
+    for timezone in ("America/New_York", "Asia/Kolkata"):
+        _, ms = _timed(lambda: [normalize_datetime_to_timezone(v, timezone) for v in values])
+        print(f"  {timezone}: 100k strings in {ms:.0f} ms ({ms / 100:.2f} us/string)")
+
+    plan = {"tasks_to_add": [{"title": f"task {i}", "due_date": values[i], "reminder_time": values[-i]}
+                             for i in range(1, 51)]}
+    _, ms = _timed(lambda: [normalize_plan_datetimes(plan, "America/New_York") for _ in range(1000)])
+    print(f"  1000 plans x 50 tasks: {ms:.0f} ms ({ms / 1000:.3f} ms/plan)")
+
+def _synthetic_task_rows(count: int, seed: int = 0):
+    """PostgREST-shaped task rows with realistic titles and timestamps"""
+    import random
+    import uuid
+    from datetime import datetime, timedelta
+    import pytz
+
+    random.seed(seed)
+    words = ["buy", "call", "email", "finish", "review", "book", "pay", "send", "plan", "fix",
+             "groceries", "mom", "report", "slides", "dentist", "rent", "invoice", "trip", "bug", "deck"]
+    base = datetime(2026, 1, 1, tzinfo=pytz.UTC)
+    rows = []
+    for i in range(count):
+        created = base + timedelta(minutes=random.randint(0, 500_000))
+        rows.append({
+            "id": str(uuid.UUID(int=random.getrandbits(128))),
+            "user_id": "00000000-0000-0000-0000-000000000001",
+            "title": " ".join(random.choice(words) for _ in range(random.randint(2, 5))),
+            "description": "",
+            "due_date": (created + timedelta(hours=random.randint(-48, 24 * 60))).isoformat() if random.random() < 0.9 else None,
+            "priority": random.choice(["p0", "high", "medium", "low"]),
+            "reminder_time": None,
+            "status": random.choice(["pending"] * 6 + ["snoozed", "completed", "completed"]),
+            "snooze_until": None,
+            "created_at": created.isoformat(),
+            "updated_at": created.isoformat(),
+            "completed_at": None,
+        })
+    return rows
+
+def bench_task_memory():
+    """Memory and attribute access of 50k cached tasks: PostgREST dicts vs Task objects"""
+    import json
+    import tracemalloc
+    from task_model import Task
+
+    rows = _synthetic_task_rows(50_000)
+    payload = json.dumps(rows)
+    # Decode from JSON like the PostgREST client does, so every string is a separate object
+    for label, build in (("dict rows", lambda: json.loads(payload)),
+                         ("Task objects", lambda: [Task.from_record(r) for r in json.loads(payload)])):
+        tracemalloc.start()
+        tasks = build()
+        size, _ = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        print(f"  {label}: {size / len(tasks):.0f} bytes/task")
+
+    def read_dicts(dicts):
+        for _ in range(10):
+            for d in dicts:
+                d.get("status"), d.get("priority"), d.get("due_date")
+
+    def read_tasks(tasks):
+        for _ in range(10):
+            for t in tasks:
+                t.status, t.priority, t.due_ts
+
+    _, ms = _timed(read_dicts, json.loads(payload))
+    print(f"  dict .get() x 3, 500k reads: {ms:.0f} ms")
+    _, ms = _timed(read_tasks, [Task.from_record(r) for r in rows])
+    print(f"  Task attributes x 3, 500k reads: {ms:.0f} ms")
+
+def bench_views():
+    """Today/Week/Upcoming/Completed membership + counts for 100k tasks: per-view loop vs columnar"""
+    from task_model import Task, Status
+    from task_columns import TaskColumns, bucket_views, view_counts
+    from utils import filter_tasks_by_view
+
+    tasks = [Task.from_record(r) for r in _synthetic_task_rows(100_000)]
+    timezone = "America/New_York"
+
+    def loop_all_views():
+        views = {view: filter_tasks_by_view(tasks, view, timezone) for view in ("today", "week", "upcoming")}
+        views["completed"] = [t for t in tasks if t.status == Status.COMPLETED]
+        return {view: len(members) for view, members in views.items()}
+
+    loop_counts, loop_ms = _timed(loop_all_views)
+    print(f"  per-view loop (4 passes): {loop_ms:.0f} ms")
+    columns, build_ms = _timed(TaskColumns, tasks)
+    print(f"  build columns (once per fetch): {build_ms:.0f} ms")
+    buckets, bucket_ms = _timed(bucket_views, columns, timezone)
+    print(f"  vectorized bucketing, all views: {bucket_ms:.1f} ms")
+    _, sorted_ms = _timed(bucket_views, columns, timezone, True)
+    print(f"  vectorized bucketing + due/priority sort: {sorted_ms:.1f} ms")
+    assert view_counts(buckets) == loop_counts, "columnar and loop results differ"
+
+def bench_due_index():
+    """Due-date queries over 50k cached tasks: scan + sort vs sorted DueDateIndex"""
+    import random
+    from task_model import Task, due_sort_key
+    from task_cache import DueDateIndex
+
+    tasks = [Task.from_record(r) for r in _synthetic_task_rows(50_000)]
+    cutoff = sorted(t.due_ts for t in tasks if t.due_ts is not None)[len(tasks) // 4]
+
+    def scan_ordered():
+        active = [t for t in tasks if t.is_open]
+        active.sort(key=due_sort_key)
+        return active
+
+    def scan_before():
+        return sorted((t for t in tasks if t.is_open and t.due_ts is not None and t.due_ts < cutoff), key=due_sort_key)
+
+    index, build_ms = _timed(DueDateIndex, tasks)
+    print(f"  build index (once per fetch): {build_ms:.0f} ms")
+    for label, scan, query in (("all open by due date (update email)", scan_ordered, index.ordered),
+                               ("due before cutoff (daily email)", scan_before, lambda: index.due_before(cutoff)),
+                               ("next 20 due", lambda: scan_ordered()[:20], lambda: index.next_due(20))):
+        expected, scan_ms = _timed(scan)
+        result, query_ms = _timed(query)
+        assert [t.due_ts for t in result] == [t.due_ts for t in expected], label
+        print(f"  {label}: scan+sort {scan_ms:.1f} ms, index {query_ms:.2f} ms")
+
+    random.seed(1)
+    changed = random.sample(tasks, 1000)
+    def mutate():
+        for task in changed:
+            task.due_ts = (task.due_ts or cutoff) + 3600
+            index.add(task)
+    _, ms = _timed(mutate)
+    print(f"  1000 due-date updates: {ms:.1f} ms ({ms:.3f} us each)")
+
+def bench_matcher():
+    """Resolve 50 spoken references against a user with 10k open tasks: linear scan vs TaskMatcher"""
+    import random
+    from task_model import Task
+    from task_matcher import TaskMatcher
+
+    tasks = [Task.from_record(r) for r in _synthetic_task_rows(12_000) if r["status"] != "completed"][:10_000]
+    random.seed(2)
+    references = [" ".join(random.choice(t.title.split()) for _ in range(2)) for t in random.sample(tasks, 45)]
+    references += ["the dentist", "groc", "invoice for the trip", "pay rent tomorrow", "reveiw slides"]
+
+    def linear_scan(reference):
+        # The pre-index implementation of match_task_id_by_reference
+        reference_lower = reference.lower().strip()
+        best_match, best_score = None, 0
+        for task in tasks:
+            title = task.title.lower()
+            reference_words, title_words = set(reference_lower.split()), set(title.split())
+            if reference_words.intersection(title_words):
+                score = len(reference_words.intersection(title_words)) / max(len(reference_words), len(title_words))
+                if score > best_score:
+                    best_score, best_match = score, task.id
+            if reference_lower in title or title in reference_lower:
+                score = min(len(reference_lower), len(title)) / max(len(reference_lower), len(title))
+                if score > best_score:
+                    best_score, best_match = score, task.id
+        return best_match if best_match and best_score > 0.3 else None
+
+    expected, scan_ms = _timed(lambda: [linear_scan(r) for r in references])
+    print(f"  linear scan: {scan_ms:.0f} ms ({scan_ms / len(references):.1f} ms/reference)")
+    matcher, build_ms = _timed(TaskMatcher, tasks)
+    print(f"  build index (once per session): {build_ms:.0f} ms")
+    result, match_ms = _timed(lambda: [matcher.match(r) for r in references])
+    print(f"  indexed match: {match_ms:.0f} ms ({match_ms / len(references):.2f} ms/reference)")
+    assert result == expected, "indexed and linear matches differ"
+    _, rank_ms = _timed(lambda: [matcher.rank(r, 5) for r in references])
+    print(f"  ranked top-5 with trigram similarity: {rank_ms / len(references):.2f} ms/reference")
+    _, update_ms = _timed(lambda: [matcher.add(t) for t in tasks[:1000]])
+    print(f"  1000 title updates: {update_ms:.0f} ms")
+
+def bench_embeddings():
+    """Semantic top-5 over 10k open task titles with the local hashing embedder"""
+    from task_model import Task
+    from task_embeddings import EmbeddingCache, EmbeddingIndex, HashingEmbedder
+
+    tasks = [Task.from_record(r) for r in _synthetic_task_rows(10_000)]
+    embedder, cache = HashingEmbedder(256), EmbeddingCache()
+    index = EmbeddingIndex(embedder, tasks, cache)
+    _, cold_ms = _timed(index.top_k, "review the slides", 5)
+    print(f"  first lookup, every title embedded: {cold_ms:.0f} ms ({len(cache)} distinct titles)")
+    _, warm_ms = _timed(EmbeddingIndex(embedder, tasks, cache).top_k, "review the slides", 5)
+    print(f"  first lookup, titles cached (new session): {warm_ms:.0f} ms")
+    references = ["review the slides", "email mom about the trip", "pay the invoice", "fix that bug"] * 25
+    _, query_ms = _timed(lambda: [index.top_k(r, 5) for r in references])
+    print(f"  cosine top-5: {query_ms / len(references):.2f} ms/reference")
+    _, update_ms = _timed(lambda: [index.add(t) for t in tasks[:1000]])
+    print(f"  1000 re-indexed tasks (queued): {update_ms:.1f} ms")
+
+def bench_page_weight(*revisions):
+    """Inline <style>/<script> bytes each page sends per rerun (pass git revisions to compare)"""
+    import ast
+    import glob
+    import subprocess
+    from theme import theme_tag
+
+    def inline_asset_bytes(source: str) -> int:
+        total = 0
+        for node in ast.walk(ast.parse(source)):
+            if not isinstance(node, ast.Call):
+                continue
+            name = getattr(node.func, "attr", getattr(node.func, "id", ""))
+            if name == "apply_theme":
+                total += len(theme_tag().encode("utf-8"))
+            elif name in ("markdown", "html") and node.args and isinstance(node.args[0], ast.Constant):
+                body = str(node.args[0].value)
+                if "<style" in body or "<script" in body:
+                    total += len(body.encode("utf-8"))
+        return total
+
+    pages = ["app.py"] + sorted(glob.glob("pages/*.py"))
+    for revision in (None,) + revisions:
+        print(f"  {revision or 'working tree'}:")
+        for page in pages:
+            if revision:
+                source = subprocess.run(["git", "show", f"{revision}:{page}"], capture_output=True, text=True).stdout
+            else:
+                with open(page, encoding="utf-8") as f:
+                    source = f.read()
+            try:
+                print(f"    {page}: {inline_asset_bytes(source):,} bytes")
+            except SyntaxError:
+                print(f"    {page}: (does not parse)")
+
+def bench_email_render():
+    """Digest HTML for 2,000 users x 25 tasks: per-task f-strings vs compiled templates + fragment cache"""
+    from datetime import datetime
+    from task_model import Task, Status
+    from email_templates import FragmentCache, render_email_html
+
+    rows = _synthetic_task_rows(50_000, seed=3)
+    for i, row in enumerate(rows):
+        row["description"] = "Remember the receipt" if i % 4 == 0 else ""
+    users = [[Task.from_record(r) for r in rows[i:i + 25]] for i in range(0, len(rows), 25)]
+    task_count = len(rows)
+
+    def legacy_task_html(task):
+        # The pre-template format_task_html
+        colors = {"p0": "#FF0000", "high": "#FF6B6B", "medium": "#ff4b4b", "low": "#FFB3BA"}
+        priority = task.priority.label
+        color = colors.get(priority, "#ff4b4b")
+        if task.due_ts is not None:
+            local_tz = datetime.now().astimezone().tzinfo
+            due_date_str = datetime.fromtimestamp(task.due_ts, local_tz).strftime("%b %d, %Y %I:%M %p")
+        elif task.due_invalid:
+            due_date_str = 'Unknown date'
+        else:
+            due_date_str = 'No due date'
+        status_badge = "✓" if task.status == Status.COMPLETED else "○"
+        return f"""
+    <div style="margin: 10px 0; padding: 10px; border-left: 4px solid {color}; background-color: #ffffff;">
+        <div style="font-weight: bold; color: #333333;">{status_badge} {task.title or 'Untitled'}</div>
+        {f'<div style="color: #454240; font-size: 0.9em; margin-top: 5px;">{task.description}</div>' if task.description else ''}
+        <div style="color: #454240; font-size: 0.85em; margin-top: 5px;">
+            Priority: {priority.upper()} | Due: {due_date_str}
+        </div>
+    </div>
+    """
+
+    def rate(ms):
+        return f"{ms:.0f} ms ({task_count / ms * 1000:,.0f} tasks/s)"
+
+    legacy, legacy_ms = _timed(lambda: [[legacy_task_html(t) for t in tasks] for tasks in users])
+    print(f"  legacy f-strings, tasks only: {rate(legacy_ms)}")
+    _, uncached_ms = _timed(lambda: [render_email_html("Digest", "Today", tasks, cache=None) for tasks in users])
+    print(f"  templates, no fragment cache (full emails): {rate(uncached_ms)}")
+    cache = FragmentCache(len(rows))
+    _, cold_ms = _timed(lambda: [render_email_html("Digest", "Today", tasks, cache=cache) for tasks in users])
+    print(f"  templates, cold cache (full emails): {rate(cold_ms)}")
+    for tasks in users[::10]:
+        tasks[0] = Task.from_record(dict(rows[0], id=tasks[0].id, title="changed title", updated_at=None))
+    cache.hits = cache.misses = 0
+    _, warm_ms = _timed(lambda: [render_email_html("Digest", "Today", tasks, cache=cache) for tasks in users])
+    print(f"  templates, next run with {cache.misses} changed tasks: {rate(warm_ms)}")
+    assert render_email_html("", "", users[1], cache=None).count("border-left") == 25
+    assert "".join(legacy[1]) in render_email_html("", "", users[1], cache=None), "template output differs"
+
+def _smtp_sink():
+    """Minimal local SMTP server that accepts and discards mail; returns its port"""
+    import socketserver
+    import threading
+
+    class Handler(socketserver.StreamRequestHandler):
+        def handle(self):
+            self.wfile.write(b"220 sink\r\n")
+            in_data = False
+            for line in self.rfile:
+                if in_data:
+                    if line == b".\r\n":
+                        in_data = False
+                        self.wfile.write(b"250 OK\r\n")
+                    continue
+                command = line[:4].upper()
+                if command == b"DATA":
+                    in_data = True
+                    self.wfile.write(b"354 go\r\n")
+                elif command == b"QUIT":
+                    self.wfile.write(b"221 bye\r\n")
+                    return
+                else:
+                    self.wfile.write(b"250 OK\r\n")
+
+    server = socketserver.ThreadingTCPServer(("127.0.0.1", 0), Handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server.server_address[1]
+
+def bench_email_size():
+    """
+    Update email with 25 active tasks: HTML duplicated as the text part vs
+    rendered plain text, and the delta email listing only the one changed task
+    """
+    import smtplib
+    from email.mime.multipart import MIMEMultipart
+    from email.mime.text import MIMEText
+    from task_model import Task
+    from email_templates import render_email_html, render_email_text, render_sections_html, render_sections_text
+    from email_service import build_email_message, summarize_changes
+
+    tasks = [Task.from_record(r) for r in _synthetic_task_rows(25, seed=4)]
+    heading, intro = "Your Task List Has Been Updated", "Here's your complete updated task list:"
+    html_body = render_email_html(heading, intro, tasks, "America/New_York")
+
+    def legacy_message():
+        # The pre-text-renderer send_email: the HTML doubles as the plain part
+        msg = MIMEMultipart('alternative')
+        msg['Subject'], msg['To'] = heading, "user@example.com"
+        msg.attach(MIMEText(html_body, 'plain'))
+        msg.attach(MIMEText(html_body, 'html'))
+        return msg
+
+    def message():
+        return build_email_message("user@example.com", heading, html_body,
+                                   render_email_text(heading, intro, tasks, "America/New_York"))
+
+    def delta_message():
+        changes = {"completed": tasks[:1]}
+        sections = [("Completed", tasks[:1])]
+        delta_intro = summarize_changes(changes, len(tasks) - 1)
+        return build_email_message("user@example.com", heading,
+                                   render_sections_html(heading, delta_intro, sections, "America/New_York"),
+                                   render_sections_text(heading, delta_intro, sections, "America/New_York"))
+
+    port = _smtp_sink()
+    for label, build in (("html as text part", legacy_message), ("rendered text part", message),
+                         ("changed task only", delta_message)):
+        size = len(build().as_bytes())
+        with smtplib.SMTP("127.0.0.1", port) as server:
+            _, send_ms = _timed(lambda: [server.send_message(build(), "app@example.com", ["user@example.com"])
+                                         for _ in range(200)])
+        print(f"  {label}: {size:,} bytes/message, {send_ms / 200:.2f} ms/message over loopback SMTP")
+
+BENCHMARKS = {
+    "segmented": bench_segmented,
+    "preprocess": bench_preprocess,
+    "datetime": bench_datetime,
+    "task_memory": bench_task_memory,
+    "views": bench_views,
+    "due_index": bench_due_index,
+    "matcher": bench_matcher,
+    "embeddings": bench_embeddings,
+    "page_weight": bench_page_weight,
+    "email_render": bench_email_render,
+    "email_size": bench_email_size,
+}
+
+if __name__ == "__main__":
+    selected = sys.argv[1:2] or list(BENCHMARKS)
+    for name in selected:
+        if name not in BENCHMARKS:
+            print(f"Unknown benchmark: {name}. Available: {', '.join(BENCHMARKS)}")
+            sys.exit(1)
+        print(f"[{name}] {BENCHMARKS[name].__doc__}")
+        BENCHMARKS[name](*sys.argv[2:])
+        print()
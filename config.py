@@ -19,5 +19,70 @@ SMTP_PORT = int(os.getenv("SMTP_PORT", "587"))
 SMTP_EMAIL = os.getenv("SMTP_EMAIL", "")
 SMTP_PASSWORD = os.getenv("SMTP_PASSWORD", "")
 
+# Rendered task fragments kept for emails (re-rendered only when a task changes)
+EMAIL_FRAGMENT_CACHE_SIZE = int(os.getenv("EMAIL_FRAGMENT_CACHE_SIZE", "20000"))
+
 # Timezone - will be detected from browser, default to UTC for server operations
 TIMEZONE = "UTC"  # Default for server-side operations, user timezone detected from browser
+
+# Audio transcription
+# Recordings larger than this are uploaded through the Gemini Files API instead of inline
+GEMINI_INLINE_AUDIO_MAX_BYTES = int(os.getenv("GEMINI_INLINE_AUDIO_MAX_BYTES", str(14 * 1024 * 1024)))
+TRANSCRIPTION_MAX_ATTEMPTS = int(os.getenv("TRANSCRIPTION_MAX_ATTEMPTS", "3"))
+# Long recordings are split on silence into ~TRANSCRIPTION_SEGMENT_SECONDS segments transcribed in parallel
+TRANSCRIPTION_SEGMENT_SECONDS = int(os.getenv("TRANSCRIPTION_SEGMENT_SECONDS", "60"))
+TRANSCRIPTION_SEGMENT_OVERLAP_MS = int(os.getenv("TRANSCRIPTION_SEGMENT_OVERLAP_MS", "1500"))
+TRANSCRIPTION_MAX_WORKERS = int(os.getenv("TRANSCRIPTION_MAX_WORKERS", "4"))
+# Transcripts are cached by audio content hash; set TRANSCRIPTION_CACHE_PATH to persist them to disk
+TRANSCRIPTION_CACHE_SIZE = int(os.getenv("TRANSCRIPTION_CACHE_SIZE", "256"))
+TRANSCRIPTION_CACHE_PATH = os.getenv("TRANSCRIPTION_CACHE_PATH", "")
+# Minimum seconds between rewrites of that file (new transcripts are also written at exit)
+TRANSCRIPTION_CACHE_SAVE_SECONDS = float(os.getenv("TRANSCRIPTION_CACHE_SAVE_SECONDS", "30"))
+# Trim silence and downsample recordings locally before sending them to Gemini
+AUDIO_PREPROCESSING_ENABLED = os.getenv("AUDIO_PREPROCESSING_ENABLED", "true").lower() == "true"
+# Number of recordings transcribed at once in the background (per app process)
+TRANSCRIPTION_BACKGROUND_WORKERS = int(os.getenv("TRANSCRIPTION_BACKGROUND_WORKERS", "4"))
+
+# Transcript log
+# Transcripts are queued and inserted in batches of up to TRANSCRIPT_BATCH_SIZE rows,
+# at most TRANSCRIPT_FLUSH_SECONDS after the first queued one
+TRANSCRIPT_BATCH_SIZE = int(os.getenv("TRANSCRIPT_BATCH_SIZE", "20"))
+TRANSCRIPT_FLUSH_SECONDS = float(os.getenv("TRANSCRIPT_FLUSH_SECONDS", "5"))
+# JSONL file where rows that couldn't be inserted are kept and retried (plaintext user input:
+# put it outside the repo, readable only by the app; empty, the default, keeps them in memory only)
+TRANSCRIPT_SPILL_PATH = os.getenv("TRANSCRIPT_SPILL_PATH", "")
+
+# Shared cache for task lists, Gemini plans and transcripts: empty caches in process,
+# a redis:// or rediss:// URL shares it across app replicas (any Redis-protocol server)
+SHARED_CACHE_URL = os.getenv("SHARED_CACHE_URL", "")
+SHARED_CACHE_TTL_SECONDS = int(os.getenv("SHARED_CACHE_TTL_SECONDS", "300"))
+SHARED_CACHE_MAX_ENTRIES = int(os.getenv("SHARED_CACHE_MAX_ENTRIES", "10000"))
+# Gemini plans are reused only for the same input, task list and minute
+PLAN_CACHE_TTL_SECONDS = int(os.getenv("PLAN_CACHE_TTL_SECONDS", "60"))
+
+# Tasks
+# Seconds before the per-session task cache is refetched (mutations update it in place)
+TASK_CACHE_TTL_SECONDS = int(os.getenv("TASK_CACHE_TTL_SECONDS", "300"))
+# Task rows rendered per view before "Load more" (keeps widget count per rerun bounded)
+TASK_PAGE_SIZE = int(os.getenv("TASK_PAGE_SIZE", "50"))
+# Set a SQLite file path to keep tasks in a local offline-first store synced with Supabase in the background
+TASK_STORE_PATH = os.getenv("TASK_STORE_PATH", "")
+# Seconds of changes re-pulled on each store sync, for writes committed after a later one was pulled
+TASK_SYNC_OVERLAP_SECONDS = int(os.getenv("TASK_SYNC_OVERLAP_SECONDS", "60"))
+# Task changes reach the user's other sessions through "memory" (this process only)
+# or "supabase" (Supabase Realtime; every change, so the task cache is not refetched for age while the channel is live)
+TASK_REALTIME_BACKEND = os.getenv("TASK_REALTIME_BACKEND", "memory")
+# Seconds between checks for changes from other sessions while the dashboard is open
+TASK_REALTIME_POLL_SECONDS = float(os.getenv("TASK_REALTIME_POLL_SECONDS", "2"))
+# Background threads writing optimistic task changes (done/delete/snooze/edit) to the database
+TASK_WRITE_WORKERS = int(os.getenv("TASK_WRITE_WORKERS", "4"))
+# Paraphrased task references are matched by title embeddings: "gemini", or "hashing" (local, offline)
+TASK_EMBEDDING_BACKEND = os.getenv("TASK_EMBEDDING_BACKEND", "gemini")
+TASK_EMBEDDING_DIMENSIONS = int(os.getenv("TASK_EMBEDDING_DIMENSIONS", "768"))
+TASK_EMBEDDING_MIN_SIMILARITY = float(os.getenv("TASK_EMBEDDING_MIN_SIMILARITY", "0.75"))
+# Longest a lookup waits for new titles to be embedded (then no semantic match; they're ready next time)
+TASK_EMBEDDING_TIMEOUT_SECONDS = float(os.getenv("TASK_EMBEDDING_TIMEOUT_SECONDS", "3"))
+# Set a file path (.npz) to persist title vectors across restarts
+TASK_EMBEDDING_CACHE_PATH = os.getenv("TASK_EMBEDDING_CACHE_PATH", "")
+# Minimum seconds between rewrites of that file (new vectors are also written at exit)
+TASK_EMBEDDING_SAVE_SECONDS = float(os.getenv("TASK_EMBEDDING_SAVE_SECONDS", "30"))
@@ -4,10 +4,28 @@ Uses Supabase Auth for authentication
 """
 from supabase import create_client, Client
 import streamlit as st
-from config import SUPABASE_URL, SUPABASE_KEY
-from datetime import datetime
+from config import SUPABASE_URL, SUPABASE_KEY, TASK_CACHE_TTL_SECONDS, TASK_STORE_PATH, TASK_SYNC_OVERLAP_SECONDS
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+import threading
+import time
 from typing import List, Dict, Optional
 import pytz
+from task_model import Task
+from task_cache import TaskCache
+from task_store import TaskStore
+from task_realtime import get_task_feed, publish_task_change, token_expiry
+from shared_cache import shared_cache
+
+# Columns fetched for task lists; description is loaded lazily unless requested
+TASK_LIST_COLUMNS = "id,title,due_date,priority,reminder_time,status,snooze_until,created_at,updated_at,completed_at"
+
+# Offline-first local task store (None when TASK_STORE_PATH is unset: tasks are read/written in Supabase directly)
+task_store = TaskStore(TASK_STORE_PATH) if TASK_STORE_PATH else None
+# One sync at a time; requests for a user already queued are coalesced (latest token wins)
+_sync_pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix="task-sync")
+_sync_tokens: Dict[str, Optional[str]] = {}
+_sync_lock = threading.Lock()
 
 # Initialize anonymous Supabase client (for auth operations)
 @st.cache_resource
@@ -18,20 +36,41 @@ def get_supabase_client() -> Client:
     return create_client(SUPABASE_URL, SUPABASE_KEY)
 
 # Get authenticated Supabase client (for DB operations with RLS)
-def get_authenticated_client() -> Client:
-    """Get authenticated Supabase client with access token"""
+def get_authenticated_client(access_token: Optional[str] = None) -> Client:
+    """
+    Get authenticated Supabase client with access token
+    
+    Pass access_token explicitly when calling from a background thread, where
+    st.session_state is not available.
+    """
     if not SUPABASE_URL or not SUPABASE_KEY:
         raise ValueError("Supabase URL and KEY must be set in environment variables")
     
     client = create_client(SUPABASE_URL, SUPABASE_KEY)
     
     # Apply the JWT token for authenticated requests (this enables RLS)
-    if "sb_access_token" in st.session_state and st.session_state["sb_access_token"]:
+    if access_token is None and "sb_access_token" in st.session_state:
+        access_token = st.session_state["sb_access_token"]
+    if access_token:
         # Set the auth header for postgrest requests
-        client.postgrest.auth(st.session_state["sb_access_token"])
+        client.postgrest.auth(access_token)
     
     return client
 
+def refresh_session_token(margin_seconds: float = 60):
+    """Refresh the session's access token when it expires within margin_seconds"""
+    expires = token_expiry(st.session_state.get("sb_access_token"))
+    refresh_token = st.session_state.get("sb_refresh_token")
+    if expires is None or not refresh_token or expires - time.time() > margin_seconds:
+        return
+    try:
+        response = get_supabase_client().auth.refresh_session(refresh_token)
+        if response.session:
+            st.session_state["sb_access_token"] = response.session.access_token
+            st.session_state["sb_refresh_token"] = response.session.refresh_token
+    except Exception:
+        pass  # The realtime feed isn't live with an expired token, so the task cache falls back to its TTL
+
 # Authentication functions
 def sign_up(email: str, password: str) -> Dict:
     """Sign up a new user using Supabase Auth"""
@@ -49,7 +88,9 @@ def sign_up(email: str, password: str) -> Dict:
             st.session_state["sb_refresh_token"] = response.session.refresh_token
             st.session_state["sb_user"] = {
                 "id": response.user.id,
-                "email": response.user.email
+                "email": response.user.email,
+                # Timezone last detected in the browser (see save_user_timezone)
+                "timezone": (response.user.user_metadata or {}).get("timezone")
             }
             
             return {
@@ -87,7 +128,9 @@ def sign_in(email: str, password: str) -> Dict:
             st.session_state["sb_refresh_token"] = response.session.refresh_token
             st.session_state["sb_user"] = {
                 "id": response.user.id,
-                "email": response.user.email
+                "email": response.user.email,
+                # Timezone last detected in the browser (see save_user_timezone)
+                "timezone": (response.user.user_metadata or {}).get("timezone")
             }
             
             return {
@@ -141,6 +184,29 @@ def get_user_id() -> Optional[str]:
         return st.session_state["sb_user"]["id"]
     return None
 
+def user_profile_timezone() -> Optional[str]:
+    """Timezone saved in the signed-in user's profile, read at sign-in"""
+    if "sb_user" in st.session_state and st.session_state["sb_user"]:
+        return st.session_state["sb_user"].get("timezone")
+    return None
+
+def save_user_timezone(timezone: str):
+    """Save the browser-detected timezone in the user's auth metadata"""
+    if not SUPABASE_URL or not SUPABASE_KEY:
+        raise ValueError("Supabase URL and KEY must be set in environment variables")
+    client = create_client(SUPABASE_URL, SUPABASE_KEY)
+    try:
+        response = client.auth.set_session(st.session_state["sb_access_token"],
+                                           st.session_state["sb_refresh_token"])
+        if response.session:
+            # set_session refreshes expired tokens
+            st.session_state["sb_access_token"] = response.session.access_token
+            st.session_state["sb_refresh_token"] = response.session.refresh_token
+        client.auth.update_user({"data": {"timezone": timezone}})
+        st.session_state["sb_user"]["timezone"] = timezone
+    except Exception as e:
+        raise Exception(f"Error saving timezone: {str(e)}")
+
 def reset_password_for_email(email: str):
     """Request password reset email using Supabase Auth"""
     supabase = get_supabase_client()
@@ -154,7 +220,7 @@ def reset_password_for_email(email: str):
 # Task operations
 def create_task(user_id: str, title: str, description: str = "", 
                 due_date: Optional[str] = None, priority: str = "medium",
-                reminder_time: Optional[str] = None, status: str = "pending") -> Dict:
+                reminder_time: Optional[str] = None, status: str = "pending") -> Optional[Task]:
     """Create a new task (user_id parameter kept for compatibility, but RLS handles user isolation)"""
     supabase = get_authenticated_client()
     task_data = {
@@ -168,39 +234,237 @@ def create_task(user_id: str, title: str, description: str = "",
         "completed_at": None
     }
     
+    if task_store is not None:
+        # Stored locally with a client-generated id; inserted in Supabase by the next sync
+        task = task_store.create(user_id, task_data)
+        request_task_sync(user_id)
+        _apply_to_task_cache(user_id, task)
+        _invalidate_shared_task_data(user_id)
+        publish_task_change(user_id, "INSERT", task.to_record())
+        return task
+    
     try:
         result = supabase.table("tasks").insert(task_data).execute()
-        return result.data[0] if result.data else None
+        task = Task.from_record(result.data[0]) if result.data else None
     except Exception as e:
         raise Exception(f"Error creating task: {str(e)}")
+    _apply_to_task_cache(user_id, task)
+    _invalidate_shared_task_data(user_id)
+    if task is not None:
+        publish_task_change(user_id, "INSERT", result.data[0])
+    return task
 
-def get_tasks(user_id: str, status: Optional[str] = None) -> List[Dict]:
-    """Get tasks for user (user_id parameter kept for compatibility, but RLS ensures only user's tasks are returned)"""
-    supabase = get_authenticated_client()
-    query = supabase.table("tasks").select("*")
+def get_tasks(user_id: str, status: Optional[str] = None, include_description: bool = True) -> List[Task]:
+    """
+    Get tasks for user (user_id parameter kept for compatibility, but RLS ensures only user's tasks are returned)
     
-    if status:
-        query = query.eq("status", status)
-    else:
-        query = query.neq("status", "deleted")
+    With include_description=False descriptions are not fetched; they load on first
+    access, or in one query for a list of tasks via load_task_descriptions.
+    With the local task store enabled, tasks are read from it (descriptions
+    included) and a background sync is requested. Otherwise the rows are kept
+    in the shared cache (per user, invalidated by every task write), so other
+    tabs and app replicas don't refetch them.
+    """
+    if task_store is not None:
+        if not task_store.has_user(user_id):
+            sync_task_store(user_id)  # First load in this process: pull everything once
+        else:
+            request_task_sync(user_id)
+        return task_store.tasks(user_id, status)
     
+    def fetch_rows() -> List[Dict]:
+        supabase = get_authenticated_client()
+        columns = "*" if include_description else TASK_LIST_COLUMNS
+        query = supabase.table("tasks").select(columns)
+        
+        if status:
+            query = query.eq("status", status)
+        else:
+            query = query.neq("status", "deleted")
+        
+        try:
+            result = query.order("created_at", desc=True).execute()
+        except Exception as e:
+            raise Exception(f"Error fetching tasks: {str(e)}")
+        return result.data or []
+    
+    cache_key = f"{status or 'active'}:{'full' if include_description else 'list'}"
+    rows = shared_cache.get_or_set("tasks", cache_key, fetch_rows, user_id=user_id)
+    return [Task.from_record(row) for row in rows]
+
+def get_task_description(task_id: str) -> str:
+    """Fetch a single task's description"""
+    supabase = get_authenticated_client()
     try:
-        result = query.order("created_at", desc=True).execute()
-        return result.data if result.data else []
+        result = supabase.table("tasks").select("description").eq("id", task_id).execute()
+        return (result.data[0].get("description") or "") if result.data else ""
     except Exception as e:
-        raise Exception(f"Error fetching tasks: {str(e)}")
+        raise Exception(f"Error fetching task description: {str(e)}")
 
-def update_task(task_id: str, user_id: str, **updates) -> Dict:
-    """Update a task (user_id parameter kept for compatibility, but RLS ensures only user's tasks can be updated)"""
-    supabase = get_authenticated_client()
+def load_task_descriptions(tasks: List[Task], access_token: Optional[str] = None) -> List[Task]:
+    """Load descriptions for all tasks in the list that don't have one yet, in one query"""
+    missing = {task.id: task for task in tasks if not task.description_loaded}
+    if not missing:
+        return tasks
+    supabase = get_authenticated_client(access_token)
+    try:
+        result = supabase.table("tasks").select("id,description").in_("id", list(missing)).execute()
+    except Exception as e:
+        raise Exception(f"Error fetching task descriptions: {str(e)}")
+    for row in result.data or []:
+        task = missing.pop(str(row.get("id")), None)
+        if task:
+            task.description = row.get("description")
+    for task in missing.values():
+        task.description = ""
+    return tasks
+
+Task.description_loader = get_task_description
+
+def get_task_cache(user_id: str, refresh: bool = False) -> TaskCache:
+    """
+    Session task cache for user_id, fetched on first use and after TASK_CACHE_TTL_SECONDS.
+
+    create_task/update_task apply their result to it, so views and emails read
+    it instead of refetching after every mutation. Changes made in the user's
+    other sessions arrive through the realtime task feed; while the feed is live
+    (a joined Supabase Realtime channel with an unexpired token) the cache is
+    never refetched for age.
+    """
+    cache = st.session_state.get("task_cache")
+    refresh_session_token()
+    feed = get_task_feed(user_id)
+    live = feed is not None and feed.live
+    if refresh or cache is None or cache.user_id != user_id or (not live and cache.is_stale(TASK_CACHE_TTL_SECONDS)):
+        if feed is not None:
+            feed.clear()  # Changes queued before the fetch are in it already
+        cache = TaskCache(user_id, get_tasks(user_id, include_description=False))
+        st.session_state["task_cache"] = cache
+    elif feed is not None:
+        feed.apply(cache)
+    return cache
+
+def take_task_changes(user_id: str) -> int:
+    """
+    Bring the session task cache up to date and return how many realtime changes
+    reached it since the last call - including ones applied by other get_task_cache calls.
+    """
+    get_task_cache(user_id)
+    feed = get_task_feed(user_id)
+    return feed.take_unseen() if feed is not None else 0
+
+def _invalidate_shared_task_data(user_id: str):
+    """
+    Drop the user's shared-cache task lists. Gemini plans are left alone: their
+    key includes the task list as the prompt shows it, so a write that changes
+    what Gemini sees misses anyway and one that doesn't keeps its plan.
+    """
+    shared_cache.invalidate("tasks", user_id)
+
+def _apply_to_task_cache(user_id: str, task: Optional[Task]):
+    """Keep the session task cache in step with a created/updated task"""
+    cache = st.session_state.get("task_cache")
+    if task is not None and cache is not None and cache.user_id == user_id:
+        cache.upsert(task)
+
+def write_task_update(task_id: str, updates: Dict, access_token: Optional[str] = None) -> Optional[Task]:
+    """
+    Write an update to the tasks table and return the stored row.
+    
+    Doesn't touch the session task cache, so it can run on a background thread
+    (with access_token passed explicitly).
+    """
     # Add updated_at timestamp
-    updates["updated_at"] = datetime.now(pytz.UTC).isoformat()
+    updates = dict(updates, updated_at=datetime.now(pytz.UTC).isoformat())
     
+    user_id = task_store.user_of(task_id) if task_store is not None else None
+    if user_id is not None:
+        task = task_store.update(task_id, updates)
+        request_task_sync(user_id, access_token)
+        _invalidate_shared_task_data(user_id)
+        publish_task_change(user_id, "UPDATE", task.to_record())
+        return task
+    
+    supabase = get_authenticated_client(access_token)
     try:
         result = supabase.table("tasks").update(updates).eq("id", task_id).execute()
-        return result.data[0] if result.data else None
     except Exception as e:
         raise Exception(f"Error updating task: {str(e)}")
+    if not result.data:
+        return None
+    row = result.data[0]
+    if row.get("user_id"):
+        _invalidate_shared_task_data(str(row["user_id"]))
+        publish_task_change(str(row["user_id"]), "UPDATE", row)
+    return Task.from_record(row)
+
+def sync_task_store(user_id: str, access_token: Optional[str] = None):
+    """
+    Sync user_id's rows in the local task store with Supabase: pull rows changed
+    since the last pull (deleted ones included), merge them last-writer-wins
+    per field, then push the remaining local changes.
+    
+    Changes are pulled by synced_at, which the database sets on every write
+    (updated_at comes from clients' clocks), starting TASK_SYNC_OVERLAP_SECONDS
+    before the newest one seen so a write committed late isn't skipped.
+    """
+    supabase = get_authenticated_client(access_token)
+    pulled_at = task_store.pulled_at(user_id)
+    
+    try:
+        query = supabase.table("tasks").select("*")
+        if pulled_at:
+            since = datetime.fromisoformat(pulled_at) - timedelta(seconds=TASK_SYNC_OVERLAP_SECONDS)
+            query = query.gte("synced_at", since.isoformat())
+        rows = query.order("synced_at").execute().data or []
+        task_store.merge_remote(user_id, rows)
+        task_store.set_pulled_at(user_id, rows[-1].get("synced_at") if rows else pulled_at)
+        
+    except Exception as e:
+        raise Exception(f"Error syncing tasks: {str(e)}")
+    
+    # Each row is pushed on its own, so one failing row doesn't hold back the rest
+    failed = []
+    for record, fields, local_only in task_store.pending(user_id):
+        try:
+            if local_only:
+                pushed = record
+                # Upsert: a retry after a lost response finds the row already inserted
+                result = supabase.table("tasks").upsert(record, on_conflict="id").execute()
+            else:
+                pushed = {field: record.get(field) for field in fields}
+                pushed["updated_at"] = record.get("updated_at")
+                result = supabase.table("tasks").update(pushed).eq("id", record["id"]).execute()
+                pushed["id"] = record["id"]
+            task_store.mark_pushed(user_id, pushed, result.data[0] if result.data else None)
+        except Exception as e:
+            failed.append(f"{record['id']}: {str(e)}")
+    if failed:
+        raise Exception(f"Error syncing tasks: {len(failed)} not pushed ({'; '.join(failed)})")
+
+def _run_task_sync(user_id: str):
+    with _sync_lock:
+        access_token = _sync_tokens.pop(user_id, None)
+    try:
+        sync_task_store(user_id, access_token)
+    except Exception:
+        pass  # Offline or token expired: local changes stay dirty and are pushed by a later sync
+
+def request_task_sync(user_id: str, access_token: Optional[str] = None):
+    """Queue a background sync of user_id's local task store (pass access_token off the main thread)"""
+    if access_token is None:
+        access_token = st.session_state.get("sb_access_token")
+    with _sync_lock:
+        queued = user_id in _sync_tokens
+        _sync_tokens[user_id] = access_token
+    if not queued:
+        _sync_pool.submit(_run_task_sync, user_id)
+
+def update_task(task_id: str, user_id: str, **updates) -> Optional[Task]:
+    """Update a task (user_id parameter kept for compatibility, but RLS ensures only user's tasks can be updated)"""
+    task = write_task_update(task_id, updates)
+    _apply_to_task_cache(user_id, task)
+    return task
 
 def delete_task(task_id: str, user_id: str):
     """Soft delete a task (user_id parameter kept for compatibility, but RLS ensures only user's tasks can be deleted)"""
@@ -219,9 +483,9 @@ def snooze_task(task_id: str, user_id: str, snooze_until: str):
                       snooze_until=snooze_until)
 
 # Transcript operations
-def save_transcript(user_id: str, transcript_text: str) -> Dict:
+def save_transcript(user_id: str, transcript_text: str, access_token: Optional[str] = None) -> Dict:
     """Save user transcript (user_id parameter kept for compatibility, but RLS handles user isolation)"""
-    supabase = get_authenticated_client()
+    supabase = get_authenticated_client(access_token)
     transcript_data = {
         "transcript_text": transcript_text,
         "created_at": datetime.now(pytz.UTC).isoformat()
@@ -233,6 +497,18 @@ def save_transcript(user_id: str, transcript_text: str) -> Dict:
     except Exception as e:
         raise Exception(f"Error saving transcript: {str(e)}")
 
+def insert_transcripts(rows: List[Dict], access_token: Optional[str] = None) -> List[Dict]:
+    """Save several transcript rows (transcript_text, created_at) in one multi-row insert"""
+    if not rows:
+        return []
+    supabase = get_authenticated_client(access_token)
+    
+    try:
+        result = supabase.table("transcripts").insert(rows).execute()
+        return result.data or []
+    except Exception as e:
+        raise Exception(f"Error saving transcripts: {str(e)}")
+
 def get_transcripts(user_id: str, limit: int = 50) -> List[Dict]:
     """Get recent transcripts for user (user_id parameter kept for compatibility, but RLS ensures only user's transcripts are returned)"""
     supabase = get_authenticated_client()
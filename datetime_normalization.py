@@ -0,0 +1,124 @@
+"""
+Fast datetime normalization for Gemini output
+Precompiled patterns, cached timezone lookups and a single-pass parser.
+"""
+from datetime import datetime
+from functools import lru_cache
+import re
+from typing import Dict, Optional
+import pytz
+
+# Date, optional time (T or space separated), optional fraction, optional timezone suffix.
+# The timezone suffix is matched only so it can be discarded.
+_ISO_DATETIME = re.compile(
+    r"\s*(\d{4})-(\d{1,2})-(\d{1,2})"
+    r"(?:[T ](\d{1,2})(?::(\d{1,2}))?(?::(\d{1,2}))?(?:\.\d+)?)?"
+    r"\s*(?:Z|[+-]\d{2}(?::?\d{2})?)?\s*"
+)
+
+# Plan fields that carry datetimes, per list in the Gemini planner output
+PLAN_DATETIME_FIELDS = {
+    "tasks_to_add": ("due_date", "reminder_time"),
+    "tasks_to_update": ("due_date", "snooze_until", "reminder_time"),
+}
+
+@lru_cache(maxsize=None)
+def get_timezone(timezone: str):
+    """Resolve a pytz timezone once per name"""
+    return pytz.timezone(timezone)
+
+@lru_cache(maxsize=65536)
+def _utc_offset_for_hour(year: int, month: int, day: int, hour: int, target_timezone: str) -> Optional[str]:
+    """
+    ISO offset suffix (e.g. "-05:00") for a local wall-clock hour in target_timezone.
+
+    Uses localize() exactly like a per-value rebuild would. Returns None for the
+    rare hour in which the offset changes mid-hour (30-minute DST shifts), so
+    the caller localizes that value individually.
+    """
+    tz = get_timezone(target_timezone)
+    first = tz.localize(datetime(year, month, day, hour, 0, 0))
+    last = tz.localize(datetime(year, month, day, hour, 59, 59))
+    if first.utcoffset() != last.utcoffset():
+        return None
+    return first.isoformat()[19:]
+
+def _localize_components(year: int, month: int, day: int, hour: int, minute: int,
+                         second: int, target_timezone: str) -> str:
+    """Build the ISO string for wall-clock components in target_timezone"""
+    if not (0 <= minute < 60 and 0 <= second < 60):
+        raise ValueError(f"Invalid time {hour}:{minute}:{second}")
+    offset = _utc_offset_for_hour(year, month, day, hour, target_timezone)
+    if offset is None:
+        return get_timezone(target_timezone).localize(
+            datetime(year, month, day, hour, minute, second)).isoformat()
+    # The hour is written back verbatim - localize() semantics, never a conversion
+    return f"{year:04d}-{month:02d}-{day:02d}T{hour:02d}:{minute:02d}:{second:02d}{offset}"
+
+def extract_hour(dt_str: Optional[str]) -> Optional[int]:
+    """Get the wall-clock hour written in an ISO datetime string, or None"""
+    match = _ISO_DATETIME.fullmatch(dt_str) if dt_str else None
+    if not match or match.group(4) is None:
+        return None
+    return int(match.group(4))
+
+def normalize_datetime_to_timezone(dt_str: str, target_timezone: str) -> Optional[str]:
+    """
+    Normalize a datetime string to a specific timezone.
+
+    ABSOLUTE RULES (NO EXCEPTIONS):
+    1. SPOKEN TIME IS AUTHORITATIVE - NEVER convert it
+    2. NEVER convert spoken times to UTC
+    3. NEVER trust Gemini's timezone math
+    4. NEVER call astimezone() on spoken times
+    5. ALWAYS rebuild datetime using localize() in user's timezone
+
+    This function:
+    - Strips ALL timezone info from Gemini output
+    - Extracts ONLY: year, month, day, hour, minute, second
+    - Rebuilds datetime using localize() - NEVER converts
+    A date without a time gets the current time of day in target_timezone.
+    Unparseable input is returned unchanged.
+    """
+    if not dt_str:
+        return None
+
+    try:
+        match = _ISO_DATETIME.fullmatch(dt_str)
+        if match:
+            year, month, day, hour, minute, second = match.groups()
+            if hour is None:
+                # Just a date
+                now = datetime.now(get_timezone(target_timezone))
+                hour, minute, second = now.hour, now.minute, now.second
+            return _localize_components(int(year), int(month), int(day), int(hour),
+                                        int(minute or 0), int(second or 0), target_timezone)
+
+        # Fallback for anything else fromisoformat understands (e.g. compact 20260111T160000)
+        dt = datetime.fromisoformat(dt_str.replace('Z', '+00:00'))
+        return _localize_components(dt.year, dt.month, dt.day, dt.hour, dt.minute,
+                                    dt.second, target_timezone)
+    except Exception:
+        return dt_str
+
+def normalize_plan_datetimes(plan: Dict, target_timezone: str) -> Dict:
+    """
+    Normalize every datetime in a Gemini planner result at once.
+
+    Returns a copy of plan where the fields in PLAN_DATETIME_FIELDS are
+    normalized with normalize_datetime_to_timezone. The input is not modified.
+    """
+    normalized = dict(plan)
+    for list_key, fields in PLAN_DATETIME_FIELDS.items():
+        items = plan.get(list_key)
+        if not items:
+            continue
+        normalized_items = []
+        for item in items:
+            item = dict(item)
+            for field in fields:
+                if item.get(field):
+                    item[field] = normalize_datetime_to_timezone(item[field], target_timezone)
+            normalized_items.append(item)
+        normalized[list_key] = normalized_items
+    return normalized
@@ -1,36 +1,65 @@
 """
 Email service for sending task reminders and updates
 """
+import re
 import smtplib
+from email.charset import Charset, QP
 from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
-from datetime import datetime
+from datetime import datetime, time, timedelta
 import pytz
-from typing import List, Dict
+from typing import List, Dict, Optional
 from config import SMTP_SERVER, SMTP_PORT, SMTP_EMAIL, SMTP_PASSWORD
-from database import get_tasks, get_user_id
+from database import get_tasks, get_user_id, get_task_cache, load_task_descriptions
+from task_model import Task
+from task_cache import DueDateIndex
+from email_templates import (
+    TimezoneArg, fragment_cache, local_timezone, render_email_html, render_email_text,
+    render_sections_html, render_sections_text
+)
 import streamlit as st
 
-def send_email(to_email: str, subject: str, html_body: str):
-    """Send email using SMTP"""
+# UTF-8 parts quoted-printable: mostly-ASCII bodies stay near their raw size (base64 adds a third)
+_UTF8_QP = Charset("utf-8")
+_UTF8_QP.body_encoding = QP
+
+_TAG = re.compile(r"<style.*?</style>|<[^>]+>", re.S)
+
+def html_to_text(html_body: str) -> str:
+    """Rough plain-text fallback for HTML bodies without a text rendering"""
+    lines = (line.strip() for line in _TAG.sub("", html_body).splitlines())
+    return "\n".join(line for line in lines if line)
+
+def build_email_message(to_email: str, subject: str, html_body: str, text_body: Optional[str] = None) -> MIMEMultipart:
+    """multipart/alternative message with a compact plain-text part and the HTML part"""
+    msg = MIMEMultipart('alternative')
+    msg['Subject'] = subject
+    msg['From'] = SMTP_EMAIL
+    msg['To'] = to_email
+    
+    part1 = MIMEText(text_body if text_body is not None else html_to_text(html_body), 'plain', _UTF8_QP)
+    part2 = MIMEText(html_body, 'html', _UTF8_QP)
+    
+    msg.attach(part1)
+    msg.attach(part2)
+    return msg
+
+def send_email(to_email: str, subject: str, html_body: str, text_body: Optional[str] = None,
+               raise_errors: bool = False):
+    """
+    Send email using SMTP (text_body defaults to the HTML with tags stripped)
+    
+    Problems are shown with st.warning/st.error, which only works on the script
+    thread; background callers pass raise_errors to get them as exceptions.
+    """
     if not all([SMTP_SERVER, SMTP_EMAIL, SMTP_PASSWORD]):
+        if raise_errors:
+            raise Exception("Email configuration not set. Skipping email send.")
         st.warning("Email configuration not set. Skipping email send.")
         return False
     
     try:
-        msg = MIMEMultipart('alternative')
-        msg['Subject'] = subject
-        msg['From'] = SMTP_EMAIL
-        msg['To'] = to_email
-        
-        # Create plain text version
-        text_body = html_body  # Simple fallback
-        
-        part1 = MIMEText(text_body, 'plain')
-        part2 = MIMEText(html_body, 'html')
-        
-        msg.attach(part1)
-        msg.attach(part2)
+        msg = build_email_message(to_email, subject, html_body, text_body)
         
         with smtplib.SMTP(SMTP_SERVER, SMTP_PORT) as server:
             server.starttls()
@@ -39,156 +68,81 @@ def send_email(to_email: str, subject: str, html_body: str):
         
         return True
     except Exception as e:
+        if raise_errors:
+            raise Exception(f"Error sending email: {str(e)}")
         st.error(f"Error sending email: {str(e)}")
         return False
 
-def format_task_html(task: Dict) -> str:
-    """Format a single task as HTML - matches app display format exactly"""
-    priority_colors = {
-        "p0": "#FF0000",
-        "high": "#FF6B6B",
-        "medium": "#ff4b4b",
-        "low": "#FFB3BA"
-    }
-    priority = task.get("priority", "medium")
-    color = priority_colors.get(priority, "#ff4b4b")
-    
-    # Format due date exactly like the app does
-    due_date_str = task.get('due_date', '') if task.get('due_date') else 'No due date'
-    if due_date_str != 'No due date':
-        try:
-            # Parse ISO format date
-            dt = datetime.fromisoformat(due_date_str.replace('Z', '+00:00'))
-            # Convert to local timezone (same as app display)
-            local_tz = datetime.now().astimezone().tzinfo
-            dt = dt.astimezone(local_tz)
-            # Use same format as app: "%b %d, %Y %I:%M %p"
-            due_date_str = dt.strftime("%b %d, %Y %I:%M %p")
-        except Exception as e:
-            # If parsing fails, keep original
-            pass
-    
-    status = task.get("status", "pending")
-    status_badge = "✓" if status == "completed" else "○"
-    
-    html = f"""
-    <div style="margin: 10px 0; padding: 10px; border-left: 4px solid {color}; background-color: #ffffff;">
-        <div style="font-weight: bold; color: #333333;">{status_badge} {task.get('title', 'Untitled')}</div>
-        {f'<div style="color: #454240; font-size: 0.9em; margin-top: 5px;">{task.get("description", "")}</div>' if task.get("description") else ''}
-        <div style="color: #454240; font-size: 0.85em; margin-top: 5px;">
-            Priority: {priority.upper()} | Due: {due_date_str}
-        </div>
-    </div>
-    """
-    return html
+def format_task_html(task: Task, timezone: TimezoneArg = None) -> str:
+    """Format a single task as HTML - matches app display format exactly (cached per task version)"""
+    return fragment_cache.render(task, timezone if timezone is not None else local_timezone())
 
 def send_daily_reminder_email(user_email: str, user_id: str):
     """Send daily task reminder email with accurate dates"""
     # Use local timezone for today's date
-    local_tz = datetime.now().astimezone().tzinfo
+    local_tz = local_timezone()
     today = datetime.now(local_tz).date()
     
-    # Get all active tasks
-    all_tasks = get_tasks(user_id)
-    active_tasks = [t for t in all_tasks if t.get("status") not in ["completed", "deleted"]]
-    
-    # Filter tasks for today (or overdue) - convert to local timezone for comparison
-    today_tasks_filtered = []
-    for task in active_tasks:
-        due_date = task.get("due_date")
-        if due_date:
-            try:
-                # Parse and convert to local timezone
-                dt = datetime.fromisoformat(due_date.replace('Z', '+00:00'))
-                dt = dt.astimezone(local_tz)
-                task_date = dt.date()
-                if task_date <= today:
-                    today_tasks_filtered.append(task)
-            except:
-                # If parsing fails, include the task
-                today_tasks_filtered.append(task)
-        else:
-            # Include tasks without due dates
-            today_tasks_filtered.append(task)
+    # Index active tasks by due date (runs from the scheduler, outside any session cache)
+    due_index = DueDateIndex(get_tasks(user_id))
     
-    # Sort by due date
-    def sort_key(task):
-        due_date = task.get("due_date")
-        if not due_date:
-            return datetime.max
-        try:
-            dt = datetime.fromisoformat(due_date.replace('Z', '+00:00'))
-            return dt
-        except:
-            return datetime.max
-    
-    today_tasks_filtered.sort(key=sort_key)
+    # Tasks due today (or overdue) in due-date order, then tasks without (valid) due dates
+    tomorrow_start = datetime.combine(today + timedelta(days=1), time.min, local_tz)
+    today_tasks_filtered = due_index.due_before(int(tomorrow_start.timestamp())) + due_index.undated()
     
     subject = f"Skkadoosh - Your Daily Task List - {today.strftime('%B %d, %Y')}"
+    heading, intro = "Your Daily Task List", f"Here are your tasks for {today.strftime('%B %d, %Y')}:"
+    html_body = render_email_html(heading, intro, today_tasks_filtered, local_tz)
+    text_body = render_email_text(heading, intro, today_tasks_filtered, local_tz)
     
-    html_body = f"""
-    <html>
-    <head>
-        <style>
-            body {{ font-family: 'DM Sans', sans-serif; color: #454240; background-color: #ffffff; }}
-            h1 {{ font-family: 'Libre Baskerville', serif; color: #333333; }}
-        </style>
-    </head>
-    <body>
-        <h1>Your Daily Task List</h1>
-        <p>Here are your tasks for {today.strftime('%B %d, %Y')}:</p>
-        <div>
-            {''.join([format_task_html(task) for task in today_tasks_filtered])}
-        </div>
-        <p style="margin-top: 20px; color: #454240;">
-            <a href="https://skkadoosh.com/NeverMiss" style="color: #ff4b4b;">View in Skkadoosh →</a>
-        </p>
-    </body>
-    </html>
-    """
-    
-    return send_email(user_email, subject, html_body)
+    return send_email(user_email, subject, html_body, text_body)
 
-def send_task_update_email(user_email: str, user_id: str, change_type: str = "updated"):
-    """Send email when tasks are updated - includes all active tasks with accurate dates"""
-    all_tasks = get_tasks(user_id)
-    # Get all active tasks (not completed, not deleted) - same as app displays
-    active_tasks = [t for t in all_tasks if t.get("status") not in ["completed", "deleted"]]
-    
-    # Sort tasks by due date (tasks without due dates go to end)
-    def sort_key(task):
-        due_date = task.get("due_date")
-        if not due_date:
-            return datetime.max
-        try:
-            dt = datetime.fromisoformat(due_date.replace('Z', '+00:00'))
-            return dt
-        except:
-            return datetime.max
-    
-    active_tasks.sort(key=sort_key)
+# Kinds of task change in an update email's mutation set, in the order they're listed
+CHANGE_LABELS = {"created": "Added", "updated": "Updated", "completed": "Completed", "deleted": "Deleted"}
+
+def summarize_changes(changes: Dict[str, List[Task]], open_count: int) -> str:
+    """Compact summary line, e.g. "2 updated, 1 completed. You have 7 open tasks." """
+    parts = [f"{len(changes[kind])} {kind}" for kind in CHANGE_LABELS if changes.get(kind)]
+    return f"{', '.join(parts).capitalize()}. You have {open_count} open task{'s' if open_count != 1 else ''}."
+
+def send_task_update_email(user_email: str, user_id: str, change_type: str = "updated",
+                           tasks: Optional[List[Task]] = None, access_token: Optional[str] = None,
+                           timezone: Optional[str] = None, changes: Optional[Dict[str, List[Task]]] = None,
+                           open_count: Optional[int] = None, raise_errors: bool = False):
+    """
+    Send email when tasks are updated
     
-    subject = f"Skkadoosh - Your Task List Has Been {change_type.capitalize()}"
+    With changes (the mutation set: CHANGE_LABELS kind -> tasks, deleted ones as
+    they were before deletion), only those tasks are listed, under a summary
+    count; open_count defaults to the session cache's. Nothing is sent for an
+    empty set. Without changes, all active tasks are listed.
     
-    html_body = f"""
-    <html>
-    <head>
-        <style>
-            body {{ font-family: 'DM Sans', sans-serif; color: #454240; background-color: #ffffff; }}
-            h1 {{ font-family: 'Libre Baskerville', serif; color: #333333; }}
-        </style>
-    </head>
-    <body>
-        <h1>Your Task List Has Been {change_type.capitalize()}</h1>
-        <p>Here's your complete updated task list:</p>
-        <div>
-            {''.join([format_task_html(task) for task in active_tasks])}
-        </div>
-        <p style="margin-top: 20px; color: #454240;">
-            <a href="https://skkadoosh.com/NeverMiss" style="color: #ff4b4b;">View in Skkadoosh →</a>
-        </p>
-    </body>
-    </html>
+    Background senders pass their tasks, open_count and the access token (for
+    loading descriptions), since the session cache isn't reachable off-thread,
+    and raise_errors (see send_email).
     """
-    
-    return send_email(user_email, subject, html_body)
+    subject = f"Skkadoosh - Your Task List Has Been {change_type.capitalize()}"
+    heading = f"Your Task List Has Been {change_type.capitalize()}"
+    
+    if changes is not None:
+        sections = [(label, changes[kind]) for kind, label in CHANGE_LABELS.items() if changes.get(kind)]
+        if not sections:
+            return False
+        load_task_descriptions([task for _, section_tasks in sections for task in section_tasks], access_token)
+        if open_count is None:
+            open_count = len(get_task_cache(user_id).due_index)
+        intro = summarize_changes(changes, open_count)
+        html_body = render_sections_html(heading, intro, sections, timezone)
+        text_body = render_sections_text(heading, intro, sections, timezone)
+        return send_email(user_email, subject, html_body, text_body, raise_errors)
+    
+    # All active tasks (not completed, not deleted) from the session cache's due-date index,
+    # already ordered by due date (tasks without due dates go to end)
+    if tasks is None:
+        tasks = get_task_cache(user_id).due_index.ordered()
+    active_tasks = load_task_descriptions(tasks, access_token)
+    intro = "Here's your complete updated task list:"
+    html_body = render_email_html(heading, intro, active_tasks, timezone)
+    text_body = render_email_text(heading, intro, active_tasks, timezone)
+    
+    return send_email(user_email, subject, html_body, text_body, raise_errors)
@@ -0,0 +1,185 @@
+"""
+Email rendering (HTML and plain text)
+Page and task templates are parsed once (bound str.format); each task's
+rendered HTML fragment is cached by (task id, updated_at, timezone), so a
+digest only renders the tasks that changed since they were last emailed. The
+plain-text part is rendered from the same tasks, one compact line each.
+"""
+from collections import OrderedDict
+from datetime import datetime, tzinfo
+import threading
+from typing import Iterable, List, Optional, Tuple, Union
+from config import EMAIL_FRAGMENT_CACHE_SIZE
+from task_model import Task, Status
+
+PRIORITY_COLORS = {
+    "p0": "#FF0000",
+    "high": "#FF6B6B",
+    "medium": "#ff4b4b",
+    "low": "#FFB3BA"
+}
+
+_PAGE = """
+    <html>
+    <head>
+        <style>
+            body {{ font-family: 'DM Sans', sans-serif; color: #454240; background-color: #ffffff; }}
+            h1 {{ font-family: 'Libre Baskerville', serif; color: #333333; }}
+        </style>
+    </head>
+    <body>
+        <h1>{heading}</h1>
+        <p>{intro}</p>
+        <div>
+            {rows}
+        </div>
+        <p style="margin-top: 20px; color: #454240;">
+            <a href="{url}" style="color: #ff4b4b;">View in Skkadoosh →</a>
+        </p>
+    </body>
+    </html>
+    """.format
+
+_TASK = """
+    <div style="margin: 10px 0; padding: 10px; border-left: 4px solid {color}; background-color: #ffffff;">
+        <div style="font-weight: bold; color: #333333;">{badge} {title}</div>
+        {description}
+        <div style="color: #454240; font-size: 0.85em; margin-top: 5px;">
+            Priority: {priority} | Due: {due}
+        </div>
+    </div>
+    """.format
+
+APP_URL = "https://skkadoosh.com/NeverMiss"
+
+_TEXT_PAGE = "{heading}\n\n{intro}\n\n{rows}\n\nView in Skkadoosh: {url}\n".format
+_TEXT_TASK = "{badge} {title} | {priority} | Due: {due}".format
+
+_SECTION = """
+    <h3 style="font-family: 'Libre Baskerville', serif; color: #333333; margin: 20px 0 5px 0;">{label}</h3>{rows}""".format
+
+_DESCRIPTION = '<div style="color: #454240; font-size: 0.9em; margin-top: 5px;">{}</div>'.format
+
+# A timezone name (the user's), or a tzinfo (the server's local zone, the old default)
+TimezoneArg = Union[str, tzinfo, None]
+
+def local_timezone() -> tzinfo:
+    """The server's current local timezone (resolve once per email, not per task)"""
+    return datetime.now().astimezone().tzinfo
+
+def _timezone_key(timezone: TimezoneArg) -> str:
+    if isinstance(timezone, str):
+        return timezone
+    return f"local{timezone.utcoffset(None)}"
+
+def format_due(task: Task, timezone: TimezoneArg) -> str:
+    """Due date as the app shows it ("%b %d, %Y %I:%M %p"), or why there is none"""
+    if task.due_ts is None:
+        return 'Unknown date' if task.due_invalid else 'No due date'
+    if isinstance(timezone, str):
+        due = task.due_local(timezone)
+    else:
+        due = datetime.fromtimestamp(task.due_ts, timezone)
+    return due.strftime("%b %d, %Y %I:%M %p")
+
+def _fingerprint(task: Task) -> Tuple:
+    """Everything a fragment shows; optimistic copies change these without a new updated_at"""
+    return (task.title, task.description, task.priority, task.status, task.due_ts, task.due_invalid)
+
+class FragmentCache:
+    """
+    Thread-safe LRU of rendered task fragments keyed by (id, updated_at, timezone).
+
+    Each entry also keeps the task fields it was rendered from, so a task
+    changed in memory without a new updated_at is re-rendered, not served stale.
+    """
+
+    def __init__(self, max_entries: int = 20000):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[Tuple, Tuple[Tuple, str]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def render(self, task: Task, timezone: TimezoneArg, timezone_key: Optional[str] = None) -> str:
+        key = (task.id, task.updated_ts, timezone_key or _timezone_key(timezone))
+        fingerprint = _fingerprint(task)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] == fingerprint:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[1]
+        html = render_task_html(task, timezone)
+        with self._lock:
+            self.misses += 1
+            self._entries[key] = (fingerprint, html)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return html
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+def render_task_html(task: Task, timezone: TimezoneArg) -> str:
+    """Render one task fragment (uncached) - matches app display format exactly"""
+    priority = task.priority.label
+    return _TASK(
+        color=PRIORITY_COLORS.get(priority, "#ff4b4b"),
+        badge="✓" if task.status == Status.COMPLETED else "○",
+        title=task.title or 'Untitled',
+        description=_DESCRIPTION(task.description) if task.description else '',
+        priority=priority.upper(),
+        due=format_due(task, timezone),
+    )
+
+# Shared by all sessions in this process
+fragment_cache = FragmentCache(EMAIL_FRAGMENT_CACHE_SIZE)
+
+def _render_rows(tasks: Iterable[Task], timezone: TimezoneArg, cache: Optional[FragmentCache]) -> str:
+    if cache is None:
+        return "".join(render_task_html(task, timezone) for task in tasks)
+    timezone_key = _timezone_key(timezone)
+    return "".join(cache.render(task, timezone, timezone_key) for task in tasks)
+
+def render_email_html(heading: str, intro: str, tasks: Iterable[Task], timezone: TimezoneArg = None,
+                      cache: Optional[FragmentCache] = fragment_cache) -> str:
+    """Full email body: cached task fragments in order inside the page template"""
+    if timezone is None:
+        timezone = local_timezone()
+    return _PAGE(heading=heading, intro=intro, rows=_render_rows(tasks, timezone, cache), url=APP_URL)
+
+def render_sections_html(heading: str, intro: str, sections: List[Tuple[str, List[Task]]],
+                         timezone: TimezoneArg = None, cache: Optional[FragmentCache] = fragment_cache) -> str:
+    """Email body with the tasks grouped under labelled sections (e.g. Completed, Updated)"""
+    if timezone is None:
+        timezone = local_timezone()
+    rows = "".join(_SECTION(label=label, rows=_render_rows(tasks, timezone, cache)) for label, tasks in sections)
+    return _PAGE(heading=heading, intro=intro, rows=rows, url=APP_URL)
+
+def render_task_text(task: Task, timezone: TimezoneArg) -> str:
+    """One task as plain text: a status/title line, plus the description indented below"""
+    line = _TEXT_TASK(
+        badge="[x]" if task.status == Status.COMPLETED else "[ ]",
+        title=task.title or 'Untitled',
+        priority=task.priority.label.upper(),
+        due=format_due(task, timezone),
+    )
+    return f"{line}\n    {task.description}" if task.description else line
+
+def render_email_text(heading: str, intro: str, tasks: Iterable[Task], timezone: TimezoneArg = None) -> str:
+    """Plain-text email body matching render_email_html"""
+    if timezone is None:
+        timezone = local_timezone()
+    rows = "\n".join(render_task_text(task, timezone) for task in tasks) or "(no tasks)"
+    return _TEXT_PAGE(heading=heading, intro=intro, rows=rows, url=APP_URL)
+
+def render_sections_text(heading: str, intro: str, sections: List[Tuple[str, List[Task]]],
+                         timezone: TimezoneArg = None) -> str:
+    """Plain-text email body matching render_sections_html"""
+    if timezone is None:
+        timezone = local_timezone()
+    rows = "\n\n".join(f"{label}:\n" + "\n".join(render_task_text(task, timezone) for task in tasks)
+                         for label, tasks in sections)
+    return _TEXT_PAGE(heading=heading, intro=intro, rows=rows or "(no tasks)", url=APP_URL)
@@ -2,11 +2,15 @@
 Gemini 3.0 integration for task parsing and voice command understanding
 """
 from google import genai
+import hashlib
 import json
 from datetime import datetime
-import pytz
 from typing import Dict, List, Optional
-from config import GEMINI_API_KEY
+from config import GEMINI_API_KEY, PLAN_CACHE_TTL_SECONDS
+from task_model import Task
+from task_matcher import TaskMatcher
+from shared_cache import shared_cache
+from datetime_normalization import get_timezone
 
 # Configure Gemini
 if not GEMINI_API_KEY:
@@ -155,148 +159,45 @@ def get_current_datetime_str(timezone: str) -> str:
         timezone = "America/New_York"
     
     try:
-        tz = pytz.timezone(timezone)
+        tz = get_timezone(timezone)
         return datetime.now(tz).isoformat()
     except Exception as e:
-        tz = pytz.timezone("America/New_York")
+        tz = get_timezone("America/New_York")
         return datetime.now(tz).isoformat()
 
-def normalize_datetime_to_timezone(dt_str: str, target_timezone: str) -> str:
-    """
-    Normalize a datetime string to a specific timezone.
-    
-    ABSOLUTE RULES (NO EXCEPTIONS):
-    1. SPOKEN TIME IS AUTHORITATIVE - NEVER convert it
-    2. NEVER convert spoken times to UTC
-    3. NEVER trust Gemini's timezone math
-    4. NEVER call astimezone() on spoken times
-    5. ALWAYS rebuild datetime using localize() in user's timezone
-    
-    This function:
-    - Strips ALL timezone info from Gemini output
-    - Extracts ONLY: year, month, day, hour, minute
-    - Rebuilds datetime using localize() - NEVER converts
-    """
-    if not dt_str:
-        return None
-    
-    try:
-        target_tz = pytz.timezone(target_timezone)
-        
-        # STEP 1: Strip ALL timezone information completely
-        import re
-        # Remove 'Z' (UTC marker)
-        dt_str_clean = dt_str.replace('Z', '')
-        # Remove timezone offsets like +00:00, -05:00, +08:00
-        dt_str_clean = re.sub(r'[+-]\d{2}:\d{2}$', '', dt_str_clean)
-        # Remove microseconds if present
-        if '.' in dt_str_clean:
-            dt_str_clean = dt_str_clean.split('.')[0]
-        
-        # STEP 2: Parse ONLY date/time components (year, month, day, hour, minute, second)
-        # Extract components manually to be absolutely sure
-        try:
-            if 'T' in dt_str_clean:
-                date_part, time_part = dt_str_clean.split('T')
-                year, month, day = map(int, date_part.split('-'))
-                time_components = time_part.split(':')
-                hour = int(time_components[0])
-                minute = int(time_components[1]) if len(time_components) > 1 else 0
-                second = int(time_components[2]) if len(time_components) > 2 else 0
-            else:
-                # Just a date
-                year, month, day = map(int, dt_str_clean.split('-'))
-                now = datetime.now(target_tz)
-                hour = now.hour
-                minute = now.minute
-                second = now.second
-        except (ValueError, IndexError) as e:
-            # Fallback: try fromisoformat, but extract components to avoid any timezone issues
-            try:
-                # Use fromisoformat but immediately extract components (don't trust it for timezone)
-                dt_naive = datetime.fromisoformat(dt_str_clean.split('.')[0])
-                # CRITICAL: Extract components directly - don't use dt_naive if it has timezone
-                # If fromisoformat created a timezone-aware datetime, we need to be careful
-                if dt_naive.tzinfo is not None:
-                    # This shouldn't happen if we stripped timezone, but handle it
-                    # Convert to naive by extracting components
-                    year, month, day = dt_naive.year, dt_naive.month, dt_naive.day
-                    hour, minute, second = dt_naive.hour, dt_naive.minute, dt_naive.second or 0
-                else:
-                    # Naive datetime - safe to use
-                    year, month, day = dt_naive.year, dt_naive.month, dt_naive.day
-                    hour, minute, second = dt_naive.hour, dt_naive.minute, dt_naive.second or 0
-            except Exception as e2:
-                raise ValueError(f"Cannot parse datetime components from: {dt_str_clean}. Error: {e}, {e2}")
-        
-        # STEP 3: Rebuild datetime in target timezone with EXACT hour/minute
-        # CRITICAL: Use localize() - NEVER astimezone()
-        # This creates a NEW datetime in target timezone with the exact hour/minute
-        dt = target_tz.localize(datetime(year, month, day, hour, minute, second))
-        
-        # STEP 4: GUARDRAIL - Verify hour is preserved (should always be true with localize())
-        # This is a safety check - localize() should never change the hour
-        if dt.hour != hour:
-            error_msg = f"CRITICAL ERROR: Hour mismatch! Input hour: {hour}, Output hour: {dt.hour}. Input: {dt_str}, Cleaned: {dt_str_clean}, Components: {year}-{month}-{day} {hour}:{minute}:{second}, Timezone: {target_timezone}"
-            # This should never happen with localize(), but if it does, raise an error
-            raise ValueError(error_msg)
-        
-        # STEP 5: Return ISO format with correct DST-aware offset
-        result = dt.isoformat()
-        return result
-        
-    except Exception as e:
-        return dt_str
-
-def format_existing_tasks_for_prompt(tasks: List[Dict]) -> str:
-    """Format existing tasks for Gemini prompt"""
+def format_existing_tasks_for_prompt(tasks: List[Task], user_timezone: str = "UTC") -> str:
+    """Format existing tasks for Gemini prompt (due dates shown in user_timezone)"""
     if not tasks:
         return "No existing tasks"
     
     formatted = []
     for task in tasks:
-        task_id = task.get('id', '')
-        task_title = task.get('title', 'Untitled')
-        task_due = task.get('due_date', 'None')
-        task_priority = task.get('priority', 'medium')
-        formatted.append(f"- ID: {task_id}, Title: {task_title}, Due: {task_due}, Priority: {task_priority}")
+        task_title = task.title or 'Untitled'
+        task_due = task.due_iso(user_timezone) or 'None'
+        formatted.append(f"- ID: {task.id}, Title: {task_title}, Due: {task_due}, Priority: {task.priority.label}")
     return "\n".join(formatted)
 
-def match_task_id_by_reference(reference: str, tasks: List[Dict]) -> str:
-    """Match a spoken reference to an existing task ID using fuzzy matching"""
-    reference_lower = reference.lower().strip()
-    
-    # Simple fuzzy matching - find best match
-    best_match = None
-    best_score = 0
-    
-    for task in tasks:
-        title = task.get('title', '').lower()
-        # Simple word overlap scoring
-        reference_words = set(reference_lower.split())
-        title_words = set(title.split())
-        
-        if reference_words.intersection(title_words):
-            score = len(reference_words.intersection(title_words)) / max(len(reference_words), len(title_words))
-            if score > best_score:
-                best_score = score
-                best_match = task.get('id')
-        
-        # Also check if reference is a substring
-        if reference_lower in title or title in reference_lower:
-            score = min(len(reference_lower), len(title)) / max(len(reference_lower), len(title))
-            if score > best_score:
-                best_score = score
-                best_match = task.get('id')
-    
-    return best_match if best_match and best_score > 0.3 else None
+def match_task_id_by_reference(reference: str, tasks: List[Task]) -> str:
+    """
+    Match a spoken reference to an existing task ID using fuzzy matching.
+
+    Builds a one-off TaskMatcher; callers matching several references against
+    the same tasks should use the session cache's matcher instead.
+    """
+    return TaskMatcher(tasks).match(reference)
 
-def parse_user_input(user_input: str, existing_tasks: List[Dict], user_timezone: str) -> Dict:
+def parse_user_input(user_input: str, existing_tasks: List[Task], user_timezone: str,
+                     user_id: Optional[str] = None) -> Dict:
     """
     Parse user input using Gemini and return structured JSON.
     
     REQUIRED: user_timezone must be a valid timezone (e.g., 'America/New_York').
     NEVER pass 'UTC' - this will cause incorrect time parsing.
+    
+    With user_id, plans are kept in the user's shared-cache namespace keyed by
+    input, task list, timezone and current minute, so a re-sent command (double
+    click, second tab) doesn't call Gemini again. A changed task list changes
+    the key, so task writes need no invalidation.
     """
     if not GEMINI_API_KEY:
         raise ValueError("GEMINI_API_KEY not configured")
@@ -309,9 +210,17 @@ def parse_user_input(user_input: str, existing_tasks: List[Dict], user_timezone:
         raise ValueError("CRITICAL ERROR: user_timezone is UTC! Cannot parse times correctly. Must use a real timezone like 'America/New_York'.")
     
     try:
-        existing_tasks_formatted = format_existing_tasks_for_prompt(existing_tasks)
+        existing_tasks_formatted = format_existing_tasks_for_prompt(existing_tasks, user_timezone)
         current_datetime = get_current_datetime_str(user_timezone)
         
+        cache_key = None
+        if user_id:
+            plan_input = "\n".join([user_input.strip(), existing_tasks_formatted, user_timezone, current_datetime[:16]])
+            cache_key = hashlib.blake2b(plan_input.encode("utf-8"), digest_size=16).hexdigest()
+            cached_plan = shared_cache.get("plans", cache_key, user_id=user_id)
+            if cached_plan is not None:
+                return cached_plan
+        
         prompt = PLANNER_PROMPT_TEMPLATE.format(
             current_datetime=current_datetime,
             user_timezone=user_timezone,
@@ -343,6 +252,8 @@ def parse_user_input(user_input: str, existing_tasks: List[Dict], user_timezone:
         
         # Parse JSON
         result = json.loads(response_text)
+        if cache_key:
+            shared_cache.set("plans", cache_key, result, user_id=user_id, ttl=PLAN_CACHE_TTL_SECONDS)
         return result
         
     except json.JSONDecodeError as e:
@@ -350,7 +261,7 @@ def parse_user_input(user_input: str, existing_tasks: List[Dict], user_timezone:
     except Exception as e:
         raise Exception(f"Error calling Gemini API: {str(e)}")
 
-def parse_voice_command(command: str, existing_tasks: List[Dict], user_timezone: str) -> Dict:
+def parse_voice_command(command: str, existing_tasks: List[Task], user_timezone: str) -> Dict:
     """
     Parse a specific voice command.
     
@@ -368,7 +279,7 @@ def parse_voice_command(command: str, existing_tasks: List[Dict], user_timezone:
         raise ValueError("CRITICAL ERROR: user_timezone is UTC! Cannot parse times correctly. Must use a real timezone like 'America/New_York'.")
     
     try:
-        existing_tasks_formatted = format_existing_tasks_for_prompt(existing_tasks)
+        existing_tasks_formatted = format_existing_tasks_for_prompt(existing_tasks, user_timezone)
         current_datetime = get_current_datetime_str(user_timezone)
         
         prompt = COMMAND_PARSER_PROMPT_TEMPLATE.format(
@@ -2,15 +2,24 @@
 Dashboard - Chat-like interface for task management
 """
 import streamlit as st
+from theme import apply_theme
 from database import (
-    get_current_user, get_user_id, get_tasks, create_task, 
-    update_task, mark_task_complete, delete_task, snooze_task,
-    save_transcript, get_transcripts
+    get_current_user, get_user_id, get_task_cache, take_task_changes, create_task, 
+    update_task, mark_task_complete, snooze_task,
+    get_transcripts, load_task_descriptions,
+    user_profile_timezone, save_user_timezone
 )
 from gemini_integration import parse_user_input
-from audio_transcription import transcribe_audio_bytes
+from datetime_normalization import normalize_plan_datetimes, extract_hour
+from audio_transcription import submit_transcription
+from transcription_cache import audio_content_hash
 from utils import filter_tasks_by_view, group_tasks_by_date
+from task_columns import TaskColumns, bucket_views, view_counts
+from task_model import Status
 from email_service import send_task_update_email
+from transcript_log import log_transcript, transcript_writer
+from task_mutations import submit_task_update, reconcile_task_mutations, has_pending_mutations
+from config import TASK_PAGE_SIZE, TASK_REALTIME_POLL_SECONDS
 from datetime import datetime
 import pytz
 
@@ -21,290 +30,8 @@ st.set_page_config(
     layout="wide"
 )
 
-# Custom CSS with theme detection and timezone detection
-st.markdown("""
-<script>
-    // Detect system theme preference
-    function detectTheme() {
-        const prefersDark = window.matchMedia('(prefers-color-scheme: dark)').matches;
-        document.documentElement.setAttribute('data-theme', prefersDark ? 'dark' : 'light');
-        
-        // Listen for theme changes
-        window.matchMedia('(prefers-color-scheme: dark)').addEventListener('change', (e) => {
-            document.documentElement.setAttribute('data-theme', e.matches ? 'dark' : 'light');
-        });
-    }
-    
-    // Detect user timezone
-    function detectTimezone() {
-        try {
-            const timezone = Intl.DateTimeFormat().resolvedOptions().timeZone;
-            const timezoneOffset = new Date().getTimezoneOffset();
-            // Store in a hidden input that Streamlit can read
-            const timezoneInput = document.getElementById('user_timezone');
-            if (timezoneInput) {
-                timezoneInput.value = timezone;
-            } else {
-                const input = document.createElement('input');
-                input.type = 'hidden';
-                input.id = 'user_timezone';
-                input.name = 'user_timezone';
-                input.value = timezone;
-                document.body.appendChild(input);
-            }
-        } catch (e) {
-            console.error('Error detecting timezone:', e);
-        }
-    }
-    
-    // Run on page load
-    if (document.readyState === 'loading') {
-        document.addEventListener('DOMContentLoaded', function() {
-            detectTheme();
-            detectTimezone();
-        });
-    } else {
-        detectTheme();
-        detectTimezone();
-    }
-</script>
-<style>
-    @import url('https://fonts.googleapis.com/css2?family=Libre+Baskerville:wght@400;700&family=DM+Sans:wght@400;500;700&display=swap');
-    
-    /* CSS Variables for Light Theme (default) */
-    :root {
-        --bg-color: #ffffff;
-        --text-color: #454240;
-        --heading-color: #333333;
-        --task-bg: #ffffff;
-        --button-primary: #ff4b4b;
-        --button-primary-hover: #e63946;
-        --border-color: #FF6B6B;
-        --mic-bg: #ffffff;
-        --mic-icon-color: #ff4b4b;
-        --mic-hover-bg: #f5f5f5;
-    }
-    
-    /* CSS Variables for Dark Theme */
-    [data-theme="dark"] {
-        --bg-color: #1a1a1a;
-        --text-color: #e0e0e0;
-        --heading-color: #ffffff;
-        --task-bg: #2a2a2a;
-        --button-primary: #ff4b4b;
-        --button-primary-hover: #ff6b6b;
-        --border-color: #FF6B6B;
-        --mic-bg: #2a2a2a;
-        --mic-icon-color: #ff6b6b;
-        --mic-hover-bg: #3a3a3a;
-    }
-    
-    .main {
-        background-color: var(--bg-color) !important;
-    }
-    
-    body {
-        background-color: var(--bg-color) !important;
-        color: var(--text-color) !important;
-    }
-    
-    h1, h2, h3, h4 {
-        font-family: 'Libre Baskerville', serif;
-        color: var(--heading-color) !important;
-    }
-    
-    body, .stTextInput>div>div>input {
-        font-family: 'DM Sans', sans-serif;
-        color: var(--text-color) !important;
-    }
-    
-    .stTextInput>div>div>input {
-        background-color: var(--bg-color) !important;
-    }
-    
-    .task-item {
-        background-color: var(--task-bg) !important;
-        padding: 15px;
-        margin: 10px 0;
-        border-left: 4px solid var(--border-color);
-        border-radius: 5px;
-    }
-    
-    .priority-p0 { border-left-color: #FF0000; }
-    .priority-high { border-left-color: #FF6B6B; }
-    .priority-medium { border-left-color: #ff4b4b; }
-    .priority-low { border-left-color: #FFB3BA; }
-    
-    /* Completely hide sidebar and prevent any flash */
-    section[data-testid="stSidebar"],
-    div[data-testid="stSidebar"],
-    .css-1d391kg,
-    [data-testid="stSidebar"] {
-        display: none !important;
-        visibility: hidden !important;
-        width: 0 !important;
-        min-width: 0 !important;
-    }
-    
-    /* Hide sidebar toggle button */
-    button[data-testid="baseButton-header"] {
-        display: none !important;
-    }
-    
-    /* Adjust main content to use full width */
-    .main .block-container {
-        padding-left: 1rem;
-        padding-right: 1rem;
-    }
-    
-    /* Navigation header styling */
-    .stButton > button {
-        font-weight: 500;
-        border-radius: 5px;
-    }
-    
-    /* Primary button color */
-    .stButton > button[kind="primary"],
-    button[kind="primary"],
-    [data-testid="baseButton-primary"] {
-        background-color: var(--button-primary) !important;
-        border-color: var(--button-primary) !important;
-    }
-    
-    .stButton > button[kind="primary"]:hover,
-    button[kind="primary"]:hover,
-    [data-testid="baseButton-primary"]:hover {
-        background-color: var(--button-primary-hover) !important;
-        border-color: var(--button-primary-hover) !important;
-    }
-    
-    /* Audio input styling - make microphone button visible and clickable in both themes */
-    [data-testid="stAudioInput"] {
-        background-color: var(--mic-bg) !important;
-    }
-    [data-testid="stAudioInput"] > div {
-        background-color: var(--mic-bg) !important;
-    }
-    /* Hide the waveform timecode (00:00 duration display) */
-    [data-testid="stAudioInputWaveformTimeCode"] {
-        display: none !important;
-    }
-    /* Make button visible, clickable, and same height as text input */
-    [data-testid="stAudioInput"] button {
-        height: 38px !important;
-        min-height: 38px !important;
-        cursor: pointer !important;
-        opacity: 1 !important;
-        visibility: visible !important;
-        pointer-events: auto !important;
-        z-index: 100 !important;
-        background-color: var(--mic-bg) !important;
-        border: 1px solid var(--mic-icon-color) !important;
-        color: var(--mic-icon-color) !important;
-    }
-    /* Microphone icon styling - ensure visibility in dark theme */
-    [data-testid="stAudioInput"] button svg,
-    [data-testid="stAudioInput"] button path {
-        fill: var(--mic-icon-color) !important;
-        stroke: var(--mic-icon-color) !important;
-        color: var(--mic-icon-color) !important;
-    }
-    [data-testid="stAudioInput"] button:not(:disabled):hover {
-        opacity: 0.9 !important;
-        background-color: var(--mic-hover-bg) !important;
-        border-color: var(--button-primary-hover) !important;
-    }
-    [data-testid="stAudioInput"] button:not(:disabled):hover svg,
-    [data-testid="stAudioInput"] button:not(:disabled):hover path {
-        fill: var(--button-primary-hover) !important;
-        stroke: var(--button-primary-hover) !important;
-    }
-    [data-testid="stAudioInput"] button:disabled {
-        opacity: 0.5 !important;
-        cursor: not-allowed !important;
-    }
-    
-    /* Additional dark theme support for Streamlit components */
-    [data-theme="dark"] .stTextInput>div>div>input {
-        background-color: var(--bg-color) !important;
-        color: var(--text-color) !important;
-        border-color: #444 !important;
-    }
-    
-    [data-theme="dark"] .stSelectbox>div>div>select {
-        background-color: var(--bg-color) !important;
-        color: var(--text-color) !important;
-    }
-    
-    [data-theme="dark"] .stDateInput>div>div>input {
-        background-color: var(--bg-color) !important;
-        color: var(--text-color) !important;
-    }
-    
-    [data-theme="dark"] .stTimeInput>div>div>input {
-        background-color: var(--bg-color) !important;
-        color: var(--text-color) !important;
-    }
-    
-    [data-theme="dark"] .stTextArea>div>div>textarea {
-        background-color: var(--bg-color) !important;
-        color: var(--text-color) !important;
-        border-color: #444 !important;
-    }
-    
-    /* Ensure microphone icon is always visible with high contrast */
-    [data-theme="dark"] [data-testid="stAudioInput"] button {
-        border: 2px solid var(--mic-icon-color) !important;
-        box-shadow: 0 0 4px rgba(255, 107, 107, 0.3) !important;
-    }
-    
-    [data-theme="dark"] [data-testid="stAudioInput"] button:not(:disabled):hover {
-        box-shadow: 0 0 8px rgba(255, 107, 107, 0.5) !important;
-    }
-    
-    /* Make download and clear buttons visible */
-    [data-testid="stAudioInput"] a,
-    [data-testid="stAudioInput"] button[aria-label*="download"],
-    [data-testid="stAudioInput"] button[aria-label*="clear"],
-    [data-testid="stAudioInput"] a[download] {
-        opacity: 1 !important;
-        visibility: visible !important;
-        display: inline-block !important;
-        background-color: var(--button-primary) !important;
-        color: white !important;
-        padding: 8px 16px !important;
-        border-radius: 5px !important;
-        margin: 5px !important;
-        font-size: 14px !important;
-        font-weight: 500 !important;
-        text-decoration: none !important;
-        border: none !important;
-        cursor: pointer !important;
-    }
-    
-    [data-testid="stAudioInput"] a:hover,
-    [data-testid="stAudioInput"] button[aria-label*="download"]:hover,
-    [data-testid="stAudioInput"] button[aria-label*="clear"]:hover {
-        background-color: var(--button-primary-hover) !important;
-        opacity: 1 !important;
-    }
-    
-    /* Style the audio player controls */
-    [data-testid="stAudioInput"] audio {
-        width: 100% !important;
-        margin: 10px 0 !important;
-    }
-    
-    /* Make the entire audio input container more visible */
-    [data-testid="stAudioInput"] {
-        padding: 10px !important;
-        background-color: var(--mic-bg) !important;
-        border: 1px solid var(--border-color) !important;
-        border-radius: 5px !important;
-        margin: 10px 0 !important;
-    }
-</style>
-""", unsafe_allow_html=True)
+# Shared theme (static/theme.css + theme.js, served once and cached by the browser)
+apply_theme()
 
 # Check authentication
 user = get_current_user()
@@ -327,40 +54,24 @@ if 'last_input' not in st.session_state:
 # Only use UTC as absolute last resort, and FAIL LOUDLY
 
 if 'user_timezone' not in st.session_state:
-    # Try to get timezone from query params (set by JavaScript)
-    timezone_param = st.query_params.get("tz", None)
-    if timezone_param:
-        st.session_state.user_timezone = timezone_param
-        # Clear the query param to avoid reload loop
-        st.query_params.clear()
+    # The browser reports its timezone with the first script run (st.context) - no JS
+    # round trip or page reload. The last detected timezone is saved in the user's
+    # profile and read back at sign-in, for sessions where the browser doesn't report one.
+    browser_tz = st.context.timezone
+    saved_tz = user_profile_timezone()
+    if browser_tz and browser_tz != 'UTC' and browser_tz in pytz.all_timezones_set:
+        st.session_state.user_timezone = browser_tz
+        if browser_tz != saved_tz:
+            try:
+                save_user_timezone(browser_tz)
+            except Exception:
+                pass  # Detection still works for this session; saving is retried next session
+    elif saved_tz:
+        st.session_state.user_timezone = saved_tz
     else:
-        # Try to detect from system timezone
-        detected_tz = None
-        try:
-            import time
-            tz_name = time.tzname[0] if time.daylight == 0 else time.tzname[1]
-            # Map to pytz timezone
-            tz_mapping = {
-                'PST': 'America/Los_Angeles',
-                'PDT': 'America/Los_Angeles',
-                'EST': 'America/New_York',
-                'EDT': 'America/New_York',
-                'CST': 'America/Chicago',
-                'CDT': 'America/Chicago',
-                'MST': 'America/Denver',
-                'MDT': 'America/Denver',
-            }
-            detected_tz = tz_mapping.get(tz_name, None)
-        except:
-            pass
-        
-        # If we couldn't detect, use America/New_York as default (user is in NY/NJ)
         # NEVER silently default to UTC
-        if not detected_tz:
-            detected_tz = 'America/New_York'  # Default for NY/NJ users
-            st.warning("⚠️ Could not detect timezone from browser. Using America/New_York as default. Please refresh the page to detect your timezone.")
-        
-        st.session_state.user_timezone = detected_tz
+        st.warning("⚠️ Could not detect timezone from browser. Using America/New_York as default.")
+        st.session_state.user_timezone = 'America/New_York'  # Default for NY/NJ users
 
 # Get user timezone - NEVER allow UTC unless explicitly set
 user_tz = st.session_state.get('user_timezone', 'America/New_York')
@@ -381,45 +92,6 @@ with st.expander("🔍 Debug: Timezone Info", expanded=False):
     st.write(f"**Current time in your timezone:** {current_time.strftime('%I:%M %p %Z')}")
     st.write(f"**Current time UTC:** {datetime.utcnow().strftime('%I:%M %p UTC')}")
 
-# Add JavaScript to detect and send timezone to Streamlit (only if not already set)
-# This runs on every page load until timezone is detected
-if 'user_timezone' not in st.session_state or st.session_state.get('user_timezone') == 'UTC':
-    st.markdown("""
-    <script>
-        // Detect timezone and send to Streamlit via query params
-        (function() {
-            try {
-                const timezone = Intl.DateTimeFormat().resolvedOptions().timeZone;
-                console.log('🌍 Detected browser timezone:', timezone);
-                
-                // Validate timezone is not UTC
-                if (timezone === 'UTC') {
-                    console.warn('⚠️ Browser timezone is UTC - this is unusual. Using America/New_York as fallback.');
-                    // Don't set UTC - let Python code handle fallback
-                    return;
-                }
-                
-                const currentUrl = new URL(window.location);
-                const existingTz = currentUrl.searchParams.get('tz');
-                
-                // Only update if timezone changed or not set
-                if (!existingTz || existingTz !== timezone) {
-                    currentUrl.searchParams.set('tz', timezone);
-                    window.history.replaceState({}, '', currentUrl);
-                    console.log('✅ Timezone set in URL:', timezone);
-                    
-                    // Trigger a rerun to update session state
-                    setTimeout(() => {
-                        window.location.reload();
-                    }, 50);
-                }
-            } catch (e) {
-                console.error('❌ Error detecting timezone:', e);
-            }
-        })();
-    </script>
-    """, unsafe_allow_html=True)
-
 # Main content area
 # Header with title and logout button
 header_col1, header_col2 = st.columns([5, 1])
@@ -429,10 +101,55 @@ with header_col2:
     st.markdown("<br>", unsafe_allow_html=True)  # Align button with title
     if st.button("Logout", type="primary", use_container_width=True, key="logout_btn"):
         from database import sign_out
+        # Session end: write queued transcripts while the access token is still valid
+        transcript_writer.flush(timeout=3.0)
         sign_out()
         st.session_state.clear()
         st.switch_page("pages/1_Skkadoosh.py")
 
+# Fold finished background writes into the cache (rolling back the ones that failed)
+for mutation_error in reconcile_task_mutations(user_id):
+    st.error(mutation_error)
+
+@st.fragment(run_every=1)
+def mutation_status():
+    """
+    Poll in-flight task writes. Reruns the page when one was rolled back or
+    all have finished - the page then renders without the poller, so it
+    only ticks while writes are in flight.
+    """
+    errors = reconcile_task_mutations(user_id)
+    if errors:
+        st.session_state.task_mutation_errors = errors
+    if errors or not has_pending_mutations():
+        st.rerun(scope="app")
+
+st.session_state.mutation_poller = has_pending_mutations()
+if st.session_state.mutation_poller:
+    mutation_status()
+
+for mutation_error in st.session_state.pop("task_mutation_errors", []):
+    st.error(mutation_error)
+
+@st.fragment(run_every=TASK_REALTIME_POLL_SECONDS)
+def task_changes():
+    """Apply changes from the user's other tabs/devices; rerun the page only if one changed the cache"""
+    if take_task_changes(user_id):
+        st.rerun(scope="app")
+
+# This full run renders every change received so far
+take_task_changes(user_id)
+task_changes()
+
+# Get tasks from the session cache - fetched once (timestamps parsed into Task objects),
+# then kept up to date by create_task/update_task; descriptions load only for visible tasks
+all_tasks = get_task_cache(user_id).tasks()
+
+# Bucket every task into all views (and count them) in one vectorized pass
+task_columns = TaskColumns(all_tasks)
+view_buckets = bucket_views(task_columns, user_tz)
+view_task_counts = view_counts(view_buckets)
+
 # Navigation header (tabs style below title)
 nav_options = ["Today", "Week", "Upcoming", "Completed"]
 nav_cols = st.columns(len(nav_options))
@@ -451,281 +168,279 @@ for idx, nav_option in enumerate(nav_options):
         is_active = st.session_state.current_view == view_map[nav_option]
         button_type = "primary" if is_active else "secondary"
         
-        if st.button(nav_option, key=f"nav_{nav_option}", use_container_width=True, type=button_type):
+        nav_label = f"{nav_option} ({view_task_counts[view_map[nav_option]]})"
+        if st.button(nav_label, key=f"nav_{nav_option}", use_container_width=True, type=button_type):
             st.session_state.current_view = view_map[nav_option]
             st.rerun()
 
-# Get tasks
-all_tasks = get_tasks(user_id)
+def rerun_after_mutation():
+    """Rerun the row, or the page if that's needed to start the mutation poller"""
+    st.rerun(scope="fragment" if st.session_state.get("mutation_poller") else "app")
+
+@st.fragment
+def task_row(task_id: str, view: str):
+    """
+    One task with its action buttons and edit/snooze boxes.
+
+    Runs as a fragment: its buttons rerun only this row. Mutations are optimistic -
+    the session task cache changes at once and the database write, transcript and
+    email run in the background (see task_mutations). The first write of a burst
+    reruns the page to start the mutation poller, which reruns it again once the
+    writes finish (refreshing view counts).
+    """
+    task = get_task_cache(user_id).get(task_id)
+    if task is None or not filter_tasks_by_view([task], view, user_tz):
+        # Completed, deleted or moved to another view since the page was rendered
+        return
+    
+    with st.container():
+        priority = task.priority.label
+        priority_class = f"priority-{priority}"
+
+        col1, col2 = st.columns([5, 1])
+
+        with col1:
+            description_html = f'<p style="color: var(--text-color); margin: 5px 0;">{task.description}</p>' if task.description else ''
+            # Due date parsed at fetch time; conversion to user's timezone is cached on the task
+            due_local = task.due_local(user_tz)
+            if due_local is not None:
+                due_date_str = due_local.strftime("%b %d, %Y %I:%M %p")
+            else:
+                due_date_str = 'Unknown date' if task.due_invalid else 'No due date'
+
+            st.markdown(f"""
+            <div class="task-item {priority_class}">
+                <h4 style="margin: 0; color: var(--heading-color);">{task.title or 'Untitled'}</h4>
+                {description_html}
+                Priority: {priority.upper()} | Due: {due_date_str}
+            </div>
+            """, unsafe_allow_html=True)
+
+        with col2:
+            # Task action buttons (center aligned)
+            action_cols = st.columns(4)
+
+            with action_cols[0]:
+                if st.button("✓", key=f"done_{task.id}", help="Mark done", use_container_width=True):
+                    submit_task_update(user_id, task.id,
+                                       {"status": "completed", "completed_at": datetime.now(pytz.UTC).isoformat()},
+                                       "mark done", transcript=f"Marked task '{task.title}' as done",
+                                       user_email=user_email)
+                    rerun_after_mutation()
+
+            with action_cols[1]:
+                if st.button("✏️", key=f"edit_{task.id}", help="Edit", use_container_width=True):
+                    st.session_state[f"editing_{task.id}"] = True
+                    st.rerun(scope="fragment")
+
+            with action_cols[2]:
+                if st.button("⏰", key=f"snooze_{task.id}", help="Snooze", use_container_width=True):
+                    st.session_state[f"snoozing_{task.id}"] = True
+                    st.rerun(scope="fragment")
+
+            with action_cols[3]:
+                if st.button("🗑️", key=f"delete_{task.id}", help="Delete", use_container_width=True):
+                    submit_task_update(user_id, task.id, {"status": "deleted"}, "delete",
+                                       user_email=user_email)
+                    rerun_after_mutation()
+
+        st.divider()
+
+        # Edit box (moved below task section)
+        if st.session_state.get(f"editing_{task.id}"):
+            with st.container():
+                st.markdown(f"**Edit: {task.title}**")
+                new_title = st.text_input("Title", value=task.title, key=f"edit_title_{task.id}")
+                new_desc = st.text_area("Description", value=task.description, key=f"edit_desc_{task.id}")
+                new_priority = st.selectbox("Priority", ["p0", "high", "medium", "low"], 
+                                           index=["p0", "high", "medium", "low"].index(task.priority.label),
+                                           key=f"edit_priority_{task.id}")
+                # Date and time pickers for due date
+                col_date, col_time = st.columns(2)
+                with col_date:
+                    # Parse existing due date if available
+                    existing_date = None
+                    existing_time = None
+                    due_local = task.due_local(user_tz)
+                    if due_local is not None:
+                        # Stored datetime in user's current timezone for editing
+                        existing_date = due_local.date()
+                        existing_time = due_local.time()
+
+                    new_due_date_obj = st.date_input("Due Date", value=existing_date if existing_date else datetime.now().date(), 
+                                                     key=f"edit_date_{task.id}", 
+                                                     min_value=datetime.now().date())
+                with col_time:
+                    new_due_time = st.time_input("Due Time", value=existing_time if existing_time else datetime.now().time(), 
+                                                 key=f"edit_time_{task.id}")
+
+                # Combine date and time into ISO format
+                if new_due_date_obj and new_due_time:
+                    local_tz = datetime.now().astimezone().tzinfo
+                    new_due_date = datetime.combine(new_due_date_obj, new_due_time, local_tz).isoformat()
+                else:
+                    new_due_date = None
+
+                col_save, col_cancel = st.columns(2)
+                save_button_clicked = False
+                cancel_button_clicked = False
+
+                save_button_clicked = False
+                cancel_button_clicked = False
+
+                col_save, col_cancel = st.columns(2)
+                with col_save:
+                    if st.button("Save", key=f"save_edit_{task.id}"):
+                        save_button_clicked = True
+                with col_cancel:
+                    if st.button("Cancel", key=f"cancel_edit_{task.id}"):
+                        cancel_button_clicked = True
+
+                # Process Save button - ONLY send email if Save was clicked, NOT Cancel
+                if save_button_clicked and not cancel_button_clicked:
+                    # Save button clicked - update task and send email
+                    updates = {"title": new_title, "description": new_desc, "priority": new_priority}
+                    if new_due_date:
+                        updates["due_date"] = new_due_date
+                    else:
+                        updates["due_date"] = None
+                    st.session_state[f"editing_{task.id}"] = False
+                    # Send email ONLY when Save is explicitly clicked
+                    submit_task_update(user_id, task.id, updates, "save", user_email=user_email)
+                    rerun_after_mutation()
+                elif cancel_button_clicked:
+                    # Cancel button clicked - do NOT update task, do NOT send email
+                    st.session_state[f"editing_{task.id}"] = False
+                    st.rerun(scope="fragment")
+                st.divider()
+
+        # Snooze box (moved below task section)
+        if st.session_state.get(f"snoozing_{task.id}"):
+            with st.container():
+                st.markdown(f"**Snooze: {task.title}**")
+                snooze_option = st.selectbox("Snooze until", 
+                    ["5 min", "10 min", "15 min", "30 min", "1 hr", "2 hr", "Tomorrow 9am", "Next week", "Custom"],
+                    key=f"snooze_option_{task.id}")
+
+                custom_date = None
+                custom_time = None
+                custom_ampm = "AM"
+                if snooze_option == "Custom":
+                    col_date, col_time, col_ampm = st.columns(3)
+                    with col_date:
+                        custom_date = st.date_input("Date", key=f"custom_date_{task.id}", min_value=datetime.now().date())
+                    with col_time:
+                        custom_time = st.time_input("Time", key=f"custom_time_{task.id}")
+
+                    snooze_button_clicked = False
+                    cancel_snooze_clicked = False
+
+                    col_snooze, col_cancel_snooze = st.columns(2)
+                    with col_snooze:
+                        if st.button("Snooze", key=f"confirm_snooze_{task.id}"):
+                            snooze_button_clicked = True
+                    with col_cancel_snooze:
+                        if st.button("Cancel", key=f"cancel_snooze_{task.id}"):
+                            cancel_snooze_clicked = True
+
+                    # Process Snooze button - ONLY send email if Snooze was clicked, NOT Cancel
+                    if snooze_button_clicked and not cancel_snooze_clicked:
+                        from datetime import timedelta
+                        local_tz = datetime.now().astimezone().tzinfo
+                        now = datetime.now(local_tz)
+
+                        if custom_date and custom_time:
+                            snooze_until = datetime.combine(custom_date, custom_time, local_tz).isoformat()
+                        else:
+                            snooze_until = (now + timedelta(hours=2)).isoformat()
+
+                        st.session_state[f"snoozing_{task.id}"] = False
+                        # Send email ONLY when Snooze is explicitly clicked
+                        submit_task_update(user_id, task.id, {"status": "snoozed", "snooze_until": snooze_until},
+                                           "snooze", user_email=user_email)
+                        rerun_after_mutation()
+                    elif cancel_snooze_clicked:
+                        # Cancel snooze - do NOT send email, just close snooze box
+                        st.session_state[f"snoozing_{task.id}"] = False
+                        st.rerun(scope="fragment")
+                else:
+                    snooze_button_clicked = False
+                    cancel_snooze_clicked = False
+
+                    col_snooze, col_cancel_snooze = st.columns(2)
+                    with col_snooze:
+                        if st.button("Snooze", key=f"confirm_snooze_{task.id}"):
+                            snooze_button_clicked = True
+                    with col_cancel_snooze:
+                        if st.button("Cancel", key=f"cancel_snooze_{task.id}"):
+                            cancel_snooze_clicked = True
+
+                    # Process Snooze button - ONLY send email if Snooze was clicked, NOT Cancel
+                    if snooze_button_clicked and not cancel_snooze_clicked:
+                        from datetime import timedelta
+                        local_tz = datetime.now().astimezone().tzinfo
+                        now = datetime.now(local_tz)
+
+                        if snooze_option == "5 min":
+                            snooze_until = (now + timedelta(minutes=5)).isoformat()
+                        elif snooze_option == "10 min":
+                            snooze_until = (now + timedelta(minutes=10)).isoformat()
+                        elif snooze_option == "15 min":
+                            snooze_until = (now + timedelta(minutes=15)).isoformat()
+                        elif snooze_option == "30 min":
+                            snooze_until = (now + timedelta(minutes=30)).isoformat()
+                        elif snooze_option == "1 hr":
+                            snooze_until = (now + timedelta(hours=1)).isoformat()
+                        elif snooze_option == "2 hr":
+                            snooze_until = (now + timedelta(hours=2)).isoformat()
+                        elif snooze_option == "Tomorrow 9am":
+                            tomorrow = now + timedelta(days=1)
+                            snooze_until = tomorrow.replace(hour=9, minute=0, second=0, microsecond=0).isoformat()
+                        elif snooze_option == "Next week":
+                            days_until_next_week = 7 - now.weekday()
+                            snooze_until = (now + timedelta(days=days_until_next_week)).isoformat()
+
+                        st.session_state[f"snoozing_{task.id}"] = False
+                        # Send email ONLY when Snooze is explicitly clicked
+                        submit_task_update(user_id, task.id, {"status": "snoozed", "snooze_until": snooze_until},
+                                           "snooze", user_email=user_email)
+                        rerun_after_mutation()
+                    elif cancel_snooze_clicked:
+                        # Cancel snooze - do NOT send email, just close snooze box
+                        st.session_state[f"snoozing_{task.id}"] = False
+                        st.rerun(scope="fragment")
+                st.divider()
+
+def visible_row_count(view: str) -> int:
+    """Rows of view to render: the first TASK_PAGE_SIZE, extended by each "Load more" click"""
+    return st.session_state.get(f"visible_rows_{view}", TASK_PAGE_SIZE)
+
+def load_more_button(view: str, shown: int, total: int):
+    """Show how many rows are hidden and a button that renders the next page"""
+    if shown >= total:
+        return
+    st.caption(f"Showing {shown} of {total} tasks")
+    if st.button(f"Load more ({total - shown} remaining)", key=f"load_more_{view}", use_container_width=True):
+        st.session_state[f"visible_rows_{view}"] = visible_row_count(view) + TASK_PAGE_SIZE
+        st.rerun()
 
 # Display tasks based on current view (no header - navigation shows the view)
 if st.session_state.current_view in ["today", "week", "upcoming"]:
-    user_tz = st.session_state.get('user_timezone', 'UTC')
-    view_tasks = filter_tasks_by_view(all_tasks, st.session_state.current_view, user_timezone=user_tz)
+    view_indices = view_buckets[st.session_state.current_view]
+    view_tasks = task_columns.take(view_indices[:visible_row_count(st.session_state.current_view)])
+    load_task_descriptions(view_tasks)
     
     if not view_tasks:
         st.info(f"No tasks for {st.session_state.current_view}. Add a task below!")
     else:
         for task in view_tasks:
-            with st.container():
-                priority = task.get("priority", "medium")
-                priority_class = f"priority-{priority}"
-                
-                col1, col2 = st.columns([5, 1])
-                
-                with col1:
-                    description_html = f'<p style="color: var(--text-color); margin: 5px 0;">{task.get("description", "")}</p>' if task.get('description') else ''
-                    due_date_str = task.get('due_date', '') if task.get('due_date') else 'No due date'
-                    if due_date_str != 'No due date':
-                        try:
-                            # Parse the stored datetime (already in user's timezone with correct offset)
-                            # Just parse and display - NO conversion needed
-                            dt = datetime.fromisoformat(due_date_str.replace('Z', '+00:00'))
-                            # Display in the timezone it was stored in (user's timezone)
-                            # Get user timezone from session state or use stored timezone
-                            if 'user_timezone' in st.session_state:
-                                user_tz = pytz.timezone(st.session_state['user_timezone'])
-                                # Convert to user's timezone for display (should be same, but ensures consistency)
-                                if dt.tzinfo:
-                                    dt = dt.astimezone(user_tz)
-                                else:
-                                    dt = user_tz.localize(dt)
-                            due_date_str = dt.strftime("%b %d, %Y %I:%M %p")
-                        except Exception as e:
-                            # If parsing fails, show raw string
-                            pass
-                    
-                    st.markdown(f"""
-                    <div class="task-item {priority_class}">
-                        <h4 style="margin: 0; color: var(--heading-color);">{task.get('title', 'Untitled')}</h4>
-                        {description_html}
-                        Priority: {priority.upper()} | Due: {due_date_str}
-                    </div>
-                    """, unsafe_allow_html=True)
-                
-                with col2:
-                    # Task action buttons (center aligned)
-                    action_cols = st.columns(4)
-                    
-                    with action_cols[0]:
-                        if st.button("✓", key=f"done_{task['id']}", help="Mark done", use_container_width=True):
-                            mark_task_complete(task['id'], user_id)
-                            save_transcript(user_id, f"Marked task '{task.get('title')}' as done")
-                            try:
-                                send_task_update_email(user_email, user_id, "updated")
-                            except:
-                                pass
-                            st.rerun()
-                    
-                    with action_cols[1]:
-                        if st.button("✏️", key=f"edit_{task['id']}", help="Edit", use_container_width=True):
-                            st.session_state[f"editing_{task['id']}"] = True
-                            st.rerun()
-                    
-                    with action_cols[2]:
-                        if st.button("⏰", key=f"snooze_{task['id']}", help="Snooze", use_container_width=True):
-                            st.session_state[f"snoozing_{task['id']}"] = True
-                            st.rerun()
-                    
-                    with action_cols[3]:
-                        if st.button("🗑️", key=f"delete_{task['id']}", help="Delete", use_container_width=True):
-                            delete_task(task['id'], user_id)
-                            try:
-                                send_task_update_email(user_email, user_id, "updated")
-                            except:
-                                pass
-                            st.rerun()
-                
-                st.divider()
-                
-                # Edit box (moved below task section)
-                if st.session_state.get(f"editing_{task['id']}"):
-                    with st.container():
-                        st.markdown(f"**Edit: {task.get('title')}**")
-                        new_title = st.text_input("Title", value=task.get('title', ''), key=f"edit_title_{task['id']}")
-                        new_desc = st.text_area("Description", value=task.get('description', ''), key=f"edit_desc_{task['id']}")
-                        new_priority = st.selectbox("Priority", ["p0", "high", "medium", "low"], 
-                                                   index=["p0", "high", "medium", "low"].index(task.get('priority', 'medium')),
-                                                   key=f"edit_priority_{task['id']}")
-                        # Date and time pickers for due date
-                        col_date, col_time = st.columns(2)
-                        with col_date:
-                            # Parse existing due date if available
-                            existing_date = None
-                            existing_time = None
-                            if task.get('due_date'):
-                                try:
-                                    # Parse stored datetime (already in user's timezone)
-                                    dt = datetime.fromisoformat(task.get('due_date').replace('Z', '+00:00'))
-                                    # Convert to user's current timezone for editing
-                                    if 'user_timezone' in st.session_state:
-                                        user_tz = pytz.timezone(st.session_state['user_timezone'])
-                                        if dt.tzinfo:
-                                            dt = dt.astimezone(user_tz)
-                                        else:
-                                            dt = user_tz.localize(dt)
-                                    existing_date = dt.date()
-                                    existing_time = dt.time()
-                                except:
-                                    pass
-                            
-                            new_due_date_obj = st.date_input("Due Date", value=existing_date if existing_date else datetime.now().date(), 
-                                                             key=f"edit_date_{task['id']}", 
-                                                             min_value=datetime.now().date())
-                        with col_time:
-                            new_due_time = st.time_input("Due Time", value=existing_time if existing_time else datetime.now().time(), 
-                                                         key=f"edit_time_{task['id']}")
-                        
-                        # Combine date and time into ISO format
-                        if new_due_date_obj and new_due_time:
-                            local_tz = datetime.now().astimezone().tzinfo
-                            new_due_date = datetime.combine(new_due_date_obj, new_due_time, local_tz).isoformat()
-                        else:
-                            new_due_date = None
-                        
-                        col_save, col_cancel = st.columns(2)
-                        save_button_clicked = False
-                        cancel_button_clicked = False
-                        
-                        save_button_clicked = False
-                        cancel_button_clicked = False
-                        
-                        col_save, col_cancel = st.columns(2)
-                        with col_save:
-                            if st.button("Save", key=f"save_edit_{task['id']}"):
-                                save_button_clicked = True
-                        with col_cancel:
-                            if st.button("Cancel", key=f"cancel_edit_{task['id']}"):
-                                cancel_button_clicked = True
-                        
-                        # Process Save button - ONLY send email if Save was clicked, NOT Cancel
-                        if save_button_clicked and not cancel_button_clicked:
-                            # Save button clicked - update task and send email
-                            updates = {"title": new_title, "description": new_desc, "priority": new_priority}
-                            if new_due_date:
-                                updates["due_date"] = new_due_date
-                            else:
-                                updates["due_date"] = None
-                            update_task(task['id'], user_id, **updates)
-                            st.session_state[f"editing_{task['id']}"] = False
-                            # Send email ONLY when Save is explicitly clicked
-                            try:
-                                send_task_update_email(user_email, user_id, "updated")
-                            except:
-                                pass
-                            st.rerun()
-                        elif cancel_button_clicked:
-                            # Cancel button clicked - do NOT update task, do NOT send email
-                            st.session_state[f"editing_{task['id']}"] = False
-                            st.rerun()
-                        st.divider()
-                
-                # Snooze box (moved below task section)
-                if st.session_state.get(f"snoozing_{task['id']}"):
-                    with st.container():
-                        st.markdown(f"**Snooze: {task.get('title')}**")
-                        snooze_option = st.selectbox("Snooze until", 
-                            ["5 min", "10 min", "15 min", "30 min", "1 hr", "2 hr", "Tomorrow 9am", "Next week", "Custom"],
-                            key=f"snooze_option_{task['id']}")
-                        
-                        custom_date = None
-                        custom_time = None
-                        custom_ampm = "AM"
-                        if snooze_option == "Custom":
-                            col_date, col_time, col_ampm = st.columns(3)
-                            with col_date:
-                                custom_date = st.date_input("Date", key=f"custom_date_{task['id']}", min_value=datetime.now().date())
-                            with col_time:
-                                custom_time = st.time_input("Time", key=f"custom_time_{task['id']}")
-                            
-                            snooze_button_clicked = False
-                            cancel_snooze_clicked = False
-                            
-                            col_snooze, col_cancel_snooze = st.columns(2)
-                            with col_snooze:
-                                if st.button("Snooze", key=f"confirm_snooze_{task['id']}"):
-                                    snooze_button_clicked = True
-                            with col_cancel_snooze:
-                                if st.button("Cancel", key=f"cancel_snooze_{task['id']}"):
-                                    cancel_snooze_clicked = True
-                            
-                            # Process Snooze button - ONLY send email if Snooze was clicked, NOT Cancel
-                            if snooze_button_clicked and not cancel_snooze_clicked:
-                                from datetime import timedelta
-                                local_tz = datetime.now().astimezone().tzinfo
-                                now = datetime.now(local_tz)
-                                
-                                if custom_date and custom_time:
-                                    snooze_until = datetime.combine(custom_date, custom_time, local_tz).isoformat()
-                                else:
-                                    snooze_until = (now + timedelta(hours=2)).isoformat()
-                                
-                                snooze_task(task['id'], user_id, snooze_until)
-                                st.session_state[f"snoozing_{task['id']}"] = False
-                                # Send email ONLY when Snooze is explicitly clicked
-                                try:
-                                    send_task_update_email(user_email, user_id, "updated")
-                                except:
-                                    pass
-                                st.rerun()
-                            elif cancel_snooze_clicked:
-                                # Cancel snooze - do NOT send email, just close snooze box
-                                st.session_state[f"snoozing_{task['id']}"] = False
-                                st.rerun()
-                        else:
-                            snooze_button_clicked = False
-                            cancel_snooze_clicked = False
-                            
-                            col_snooze, col_cancel_snooze = st.columns(2)
-                            with col_snooze:
-                                if st.button("Snooze", key=f"confirm_snooze_{task['id']}"):
-                                    snooze_button_clicked = True
-                            with col_cancel_snooze:
-                                if st.button("Cancel", key=f"cancel_snooze_{task['id']}"):
-                                    cancel_snooze_clicked = True
-                            
-                            # Process Snooze button - ONLY send email if Snooze was clicked, NOT Cancel
-                            if snooze_button_clicked and not cancel_snooze_clicked:
-                                from datetime import timedelta
-                                local_tz = datetime.now().astimezone().tzinfo
-                                now = datetime.now(local_tz)
-                                
-                                if snooze_option == "5 min":
-                                    snooze_until = (now + timedelta(minutes=5)).isoformat()
-                                elif snooze_option == "10 min":
-                                    snooze_until = (now + timedelta(minutes=10)).isoformat()
-                                elif snooze_option == "15 min":
-                                    snooze_until = (now + timedelta(minutes=15)).isoformat()
-                                elif snooze_option == "30 min":
-                                    snooze_until = (now + timedelta(minutes=30)).isoformat()
-                                elif snooze_option == "1 hr":
-                                    snooze_until = (now + timedelta(hours=1)).isoformat()
-                                elif snooze_option == "2 hr":
-                                    snooze_until = (now + timedelta(hours=2)).isoformat()
-                                elif snooze_option == "Tomorrow 9am":
-                                    tomorrow = now + timedelta(days=1)
-                                    snooze_until = tomorrow.replace(hour=9, minute=0, second=0, microsecond=0).isoformat()
-                                elif snooze_option == "Next week":
-                                    days_until_next_week = 7 - now.weekday()
-                                    snooze_until = (now + timedelta(days=days_until_next_week)).isoformat()
-                                
-                                snooze_task(task['id'], user_id, snooze_until)
-                                st.session_state[f"snoozing_{task['id']}"] = False
-                                # Send email ONLY when Snooze is explicitly clicked
-                                try:
-                                    send_task_update_email(user_email, user_id, "updated")
-                                except:
-                                    pass
-                                st.rerun()
-                            elif cancel_snooze_clicked:
-                                # Cancel snooze - do NOT send email, just close snooze box
-                                st.session_state[f"snoozing_{task['id']}"] = False
-                                st.rerun()
-                        st.divider()
+            task_row(task.id, st.session_state.current_view)
+        load_more_button(st.session_state.current_view, len(view_tasks), len(view_indices))
 
 elif st.session_state.current_view == "completed":
     # Header removed - navigation shows selected view
-    completed_tasks = [t for t in all_tasks if t.get("status") == "completed"]
+    completed_indices = view_buckets["completed"]
+    completed_tasks = task_columns.take(completed_indices[:visible_row_count("completed")])
     
     if not completed_tasks:
         st.info("No completed tasks yet.")
@@ -734,8 +449,9 @@ elif st.session_state.current_view == "completed":
         for date_key in sorted(grouped.keys(), reverse=True):
             st.subheader(date_key)
             for task in grouped[date_key]:
-                st.markdown(f"- ~~{task.get('title', 'Untitled')}~~")
+                st.markdown(f"- ~~{task.title or 'Untitled'}~~")
             st.divider()
+        load_more_button("completed", len(completed_tasks), len(completed_indices))
 
 
 # Input area at bottom (ChatGPT-style)
@@ -776,57 +492,73 @@ with input_col1:
 
 with input_col2:
     # Small microphone button - positioned next to text input, same height, custom background
-    # Ensure the column doesn't block clicks
-    st.markdown("""
-    <style>
-    [data-testid="column"]:has([data-testid="stAudioInput"]) {
-        pointer-events: auto !important;
-    }
-    </style>
-    """, unsafe_allow_html=True)
+    # (styles in static/theme.css)
     audio_data = st.audio_input("🎤", label_visibility="collapsed", key="audio_recorder")
 
 # Process audio if recorded (st.audio_input processes after recording completes)
 # Use a flag to track if we've already processed this audio to avoid infinite loop
 if audio_data is not None:
-    # Check if we've already processed this audio (using audio_data size as identifier)
+    # Check if we've already processed this audio (using a content hash as identifier)
     try:
         audio_bytes = audio_data.read()
-        audio_id = f"audio_{len(audio_bytes)}"
+        audio_id = f"audio_{audio_content_hash(audio_bytes)}"
         audio_data.seek(0)  # Reset file pointer
     except:
         audio_id = "audio_0"
         audio_bytes = None
     
     if audio_bytes and ('last_processed_audio' not in st.session_state or st.session_state.last_processed_audio != audio_id):
-        with st.spinner("Transcribing audio..."):
-            try:
-                # Transcribe using Gemini 2.5 Flash
-                transcribed_text = transcribe_audio_bytes(audio_bytes, mime_type="audio/webm")
-                
-                if not transcribed_text or not transcribed_text.strip():
-                    st.error("Transcription returned empty text. Please try recording again.")
-                    st.session_state.last_processed_audio = audio_id
-                else:
-                    # Store transcribed text in a temporary session state key (don't show message, don't auto-process)
-                    st.session_state.transcribed_text = transcribed_text
-                    st.session_state.last_processed_audio = audio_id
-                    st.rerun()
-            except Exception as e:
-                error_msg = str(e)
-                # Show detailed error message
-                st.error(f"❌ **Error transcribing audio:** {error_msg}")
-                
-                # Show full error details in expander for debugging
-                with st.expander("🔍 Show detailed error information"):
-                    import traceback
-                    st.code(traceback.format_exc(), language="python")
-                    st.write("**Error type:**", type(e).__name__)
-                    st.write("**Error message:**", str(e))
-                
-                st.info("💡 **Tips:**\n- Make sure your microphone is working\n- Check your internet connection\n- Verify your Gemini API key is valid\n- Try recording again with clear audio")
-                
-                st.session_state.last_processed_audio = audio_id  # Mark as processed even on error to avoid loop
+        # Transcribe in the background so the rest of the page stays usable
+        mime_type = audio_data.type or "audio/wav"  # st.audio_input records WAV
+        st.session_state.transcription_job = submit_transcription(audio_bytes, mime_type=mime_type, user_id=user_id)
+        st.session_state.last_processed_audio = audio_id
+
+@st.fragment(run_every=1)
+def transcription_status():
+    """Poll the background transcription job; only this fragment reruns while waiting"""
+    job = st.session_state.get('transcription_job')
+    if job is None:
+        return
+    if not job.done():
+        st.caption("🎤 Transcribing audio... you can keep working in the meantime.")
+        return
+    
+    del st.session_state.transcription_job
+    try:
+        transcribed_text = job.result()
+        if not transcribed_text or not transcribed_text.strip():
+            st.session_state.transcription_error = {"message": "Transcription returned empty text. Please try recording again."}
+        else:
+            # Store transcribed text in a temporary session state key (don't show message, don't auto-process)
+            st.session_state.transcribed_text = transcribed_text
+    except Exception as e:
+        import traceback
+        st.session_state.transcription_error = {
+            "message": str(e),
+            "type": type(e).__name__,
+            "traceback": "".join(traceback.format_exception(e))
+        }
+    # Full rerun so the text input picks up the transcript (or the error is shown)
+    st.rerun(scope="app")
+
+if 'transcription_job' in st.session_state:
+    transcription_status()
+
+if 'transcription_error' in st.session_state:
+    transcription_error = st.session_state.pop('transcription_error')
+    if "type" not in transcription_error:
+        st.error(transcription_error["message"])
+    else:
+        # Show detailed error message
+        st.error(f"❌ **Error transcribing audio:** {transcription_error['message']}")
+        
+        # Show full error details in expander for debugging
+        with st.expander("🔍 Show detailed error information"):
+            st.code(transcription_error["traceback"], language="python")
+            st.write("**Error type:**", transcription_error["type"])
+            st.write("**Error message:**", transcription_error["message"])
+        
+        st.info("💡 **Tips:**\n- Make sure your microphone is working\n- Check your internet connection\n- Verify your Gemini API key is valid\n- Try recording again with clear audio")
 
 # Send button
 if st.button("Send", type="primary", use_container_width=True, key="send_btn"):
@@ -841,10 +573,13 @@ if st.button("Send", type="primary", use_container_width=True, key="send_btn"):
     if input_text:
         try:
             # Save transcript
-            save_transcript(user_id, input_text)
+            log_transcript(user_id, input_text)
             
             # Get incomplete tasks for context
-            incomplete_tasks = [t for t in all_tasks if t.get("status") != "completed"]
+            incomplete_tasks = [t for t in all_tasks if t.status != Status.COMPLETED]
+            incomplete_task_ids = {t.id for t in incomplete_tasks}
+            # Title/embedding matching over open tasks, maintained incrementally by the task cache
+            task_cache = get_task_cache(user_id)
             
             # Parse input with Gemini
             with st.spinner("Processing your input..."):
@@ -857,7 +592,7 @@ if st.button("Send", type="primary", use_container_width=True, key="send_btn"):
                         st.session_state.user_timezone = 'America/New_York'
                     
                     # user_timezone is now REQUIRED - no default
-                    result = parse_user_input(input_text, incomplete_tasks, user_timezone=user_tz)
+                    result = parse_user_input(input_text, incomplete_tasks, user_timezone=user_tz, user_id=user_id)
                     
                     # Process actions
                     action_type = result.get("action_type", "")
@@ -866,48 +601,35 @@ if st.button("Send", type="primary", use_container_width=True, key="send_btn"):
                         st.info(result.get("clarification_question", "Could you clarify?"))
                     else:
                         tasks_added = 0
+                        # What this request changed, for the update email
+                        email_changes = {"created": [], "updated": [], "completed": []}
                         # Add new tasks
+                        raw_tasks_to_add = result.get("tasks_to_add", [])
+                        
+                        # Normalize every date in the plan to user's timezone in one pass
+                        result = normalize_plan_datetimes(result, user_tz)
                         tasks_to_add = result.get("tasks_to_add", [])
                         
                         if not tasks_to_add:
                             st.warning("No tasks to add. Gemini may not have detected a task in your input. Try being more explicit, e.g., 'Add task: Buy groceries'")
                         
-                        for task_data in tasks_to_add:
+                        for raw_task_data, task_data in zip(raw_tasks_to_add, tasks_to_add):
                             try:
-                                # Normalize dates to user's timezone
-                                from gemini_integration import normalize_datetime_to_timezone
                                 due_date = task_data.get("due_date")
                                 reminder_time = task_data.get("reminder_time")
                                 
                                 # Debug: Show what Gemini returned and validate
                                 if due_date:
-                                    st.write(f"🔍 Debug: Gemini returned due_date: {due_date}")
-                                    original_hour = None
-                                    try:
-                                        # Extract hour from Gemini's response for validation
-                                        import re
-                                        time_match = re.search(r'T(\d{2}):(\d{2})', due_date)
-                                        if time_match:
-                                            original_hour = int(time_match.group(1))
-                                    except:
-                                        pass
-                                    
-                                    due_date = normalize_datetime_to_timezone(due_date, user_tz)
+                                    st.write(f"🔍 Debug: Gemini returned due_date: {raw_task_data.get('due_date')}")
                                     st.write(f"🔍 Debug: Normalized to {user_tz}: {due_date}")
                                     
                                     # Validate: hour should be preserved
-                                    if original_hour is not None:
-                                        try:
-                                            normalized_hour = int(due_date.split('T')[1].split(':')[0])
-                                            if normalized_hour != original_hour:
-                                                st.warning(f"⚠️ WARNING: Hour changed from {original_hour} to {normalized_hour} - this should not happen!")
-                                        except:
-                                            pass
-                                
-                                if reminder_time:
-                                    reminder_time = normalize_datetime_to_timezone(reminder_time, user_tz)
+                                    original_hour = extract_hour(raw_task_data.get("due_date"))
+                                    normalized_hour = extract_hour(due_date)
+                                    if original_hour is not None and normalized_hour != original_hour:
+                                        st.warning(f"⚠️ WARNING: Hour changed from {original_hour} to {normalized_hour} - this should not happen!")
                                 
-                                create_task(
+                                created = create_task(
                                     user_id=user_id,
                                     title=task_data.get("title"),
                                     description=task_data.get("description", ""),
@@ -915,6 +637,8 @@ if st.button("Send", type="primary", use_container_width=True, key="send_btn"):
                                     priority=task_data.get("priority", "medium"),
                                     reminder_time=reminder_time
                                 )
+                                if created:
+                                    email_changes["created"].append(created)
                                 tasks_added += 1
                             except Exception as task_error:
                                 st.error(f"Error creating task: {str(task_error)}")
@@ -932,15 +656,14 @@ if st.button("Send", type="primary", use_container_width=True, key="send_btn"):
                             task_title_ref = update_data.get("task_title")  # In case Gemini returns title instead
                             
                             # If task_id is not a valid UUID, try to match by title
-                            if task_id and task_id not in [str(t['id']) for t in incomplete_tasks]:
+                            if task_id and task_id not in incomplete_task_ids:
                                 # Try to find task by title reference
                                 if task_title_ref:
-                                    from gemini_integration import match_task_id_by_reference
-                                    matched_id = match_task_id_by_reference(task_title_ref, incomplete_tasks)
+                                    matched_id = task_cache.resolve_reference(task_title_ref)
                                     if matched_id:
                                         task_id = matched_id
                             
-                            if task_id and task_id in [str(t['id']) for t in incomplete_tasks]:
+                            if task_id and task_id in incomplete_task_ids:
                                 updates = {}
                                 if update_data.get("title"):
                                     updates["title"] = update_data["title"]
@@ -948,32 +671,35 @@ if st.button("Send", type="primary", use_container_width=True, key="send_btn"):
                                     updates["due_date"] = update_data["due_date"]
                                 if update_data.get("priority"):
                                     updates["priority"] = update_data["priority"]
+                                updated = None
                                 if update_data.get("status") == "snoozed" and update_data.get("snooze_until"):
-                                    snooze_task(task_id, user_id, update_data["snooze_until"])
+                                    updated = snooze_task(task_id, user_id, update_data["snooze_until"])
                                 elif updates:
-                                    update_task(task_id, user_id, **updates)
+                                    updated = update_task(task_id, user_id, **updates)
+                                if updated:
+                                    email_changes["updated"].append(updated)
                         
                         # Complete tasks - handle both task IDs and task titles
                         task_ids_to_complete = result.get("tasks_to_complete", [])
                         for task_ref in task_ids_to_complete:
                             # If it's a UUID, use it directly
-                            if task_ref in [str(t['id']) for t in incomplete_tasks]:
-                                mark_task_complete(task_ref, user_id)
+                            if task_ref in incomplete_task_ids:
+                                completed = mark_task_complete(task_ref, user_id)
                             else:
                                 # Try to match by title
-                                from gemini_integration import match_task_id_by_reference
-                                matched_id = match_task_id_by_reference(task_ref, incomplete_tasks)
-                                if matched_id:
-                                    mark_task_complete(matched_id, user_id)
+                                matched_id = task_cache.resolve_reference(task_ref)
+                                completed = mark_task_complete(matched_id, user_id) if matched_id else None
+                            if completed:
+                                email_changes["completed"].append(completed)
                         
                         # Switch view if suggested
                         suggested_view = result.get("suggested_view", "today")
                         if suggested_view:
                             st.session_state.current_view = suggested_view
                         
-                        # Send update email (don't fail if email fails)
+                        # Send update email listing just the changed tasks (don't fail if email fails)
                         try:
-                            send_task_update_email(user_email, user_id, "updated")
+                            send_task_update_email(user_email, user_id, "updated", changes=email_changes)
                         except Exception:
                             pass  # Email failure is non-critical
                         
@@ -2,6 +2,7 @@
 Reset Password page
 """
 import streamlit as st
+from theme import apply_theme
 from database import reset_password_for_email, get_current_user
 
 # Page configuration
@@ -10,101 +11,8 @@ st.set_page_config(
     page_icon="✅"
 )
 
-# Custom CSS with theme detection
-st.markdown("""
-<script>
-    // Detect system theme preference
-    function detectTheme() {
-        const prefersDark = window.matchMedia('(prefers-color-scheme: dark)').matches;
-        document.documentElement.setAttribute('data-theme', prefersDark ? 'dark' : 'light');
-        
-        // Listen for theme changes
-        window.matchMedia('(prefers-color-scheme: dark)').addEventListener('change', (e) => {
-            document.documentElement.setAttribute('data-theme', e.matches ? 'dark' : 'light');
-        });
-    }
-    
-    // Run on page load
-    if (document.readyState === 'loading') {
-        document.addEventListener('DOMContentLoaded', detectTheme);
-    } else {
-        detectTheme();
-    }
-</script>
-<style>
-    @import url('https://fonts.googleapis.com/css2?family=Libre+Baskerville:wght@400;700&family=DM+Sans:wght@400;500;700&display=swap');
-    
-    /* CSS Variables for Light Theme (default) */
-    :root {
-        --bg-color: #ffffff;
-        --text-color: #454240;
-        --heading-color: #333333;
-        --button-primary: #ff4b4b;
-        --button-primary-hover: #e63946;
-    }
-    
-    /* CSS Variables for Dark Theme */
-    [data-theme="dark"] {
-        --bg-color: #1a1a1a;
-        --text-color: #e0e0e0;
-        --heading-color: #ffffff;
-        --button-primary: #ff4b4b;
-        --button-primary-hover: #ff6b6b;
-    }
-    
-    .main {
-        background-color: var(--bg-color) !important;
-    }
-    
-    body {
-        background-color: var(--bg-color) !important;
-        color: var(--text-color) !important;
-        font-family: 'DM Sans', sans-serif;
-    }
-    
-    h1, h2 {
-        font-family: 'Libre Baskerville', serif;
-        color: var(--heading-color) !important;
-    }
-    
-    .stTextInput>div>div>input,
-    .stTextInput>div>div>input:focus {
-        background-color: var(--bg-color) !important;
-        color: var(--text-color) !important;
-    }
-    
-    /* Primary button color */
-    .stButton > button[kind="primary"],
-    button[kind="primary"],
-    [data-testid="baseButton-primary"] {
-        background-color: var(--button-primary) !important;
-        border-color: var(--button-primary) !important;
-    }
-    
-    .stButton > button[kind="primary"]:hover,
-    button[kind="primary"]:hover,
-    [data-testid="baseButton-primary"]:hover {
-        background-color: var(--button-primary-hover) !important;
-        border-color: var(--button-primary-hover) !important;
-    }
-    
-    /* Completely hide sidebar and prevent any flash */
-    section[data-testid="stSidebar"],
-    div[data-testid="stSidebar"],
-    .css-1d391kg,
-    [data-testid="stSidebar"] {
-        display: none !important;
-        visibility: hidden !important;
-        width: 0 !important;
-        min-width: 0 !important;
-    }
-    
-    /* Hide sidebar toggle button */
-    button[data-testid="baseButton-header"] {
-        display: none !important;
-    }
-</style>
-""", unsafe_allow_html=True)
+# Shared theme (static/theme.css + theme.js, served once and cached by the browser)
+apply_theme()
 
 # Check if user is logged in
 user = get_current_user()
@@ -0,0 +1,150 @@
+"""
+Cross-session shared cache
+Task lists, Gemini plans and transcripts are cached once per process (default)
+or in a Redis-protocol server shared by all app replicas, instead of per tab
+in st.session_state. Keys live in namespaces, optionally per user; a namespace
+is invalidated in O(1) by bumping its generation counter.
+"""
+from collections import OrderedDict
+import json
+import threading
+import time
+from typing import Any, Callable, Dict, Optional
+from config import SHARED_CACHE_URL, SHARED_CACHE_TTL_SECONDS, SHARED_CACHE_MAX_ENTRIES
+
+class InProcessBackend:
+    """Thread-safe LRU of JSON strings with per-key expiry, shared by the sessions of this process"""
+    name = "memory"
+
+    def __init__(self, max_entries: int = 10000):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()  # key -> (expires_at or None, value)
+        # Counters are kept apart from the LRU: an evicted generation would bring back invalidated entries
+        self._counters: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[str]:
+        with self._lock:
+            if key in self._counters:
+                return str(self._counters[key])
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if entry[0] is not None and entry[0] <= time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return entry[1]
+
+    def set(self, key: str, value: str, ttl: Optional[float] = None):
+        expires_at = time.monotonic() + ttl if ttl else None
+        with self._lock:
+            self._entries[key] = (expires_at, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def incr(self, key: str) -> int:
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + 1
+            return self._counters[key]
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+class RedisBackend:
+    """Any Redis-protocol server (Redis, Valkey, KeyDB, Dragonfly) at a redis:// or rediss:// URL"""
+    name = "redis"
+
+    def __init__(self, url: str):
+        import redis
+        self._client = redis.Redis.from_url(url, decode_responses=True, socket_timeout=1.0,
+                                            socket_connect_timeout=1.0)
+
+    def get(self, key: str) -> Optional[str]:
+        return self._client.get(key)
+
+    def set(self, key: str, value: str, ttl: Optional[float] = None):
+        self._client.set(key, value, px=int(ttl * 1000) if ttl else None)
+
+    def incr(self, key: str) -> int:
+        return int(self._client.incr(key))
+
+def get_backend(url: str = SHARED_CACHE_URL, max_entries: int = SHARED_CACHE_MAX_ENTRIES):
+    """Redis backend for a redis:// / rediss:// URL, else the in-process one"""
+    if url.startswith(("redis://", "rediss://", "unix://")):
+        return RedisBackend(url)
+    return InProcessBackend(max_entries)
+
+class SharedCache:
+    """
+    JSON values under namespaced keys: "<prefix>:<scope>:<namespace>:<generation>:<key>",
+    where scope is "user:<id>" for per-user data or "shared".
+
+    Backend errors are treated as misses, so an unreachable server only costs
+    the cache, never the request.
+    """
+
+    def __init__(self, backend, prefix: str = "skkadoosh", default_ttl: Optional[float] = 300):
+        self.backend = backend
+        self.prefix = prefix
+        self.default_ttl = default_ttl
+
+    def _scope(self, namespace: str, user_id: Optional[str]) -> str:
+        scope = f"user:{user_id}" if user_id else "shared"
+        return f"{self.prefix}:{scope}:{namespace}"
+
+    def _generation(self, scope: str) -> str:
+        return self.backend.get(f"{scope}:gen") or "0"
+
+    def _key(self, namespace: str, key: str, user_id: Optional[str]) -> str:
+        scope = self._scope(namespace, user_id)
+        return f"{scope}:{self._generation(scope)}:{key}"
+
+    def get(self, namespace: str, key: str, user_id: Optional[str] = None) -> Optional[Any]:
+        """Cached value or None"""
+        try:
+            value = self.backend.get(self._key(namespace, key, user_id))
+            return json.loads(value) if value is not None else None
+        except Exception:
+            return None
+
+    def set(self, namespace: str, key: str, value: Any, user_id: Optional[str] = None,
+            ttl: Optional[float] = None):
+        """Cache a JSON-serializable value (ttl in seconds, default_ttl if None)"""
+        try:
+            self.backend.set(self._key(namespace, key, user_id), json.dumps(value),
+                             ttl if ttl is not None else self.default_ttl)
+        except Exception:
+            pass
+
+    def get_or_set(self, namespace: str, key: str, compute: Callable[[], Any], user_id: Optional[str] = None,
+                   ttl: Optional[float] = None) -> Any:
+        """
+        Cached value, or compute() stored under the generation current before it ran,
+        so a result computed across an invalidation is never served afterwards.
+        """
+        try:
+            full_key = self._key(namespace, key, user_id)
+            value = self.backend.get(full_key)
+            if value is not None:
+                return json.loads(value)
+        except Exception:
+            full_key = None
+        value = compute()
+        if full_key is not None:
+            try:
+                self.backend.set(full_key, json.dumps(value), ttl if ttl is not None else self.default_ttl)
+            except Exception:
+                pass
+        return value
+
+    def invalidate(self, namespace: str, user_id: Optional[str] = None):
+        """Drop every key of namespace (for user_id); old entries are never read again and expire"""
+        try:
+            self.backend.incr(f"{self._scope(namespace, user_id)}:gen")
+        except Exception:
+            pass
+
+# Shared by all sessions in this process (and by all processes with a Redis URL)
+shared_cache = SharedCache(get_backend(), default_ttl=SHARED_CACHE_TTL_SECONDS)
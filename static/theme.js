@@ -0,0 +1,13 @@
+/*
+ * Skkadoosh theme script - shared by every page.
+ * Loaded once per browser tab by the loader in theme.py.
+ */
+(function() {
+    // Detect system theme preference
+    const query = window.matchMedia('(prefers-color-scheme: dark)');
+    const applyTheme = (dark) => document.documentElement.setAttribute('data-theme', dark ? 'dark' : 'light');
+    applyTheme(query.matches);
+
+    // Listen for theme changes
+    query.addEventListener('change', (e) => applyTheme(e.matches));
+})();
@@ -60,3 +60,22 @@ CREATE POLICY "Users can view own transcripts" ON transcripts
 
 CREATE POLICY "Users can insert own transcripts" ON transcripts
     FOR INSERT WITH CHECK (auth.uid() = user_id);
+
+-- Realtime task changes (TASK_REALTIME_BACKEND=supabase): publish row changes of the tasks table
+ALTER PUBLICATION supabase_realtime ADD TABLE tasks;
+
+-- Server-set change time of each task row: the offline task store (TASK_STORE_PATH)
+-- pulls changes by it, since updated_at is set by clients (clock skew, late pushes)
+ALTER TABLE tasks ADD COLUMN IF NOT EXISTS synced_at TIMESTAMPTZ DEFAULT NOW();
+CREATE INDEX IF NOT EXISTS idx_tasks_user_synced_at ON tasks(user_id, synced_at);
+
+CREATE OR REPLACE FUNCTION set_task_synced_at() RETURNS TRIGGER AS $$
+BEGIN
+    NEW.synced_at := NOW();
+    RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS tasks_synced_at ON tasks;
+CREATE TRIGGER tasks_synced_at BEFORE INSERT OR UPDATE ON tasks
+    FOR EACH ROW EXECUTE FUNCTION set_task_synced_at();
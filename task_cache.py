@@ -0,0 +1,162 @@
+"""
+Per-user in-memory task cache
+Keeps the fetched tasks by id plus a due-date index and a title matcher over
+the open ones, updated in place on every create/update so views, emails and
+voice commands don't rescan or re-sort.
+"""
+import time
+from typing import Dict, Iterable, List, Optional, Tuple
+from sortedcontainers import SortedList
+from task_model import Task, Status
+from task_matcher import TaskMatcher
+from task_embeddings import EmbeddingIndex
+
+class DueDateIndex:
+    """
+    Open tasks ordered by (due_ts, id).
+
+    Insert/remove are O(log n); range queries are O(log n + k). Open tasks
+    without a (valid) due date are kept separately and are not part of any
+    due-date range.
+    """
+
+    def __init__(self, tasks: Iterable[Task] = ()):
+        # task id -> (indexed key, task); the key is kept so a task mutated in place can still be removed
+        self._tasks: Dict[str, Tuple[Tuple[int, str], Task]] = {}
+        self._undated: Dict[str, Task] = {}
+        for task in tasks:
+            if not task.is_open:
+                continue
+            if task.due_ts is None:
+                self._undated[task.id] = task
+            else:
+                self._tasks[task.id] = ((task.due_ts, task.id), task)
+        self._keys = SortedList(key for key, _ in self._tasks.values())
+
+    def __len__(self) -> int:
+        return len(self._tasks) + len(self._undated)
+
+    def __contains__(self, task_id: str) -> bool:
+        return task_id in self._tasks or task_id in self._undated
+
+    def add(self, task: Task):
+        """Index task (replacing any previous version); closed tasks are dropped"""
+        self.remove(task.id)
+        if not task.is_open:
+            return
+        if task.due_ts is None:
+            self._undated[task.id] = task
+        else:
+            key = (task.due_ts, task.id)
+            self._tasks[task.id] = (key, task)
+            self._keys.add(key)
+
+    def remove(self, task_id: str):
+        """Drop task_id from the index if present"""
+        entry = self._tasks.pop(task_id, None)
+        if entry is not None:
+            self._keys.remove(entry[0])
+        else:
+            self._undated.pop(task_id, None)
+
+    def _tasks_for(self, keys) -> List[Task]:
+        tasks = self._tasks
+        return [tasks[task_id][1] for _, task_id in keys]
+
+    def due_before(self, ts: int) -> List[Task]:
+        """Open tasks due strictly before ts, earliest first"""
+        return self._tasks_for(self._keys.irange(None, (ts, ""), inclusive=(True, False)))
+
+    def due_between(self, start_ts: int, end_ts: int) -> List[Task]:
+        """Open tasks with start_ts <= due < end_ts, earliest first"""
+        return self._tasks_for(self._keys.irange((start_ts, ""), (end_ts, ""), inclusive=(True, False)))
+
+    def next_due(self, count: int, after_ts: Optional[int] = None) -> List[Task]:
+        """The next count open tasks due at or after after_ts (all dated tasks if None)"""
+        start = 0 if after_ts is None else self._keys.bisect_left((after_ts, ""))
+        return self._tasks_for(self._keys.islice(start, start + count))
+
+    def undated(self) -> List[Task]:
+        """Open tasks without a due date"""
+        return list(self._undated.values())
+
+    def ordered(self) -> List[Task]:
+        """All open tasks by due date, tasks without due dates last"""
+        return self._tasks_for(self._keys) + list(self._undated.values())
+
+class TaskCache:
+    """A user's tasks by id (newest first, like get_tasks) plus a DueDateIndex and TaskMatcher of the open ones"""
+
+    def __init__(self, user_id: str, tasks: List[Task]):
+        self.user_id = user_id
+        self.loaded_at = time.monotonic()
+        self._tasks: Dict[str, Task] = {task.id: task for task in tasks}
+        self._list: Optional[List[Task]] = list(tasks)
+        self.due_index = DueDateIndex(tasks)
+        self.matcher = TaskMatcher(task for task in tasks if task.is_open)
+        self._embeddings: Optional[EmbeddingIndex] = None  # built on first semantic lookup
+
+    def __len__(self) -> int:
+        return len(self._tasks)
+
+    def get(self, task_id: str) -> Optional[Task]:
+        return self._tasks.get(task_id)
+
+    def tasks(self) -> List[Task]:
+        """All cached (non-deleted) tasks, newest first"""
+        if self._list is None:
+            self._list = sorted(self._tasks.values(), key=lambda t: t.created_ts or 0, reverse=True)
+        return self._list
+
+    def upsert(self, task: Task):
+        """Apply a created or updated task; deleted tasks leave the cache"""
+        previous = self._tasks.get(task.id)
+        if previous is not None and not task.description_loaded and previous.description_loaded:
+            # Updates that didn't touch the description keep the loaded one
+            task.description = previous.description
+        if task.status == Status.DELETED:
+            self.remove(task.id)
+            return
+        self._tasks[task.id] = task
+        self.due_index.add(task)
+        if task.is_open:
+            self.matcher.add(task)
+        else:
+            self.matcher.remove(task.id)
+        if self._embeddings is not None:
+            # Queued only: titles are embedded off the script thread at the next lookup
+            if task.is_open:
+                self._embeddings.add(task)
+            else:
+                self._embeddings.remove(task.id)
+        self._list = None
+
+    def remove(self, task_id: str):
+        if self._tasks.pop(task_id, None) is not None:
+            self._list = None
+        self.due_index.remove(task_id)
+        self.matcher.remove(task_id)
+        if self._embeddings is not None:
+            self._embeddings.remove(task_id)
+
+    def semantic_index(self) -> EmbeddingIndex:
+        """Title embeddings of the open tasks, created on first use and kept up to date by upsert"""
+        if self._embeddings is None:
+            self._embeddings = EmbeddingIndex(tasks=[t for t in self._tasks.values() if t.is_open])
+        return self._embeddings
+
+    def resolve_reference(self, reference: str) -> Optional[str]:
+        """
+        Open task id for a spoken reference: word/substring match first, then
+        embedding similarity for paraphrases. None if neither is confident.
+        """
+        matched_id = self.matcher.match(reference)
+        if matched_id:
+            return matched_id
+        try:
+            return self.semantic_index().match(reference)
+        except Exception:
+            return None  # Embedding backend unavailable; word matching already failed
+
+    def is_stale(self, max_age_seconds: float) -> bool:
+        return time.monotonic() - self.loaded_at > max_age_seconds
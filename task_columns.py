@@ -0,0 +1,71 @@
+"""
+Columnar task storage for bulk view bucketing
+Due dates, status and priority live in NumPy arrays so every view's
+membership, counts and sort order come out of one vectorized pass.
+"""
+from datetime import datetime
+from typing import Dict, List, Optional
+import numpy as np
+from task_model import Task, Status
+from utils import get_view_boundaries
+
+VIEWS = ("today", "week", "upcoming", "completed")
+
+# Sentinel for "no due date": sorts after every real timestamp
+NO_DUE = np.iinfo(np.int64).max
+
+class TaskColumns:
+    """Column arrays for a list of tasks; index i refers to tasks[i]"""
+
+    def __init__(self, tasks: List[Task]):
+        self.tasks = tasks
+        count = len(tasks)
+        self.due = np.fromiter((NO_DUE if t.due_ts is None else t.due_ts for t in tasks),
+                               dtype=np.int64, count=count)
+        self.due_invalid = np.fromiter((t.due_invalid for t in tasks), dtype=np.bool_, count=count)
+        self.status = np.fromiter((t.status for t in tasks), dtype=np.int8, count=count)
+        self.priority = np.fromiter((t.priority for t in tasks), dtype=np.int8, count=count)
+
+    def __len__(self) -> int:
+        return len(self.tasks)
+
+    def take(self, indices: np.ndarray) -> List[Task]:
+        """Tasks at the given indices, in index order"""
+        tasks = self.tasks
+        return [tasks[i] for i in indices.tolist()]
+
+def bucket_views(columns: TaskColumns, user_timezone: str, sort_by_due: bool = False,
+                 now: Optional[datetime] = None) -> Dict[str, np.ndarray]:
+    """
+    Compute every view's members in one pass.
+
+    Same rules as utils.filter_tasks_by_view: tasks without a due date are in
+    today and upcoming, tasks with an unparseable one only in today.
+
+    Returns:
+        view name -> index array into columns.tasks. In input order by default,
+        or ordered by due date then priority with sort_by_due.
+    """
+    boundaries = get_view_boundaries(user_timezone, now)
+    due = columns.due
+    is_open = columns.status < Status.COMPLETED
+    has_due = due != NO_DUE
+    no_due = ~has_due & ~columns.due_invalid
+
+    masks = {
+        "today": is_open & (~has_due | (due < boundaries.tomorrow_start_ts)),
+        "week": is_open & has_due & (due < boundaries.after_week_end_ts),
+        "upcoming": is_open & (no_due | (has_due & (due >= boundaries.after_week_end_ts))),
+        "completed": columns.status == Status.COMPLETED,
+    }
+
+    if not sort_by_due:
+        return {view: np.flatnonzero(mask) for view, mask in masks.items()}
+
+    # One global ordering (due date, then priority), shared by all views
+    order = np.lexsort((columns.priority, due))
+    return {view: order[mask[order]] for view, mask in masks.items()}
+
+def view_counts(buckets: Dict[str, np.ndarray]) -> Dict[str, int]:
+    """Number of tasks in each view"""
+    return {view: int(indices.size) for view, indices in buckets.items()}
@@ -0,0 +1,291 @@
+"""
+Semantic task matching with cached title embeddings
+Paraphrased references ("finish the slides" vs. "deck for Monday") are matched
+by cosine similarity of title vectors. Vectors are computed once per title and
+kept in a shared cache (optionally persisted to disk) and computed off the
+script thread; lookups are in-memory NumPy matrix products.
+"""
+import atexit
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FuturesTimeout
+from functools import lru_cache
+import hashlib
+import os
+import re
+import tempfile
+import threading
+import time
+from typing import Dict, Iterable, List, Optional, Tuple
+import numpy as np
+from config import (
+    GEMINI_API_KEY, TASK_EMBEDDING_BACKEND, TASK_EMBEDDING_DIMENSIONS,
+    TASK_EMBEDDING_CACHE_PATH, TASK_EMBEDDING_MIN_SIMILARITY, TASK_EMBEDDING_SAVE_SECONDS,
+    TASK_EMBEDDING_TIMEOUT_SECONDS
+)
+from task_model import Task
+
+_WORD = re.compile(r"\w+")
+
+class HashingEmbedder:
+    """
+    Deterministic local embedder: signed feature hashing of words and character
+    trigrams. No network, stable across processes - for offline use and tests.
+    """
+    name = "hashing"
+
+    def __init__(self, dimensions: int = 256):
+        self.dimensions = dimensions
+
+    @staticmethod
+    @lru_cache(maxsize=65536)
+    def _feature_hash(feature: str) -> int:
+        return int.from_bytes(hashlib.blake2b(feature.encode("utf-8"), digest_size=8).digest(), "little")
+
+    def _features(self, text: str) -> List[str]:
+        words = _WORD.findall(text.lower())
+        features = ["w:" + word for word in words]
+        for word in words:
+            padded = f" {word} "
+            features.extend("c:" + padded[i:i + 3] for i in range(len(padded) - 2))
+        return features
+
+    def embed(self, texts: List[str]) -> np.ndarray:
+        vectors = np.zeros((len(texts), self.dimensions), dtype=np.float32)
+        for row, text in enumerate(texts):
+            for feature in self._features(text):
+                h = self._feature_hash(feature)
+                vectors[row, h % self.dimensions] += 1.0 if (h >> 32) & 1 else -1.0
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        return vectors / np.where(norms == 0, 1.0, norms)
+
+class GeminiEmbedder:
+    """Gemini text embeddings (batched, normalized to unit length)"""
+    name = "gemini"
+    model = "gemini-embedding-001"
+    batch_size = 100
+
+    def __init__(self, dimensions: int = 768):
+        from google import genai
+        if not GEMINI_API_KEY:
+            raise ValueError("GEMINI_API_KEY not configured")
+        self.dimensions = dimensions
+        self._client = genai.Client(api_key=GEMINI_API_KEY)
+
+    def embed(self, texts: List[str]) -> np.ndarray:
+        from google.genai import types
+        config = types.EmbedContentConfig(task_type="SEMANTIC_SIMILARITY",
+                                          output_dimensionality=self.dimensions)
+        vectors = []
+        try:
+            for start in range(0, len(texts), self.batch_size):
+                response = self._client.models.embed_content(
+                    model=self.model, contents=texts[start:start + self.batch_size], config=config)
+                vectors.extend(embedding.values for embedding in response.embeddings)
+        except Exception as e:
+            raise Exception(f"Error computing task embeddings: {str(e)}")
+        matrix = np.asarray(vectors, dtype=np.float32).reshape(len(texts), self.dimensions)
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        return matrix / np.where(norms == 0, 1.0, norms)
+
+EMBEDDERS = {"hashing": HashingEmbedder, "gemini": GeminiEmbedder}
+
+@lru_cache(maxsize=None)
+def get_embedder(backend: str = TASK_EMBEDDING_BACKEND, dimensions: int = TASK_EMBEDDING_DIMENSIONS):
+    """Shared embedder instance for a backend name"""
+    if backend not in EMBEDDERS:
+        raise ValueError(f"Unknown embedding backend: {backend}. Available: {', '.join(EMBEDDERS)}")
+    return EMBEDDERS[backend](dimensions)
+
+class EmbeddingCache:
+    """
+    Thread-safe cache of title vectors keyed by (backend, dimensions, normalized title).
+
+    If path is set, vectors are persisted to an .npz file and reloaded at start,
+    so a title is embedded once, not once per session. The file is rewritten
+    at most every save_seconds when new vectors were added (and by flush()),
+    not on every miss.
+    """
+
+    def __init__(self, path: Optional[str] = None, save_seconds: float = 30.0):
+        self.path = path
+        self.save_seconds = save_seconds
+        self._vectors: Dict[str, np.ndarray] = {}
+        self._lock = threading.Lock()
+        self._save_lock = threading.Lock()
+        self._dirty = False
+        self._saved_at = time.monotonic()
+        if path:
+            self._load()
+
+    @staticmethod
+    def key(embedder, text: str) -> str:
+        normalized = " ".join(text.lower().split())
+        digest = hashlib.blake2b(normalized.encode("utf-8"), digest_size=16).hexdigest()
+        return f"{embedder.name}:{embedder.dimensions}:{digest}"
+
+    def _load(self):
+        """Load persisted vectors, ignoring a missing or corrupt file"""
+        try:
+            with np.load(self.path) as data:
+                self._vectors = dict(zip(data["keys"].tolist(), data["vectors"]))
+        except (OSError, ValueError, KeyError):
+            return
+
+    def flush(self):
+        """Write vectors to disk if any were added since the last write"""
+        if not self.path:
+            return
+        with self._save_lock:
+            with self._lock:
+                if not self._dirty:
+                    return
+                keys, vectors = list(self._vectors), list(self._vectors.values())
+                self._dirty = False
+                self._saved_at = time.monotonic()
+            directory = os.path.dirname(os.path.abspath(self.path))
+            try:
+                with tempfile.NamedTemporaryFile("wb", dir=directory, delete=False, suffix=".npz") as tmp_file:
+                    np.savez(tmp_file, keys=np.array(keys), vectors=np.stack(vectors))
+                    tmp_path = tmp_file.name
+                os.replace(tmp_path, self.path)
+            except (OSError, ValueError):
+                with self._lock:
+                    self._dirty = True  # Persistence is best-effort; retried on the next save
+
+    def embed(self, embedder, texts: List[str]) -> np.ndarray:
+        """Vectors for texts, computing (in one batch) only the ones not cached yet"""
+        keys = [self.key(embedder, text) for text in texts]
+        with self._lock:
+            missing = {key: text for key, text in zip(keys, texts) if key not in self._vectors}
+        if missing:
+            computed = embedder.embed(list(missing.values()))
+            with self._lock:
+                self._vectors.update(zip(missing, computed))
+                self._dirty = True
+                due = time.monotonic() - self._saved_at >= self.save_seconds
+            if due:
+                self.flush()
+        with self._lock:
+            vectors = [self._vectors[key] for key in keys]
+        return np.stack(vectors) if vectors else np.zeros((0, embedder.dimensions), dtype=np.float32)
+
+    def __len__(self) -> int:
+        return len(self._vectors)
+
+# Shared by all sessions in this process
+embedding_cache = EmbeddingCache(TASK_EMBEDDING_CACHE_PATH or None, TASK_EMBEDDING_SAVE_SECONDS)
+atexit.register(embedding_cache.flush)
+
+# Shared by all sessions in this process: embedding calls never run on the script thread
+_embed_pool = ThreadPoolExecutor(max_workers=2, thread_name_prefix="task-embed")
+
+class EmbeddingIndex:
+    """
+    Unit title vectors of a set of tasks in one matrix, for cosine top-k lookups.
+
+    Adding a task only queues its title (O(1), no embedding call); queued
+    titles are embedded in one batch on the embedding pool at the next lookup,
+    which waits at most its timeout for them.
+    """
+
+    def __init__(self, embedder=None, tasks: Iterable[Task] = (), cache: EmbeddingCache = embedding_cache):
+        self.embedder = embedder or get_embedder()
+        self.cache = cache
+        self._ids: List[str] = []
+        self._rows: Dict[str, int] = {}
+        self._matrix = np.zeros((0, self.embedder.dimensions), dtype=np.float32)
+        self._queued: Dict[str, str] = {}  # task id -> title waiting for its vector
+        self._lock = threading.Lock()
+        self._embed_lock = threading.Lock()
+        self.add_many(list(tasks))
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._ids) + len(self._queued)
+
+    def add_many(self, tasks: List[Task]):
+        """Queue tasks for (re-)indexing"""
+        with self._lock:
+            for task in tasks:
+                self._remove_row(task.id)
+                self._queued[task.id] = task.title
+
+    def add(self, task: Task):
+        self.add_many([task])
+
+    def remove(self, task_id: str):
+        with self._lock:
+            self._queued.pop(task_id, None)
+            self._remove_row(task_id)
+
+    def _remove_row(self, task_id: str):
+        """Drop task_id's vector, moving the last row into its slot (caller holds the lock)"""
+        row = self._rows.pop(task_id, None)
+        if row is None:
+            return
+        last = len(self._ids) - 1
+        if row != last:
+            moved_id = self._ids[last]
+            self._matrix[row] = self._matrix[last]
+            self._ids[row] = moved_id
+            self._rows[moved_id] = row
+        self._ids.pop()
+
+    def _embed_queued(self):
+        """Embed all queued titles in one (cached) batch and move them into the matrix"""
+        with self._embed_lock:
+            with self._lock:
+                queued = dict(self._queued)
+            if not queued:
+                return
+            vectors = self.cache.embed(self.embedder, list(queued.values()))
+            with self._lock:
+                # Skip tasks removed or re-queued with another title meanwhile
+                fresh = [(task_id, vector) for (task_id, title), vector in zip(queued.items(), vectors)
+                         if self._queued.get(task_id) == title]
+                count = len(self._ids)
+                if count + len(fresh) > self._matrix.shape[0]:
+                    # Grow geometrically so single adds stay amortized O(dimensions)
+                    capacity = max(count + len(fresh), 2 * self._matrix.shape[0], 16)
+                    grown = np.zeros((capacity, self.embedder.dimensions), dtype=np.float32)
+                    grown[:count] = self._matrix[:count]
+                    self._matrix = grown
+                for offset, (task_id, vector) in enumerate(fresh):
+                    del self._queued[task_id]
+                    self._matrix[count + offset] = vector
+                    self._rows[task_id] = count + offset
+                    self._ids.append(task_id)
+
+    def _query_vector(self, reference: str) -> np.ndarray:
+        self._embed_queued()
+        # Not cached: only task title vectors are kept (and persisted)
+        return self.embedder.embed([reference])[0]
+
+    def top_k(self, reference: str, k: int = 5, timeout: Optional[float] = None) -> List[Tuple[str, float]]:
+        """
+        The k most similar tasks to reference as (task id, cosine similarity), best first.
+
+        Waits at most timeout seconds (None: no limit) for queued titles and the
+        reference to be embedded; returns [] if that takes longer, while the
+        titles keep being embedded for the next lookup.
+        """
+        if not reference.strip() or not len(self):
+            return []
+        try:
+            query = _embed_pool.submit(self._query_vector, reference).result(timeout)
+        except FuturesTimeout:
+            return []
+        with self._lock:
+            count = len(self._ids)
+            if not count:
+                return []
+            similarities = self._matrix[:count] @ query
+            k = min(k, count)
+            top = np.argpartition(-similarities, k - 1)[:k]
+            top = top[np.argsort(-similarities[top], kind="stable")]
+            return [(self._ids[row], float(similarities[row])) for row in top]
+
+    def match(self, reference: str, min_similarity: float = TASK_EMBEDDING_MIN_SIMILARITY,
+              timeout: Optional[float] = TASK_EMBEDDING_TIMEOUT_SECONDS) -> Optional[str]:
+        """Most similar task id if it reaches min_similarity, else None"""
+        best = self.top_k(reference, 1, timeout)
+        return best[0][0] if best and best[0][1] >= min_similarity else None
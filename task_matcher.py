@@ -0,0 +1,139 @@
+"""
+Inverted-index task matcher
+Resolves spoken task references ("the dentist one") to task ids. Titles are
+normalized and tokenized once, and only tasks sharing a token, trigram or
+substring with the reference are scored.
+"""
+from collections import Counter
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+from task_model import Task
+
+# Minimum score for a reference to count as a match
+MATCH_THRESHOLD = 0.3
+
+def _trigrams(text: str) -> Set[str]:
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+class TaskMatcher:
+    """
+    Token and trigram postings over task titles, updated per task.
+
+    match() gives the same result as the original linear scan: the best of
+    word-overlap score and substring-length ratio, above MATCH_THRESHOLD, with
+    ties going to the task indexed first. rank() adds trigram similarity so
+    misspelled references still produce ranked candidates.
+    """
+
+    def __init__(self, tasks: Iterable[Task] = ()):
+        self._entries: Dict[str, Tuple[int, str, Set[str], Set[str]]] = {}  # id -> (seq, title, tokens, trigrams)
+        self._by_title: Dict[str, Set[str]] = {}
+        self._token_postings: Dict[str, Set[str]] = {}
+        self._trigram_postings: Dict[str, Set[str]] = {}
+        self._seq = 0
+        for task in tasks:
+            self.add(task)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def add(self, task: Task):
+        """Index task's title (replacing any previous version)"""
+        self.remove(task.id)
+        title = task.title.lower()
+        tokens = set(title.split())
+        trigrams = _trigrams(title)
+        self._seq += 1
+        self._entries[task.id] = (self._seq, title, tokens, trigrams)
+        self._by_title.setdefault(title, set()).add(task.id)
+        for token in tokens:
+            self._token_postings.setdefault(token, set()).add(task.id)
+        for trigram in trigrams:
+            self._trigram_postings.setdefault(trigram, set()).add(task.id)
+
+    def remove(self, task_id: str):
+        """Drop task_id from the index if present"""
+        entry = self._entries.pop(task_id, None)
+        if entry is None:
+            return
+        _, title, tokens, trigrams = entry
+        for postings, keys in ((self._by_title, (title,)), (self._token_postings, tokens),
+                               (self._trigram_postings, trigrams)):
+            for key in keys:
+                ids = postings[key]
+                ids.discard(task_id)
+                if not ids:
+                    del postings[key]
+
+    def _substring_candidates(self, reference: str, reference_trigrams: Set[str]) -> Set[str]:
+        """Ids whose title contains reference, or is contained in it"""
+        candidates = set()
+        # Titles containing the reference have all of its trigrams; intersect rarest first
+        if reference_trigrams:
+            postings = sorted((self._trigram_postings.get(t, set()) for t in reference_trigrams), key=len)
+            if postings[0]:
+                candidates = set(postings[0]).intersection(*postings[1:])
+        else:
+            candidates = {task_id for task_id, entry in self._entries.items() if reference in entry[1]}
+        # Titles contained in the reference are among its substrings
+        length = len(reference)
+        for start in range(length):
+            for end in range(start + 1, length + 1):
+                ids = self._by_title.get(reference[start:end])
+                if ids:
+                    candidates |= ids
+        return candidates
+
+    def _scores(self, reference: str) -> Dict[str, float]:
+        """
+        Original match score for every task sharing a token or substring with reference:
+        word overlap ratio or substring length ratio, whichever is higher.
+        """
+        reference_tokens = set(reference.split())
+        token_hits = Counter()
+        for token in reference_tokens:
+            token_hits.update(self._token_postings.get(token, ()))
+        entries = self._entries
+        scores = {task_id: hits / max(len(reference_tokens), len(entries[task_id][2]))
+                  for task_id, hits in token_hits.items()}
+        if reference:
+            for task_id in self._substring_candidates(reference, _trigrams(reference)):
+                title = entries[task_id][1]
+                if reference in title or title in reference:
+                    ratio = min(len(reference), len(title)) / max(len(reference), len(title))
+                    if ratio > scores.get(task_id, 0.0):
+                        scores[task_id] = ratio
+        return scores
+
+    def match(self, reference: str, threshold: float = MATCH_THRESHOLD) -> Optional[str]:
+        """Best matching task id for reference, or None"""
+        scores = self._scores(reference.lower().strip())
+        if not scores:
+            return None
+        entries = self._entries
+        best_match = max(scores, key=lambda task_id: (scores[task_id], -entries[task_id][0]))
+        return best_match if scores[best_match] > threshold else None
+
+    def rank(self, reference: str, k: int = 5, threshold: float = MATCH_THRESHOLD) -> List[Tuple[str, float]]:
+        """
+        Top-k (task id, score) for reference, best first.
+
+        Score is the match() score, or the trigram Jaccard similarity of the
+        titles when that is higher (catches misspellings and partial words).
+        """
+        reference = reference.lower().strip()
+        scores = self._scores(reference)
+        reference_trigrams = _trigrams(reference)
+        shared = Counter()
+        for trigram in reference_trigrams:
+            shared.update(self._trigram_postings.get(trigram, ()))
+        scored = []
+        for task_id in scores.keys() | shared.keys():
+            score = scores.get(task_id, 0.0)
+            if shared[task_id]:
+                title_trigrams = self._entries[task_id][3]
+                similarity = shared[task_id] / (len(reference_trigrams) + len(title_trigrams) - shared[task_id])
+                score = max(score, similarity)
+            if score > threshold:
+                scored.append((-score, self._entries[task_id][0], task_id))
+        scored.sort()
+        return [(task_id, -negative_score) for negative_score, _, task_id in scored[:k]]
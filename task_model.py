@@ -0,0 +1,189 @@
+"""
+Compact task model
+database.py converts PostgREST rows into Task objects once at fetch time:
+__slots__ instead of a per-task dict, small-int enums for priority/status,
+epoch-second ints for timestamps and lazily loaded descriptions.
+"""
+from dataclasses import dataclass
+from datetime import datetime
+from enum import IntEnum
+from functools import lru_cache
+from typing import Callable, ClassVar, Dict, Optional, Tuple
+import pytz
+from datetime_normalization import get_timezone
+
+class Priority(IntEnum):
+    """Task priority; lower value = more urgent"""
+    P0 = 0
+    HIGH = 1
+    MEDIUM = 2
+    LOW = 3
+
+    @property
+    def label(self) -> str:
+        """Database/UI value: p0, high, medium, low"""
+        return self.name.lower()
+
+    @classmethod
+    def from_label(cls, label: Optional[str]) -> "Priority":
+        """Parse a database value, defaulting to MEDIUM"""
+        return _PRIORITY_BY_LABEL.get(label, cls.MEDIUM)
+
+class Status(IntEnum):
+    """Task status"""
+    PENDING = 0
+    SNOOZED = 1
+    COMPLETED = 2
+    DELETED = 3
+
+    @property
+    def label(self) -> str:
+        """Database value: pending, snoozed, completed, deleted"""
+        return self.name.lower()
+
+    @classmethod
+    def from_label(cls, label: Optional[str]) -> "Status":
+        """Parse a database value, defaulting to PENDING"""
+        return _STATUS_BY_LABEL.get(label, cls.PENDING)
+
+_PRIORITY_BY_LABEL = {p.label: p for p in Priority}
+_STATUS_BY_LABEL = {s.label: s for s in Status}
+
+@lru_cache(maxsize=16384)
+def parse_timestamp(value: str) -> datetime:
+    """Parse a stored ISO timestamp ('Z' suffix allowed). Raises ValueError if invalid."""
+    return datetime.fromisoformat(value.replace('Z', '+00:00'))
+
+def to_epoch(value: Optional[str]) -> Tuple[Optional[int], bool]:
+    """
+    Convert a stored ISO timestamp to epoch seconds.
+
+    Returns (epoch or None, invalid flag). Naive values are taken as UTC;
+    PostgREST always returns timestamptz columns with an offset.
+    """
+    if not value:
+        return None, False
+    try:
+        dt = parse_timestamp(value)
+    except (ValueError, TypeError, AttributeError):
+        return None, True
+    if dt.tzinfo is None:
+        dt = pytz.UTC.localize(dt)
+    return int(dt.timestamp()), False
+
+def from_epoch(ts: Optional[int], timezone: str = "UTC") -> Optional[datetime]:
+    """Aware datetime for epoch seconds in timezone"""
+    if ts is None:
+        return None
+    return datetime.fromtimestamp(ts, get_timezone(timezone))
+
+@dataclass(slots=True, eq=False)
+class Task:
+    """A task row. Timestamps are epoch seconds (UTC)."""
+    id: str
+    title: str
+    priority: Priority = Priority.MEDIUM
+    status: Status = Status.PENDING
+    due_ts: Optional[int] = None
+    reminder_ts: Optional[int] = None
+    snooze_until_ts: Optional[int] = None
+    created_ts: Optional[int] = None
+    updated_ts: Optional[int] = None
+    completed_ts: Optional[int] = None
+    due_invalid: bool = False  # due_date was present but unparseable
+    _description: Optional[str] = None  # None until loaded
+    _due_local: Optional[datetime] = None
+    _due_local_tz: Optional[str] = None
+
+    # Set by database.py: loads one task's description on first access
+    description_loader: ClassVar[Optional[Callable[[str], str]]] = None
+
+    @classmethod
+    def from_record(cls, record: Dict) -> "Task":
+        """Build a Task from a PostgREST row (the description column is optional)"""
+        due_ts, due_invalid = to_epoch(record.get("due_date"))
+        return cls(
+            id=str(record.get("id")),
+            title=record.get("title") or "",
+            priority=Priority.from_label(record.get("priority")),
+            status=Status.from_label(record.get("status")),
+            due_ts=due_ts,
+            reminder_ts=to_epoch(record.get("reminder_time"))[0],
+            snooze_until_ts=to_epoch(record.get("snooze_until"))[0],
+            created_ts=to_epoch(record.get("created_at"))[0],
+            updated_ts=to_epoch(record.get("updated_at"))[0],
+            completed_ts=to_epoch(record.get("completed_at"))[0],
+            due_invalid=due_invalid,
+            _description=(record.get("description") or "") if "description" in record else None,
+        )
+
+    def to_record(self, include_description: bool = True) -> Dict:
+        """Convert back to a row dict with ISO (UTC) timestamps"""
+        def iso(ts):
+            return from_epoch(ts).isoformat() if ts is not None else None
+        record = {
+            "id": self.id,
+            "title": self.title,
+            "priority": self.priority.label,
+            "status": self.status.label,
+            "due_date": iso(self.due_ts),
+            "reminder_time": iso(self.reminder_ts),
+            "snooze_until": iso(self.snooze_until_ts),
+            "created_at": iso(self.created_ts),
+            "updated_at": iso(self.updated_ts),
+            "completed_at": iso(self.completed_ts),
+        }
+        if include_description:
+            record["description"] = self.description
+        return record
+
+    def with_updates(self, updates: Dict) -> "Task":
+        """A new Task with column updates (row dict values) applied, without loading the description"""
+        task = Task.from_record({**self.to_record(include_description=False), **updates})
+        task._description = updates["description"] if "description" in updates else self._description
+        return task
+
+    @property
+    def description(self) -> str:
+        """Task description, loaded on first access if it wasn't fetched"""
+        if self._description is None:
+            loader = Task.description_loader
+            self._description = (loader(self.id) if loader else "") or ""
+        return self._description
+
+    @description.setter
+    def description(self, value: Optional[str]):
+        self._description = value or ""
+
+    @property
+    def description_loaded(self) -> bool:
+        return self._description is not None
+
+    @property
+    def is_open(self) -> bool:
+        """Not completed and not deleted"""
+        return self.status < Status.COMPLETED
+
+    def due_local(self, timezone: str) -> Optional[datetime]:
+        """Due date in timezone; the conversion is cached for the last timezone used"""
+        if self.due_ts is None:
+            return None
+        if self._due_local_tz != timezone:
+            self._due_local = from_epoch(self.due_ts, timezone)
+            self._due_local_tz = timezone
+        return self._due_local
+
+    def due_iso(self, timezone: str = "UTC") -> Optional[str]:
+        """Due date as an ISO string in timezone"""
+        due = self.due_local(timezone)
+        return due.isoformat() if due else None
+
+    def completed_local(self, timezone: str = "UTC") -> Optional[datetime]:
+        """Completion time in timezone"""
+        return from_epoch(self.completed_ts, timezone)
+
+def due_sort_key(task: Task):
+    """Sort key ordering tasks by due date, tasks without (valid) due dates last"""
+    if task.due_ts is None:
+        return (1, 0)
+    return (0, task.due_ts)
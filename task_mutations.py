@@ -0,0 +1,142 @@
+"""
+Optimistic task mutations
+Button clicks apply their change to the session task cache right away and the
+database write (plus transcript and update email) runs on a background thread.
+Each rerun reconciles finished writes: confirmed rows replace the optimistic
+ones, failed writes are rolled back and reported.
+"""
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Callable, Dict, List, Optional, Tuple
+import streamlit as st
+from config import TASK_WRITE_WORKERS
+from database import get_task_cache, write_task_update
+from email_service import send_task_update_email
+from task_model import Task, Status
+from transcript_log import log_transcript
+
+# Shared by all sessions in this process
+_write_pool = ThreadPoolExecutor(max_workers=TASK_WRITE_WORKERS, thread_name_prefix="task-write")
+
+@dataclass
+class PendingMutation:
+    """A task change shown optimistically while its database write is in flight"""
+    task_id: str
+    previous: Task
+    optimistic: Task
+    future: Future
+    label: str
+
+def _write(task_id: str, updates: Dict, access_token: Optional[str],
+           transcript: Optional[str], user_id: str, email: Optional[Dict]) -> Tuple[Task, List[str]]:
+    """
+    Background job: database write first, then the best-effort side effects.
+    Returns the stored task and messages for side effects that failed.
+    """
+    task = write_task_update(task_id, updates, access_token)
+    if task is None:
+        raise Exception("Error updating task: task not found")
+    if transcript:
+        log_transcript(user_id, transcript, access_token)
+    if email:
+        # Deleted tasks are listed as they were; the others as written
+        changed = email["previous"] if email["kind"] == "deleted" else task
+        try:
+            send_task_update_email(email["user_email"], user_id, "updated", access_token=access_token,
+                                   changes={email["kind"]: [changed]}, open_count=email["open_count"],
+                                   raise_errors=True)
+        except Exception as e:
+            return task, [f"Couldn't send the update email for '{changed.title}': {str(e)}"]
+    return task, []
+
+def _submit_after(after: Optional[Future], fn: Callable, *args) -> Future:
+    """
+    Run fn(*args) on the write pool once after is done (at once if None).
+
+    The job is only submitted when after completes, so a session's queued
+    writes never hold a worker that other sessions' writes could use.
+    """
+    future: Future = Future()
+
+    def run():
+        if not future.set_running_or_notify_cancel():
+            return
+        try:
+            future.set_result(fn(*args))
+        except Exception as e:
+            future.set_exception(e)
+
+    if after is None:
+        _write_pool.submit(run)
+    else:
+        after.add_done_callback(lambda _: _write_pool.submit(run))
+    return future
+
+def _pending() -> List[PendingMutation]:
+    return st.session_state.setdefault("pending_task_mutations", [])
+
+def submit_task_update(user_id: str, task_id: str, updates: Dict, label: str,
+                       transcript: Optional[str] = None, user_email: Optional[str] = None) -> bool:
+    """
+    Apply updates to the cached task now and write them in the background.
+    
+    If user_email is set, the task update email (listing just this task) is
+    sent after the write succeeds.
+    Returns False if the task isn't in the cache.
+    """
+    cache = get_task_cache(user_id)
+    previous = cache.get(task_id)
+    if previous is None:
+        return False
+    optimistic = previous.with_updates(updates)
+    cache.upsert(optimistic)
+    email = None
+    if user_email:
+        status = updates.get("status")
+        kind = status if status in ("completed", "deleted") else "updated"
+        email = {"user_email": user_email, "kind": kind, "previous": previous,
+                 "open_count": len(cache.due_index)}
+    pending = _pending()
+    # Chained after this session's previous write, to keep writes in click order
+    after = pending[-1].future if pending else None
+    future = _submit_after(after, _write, task_id, updates, st.session_state.get("sb_access_token"),
+                           transcript, user_id, email)
+    pending.append(PendingMutation(task_id, previous, optimistic, future, label))
+    return True
+
+def has_pending_mutations() -> bool:
+    return bool(st.session_state.get("pending_task_mutations"))
+
+def reconcile_task_mutations(user_id: str) -> List[str]:
+    """
+    Apply finished background writes to the task cache (call on each rerun).
+    
+    Confirmed rows replace optimistic ones; failed writes restore the previous
+    task. Returns an error message per rolled-back change and per failed
+    side effect (the update email) of a confirmed one.
+    """
+    pending = st.session_state.get("pending_task_mutations")
+    if not pending:
+        return []
+    cache = get_task_cache(user_id)
+    errors = []
+    still_pending = []
+    for mutation in pending:
+        if not mutation.future.done():
+            still_pending.append(mutation)
+            continue
+        current = cache.get(mutation.task_id)
+        # Only touch the cache if nothing newer (a later click or a refetch) replaced the optimistic task
+        untouched = current is mutation.optimistic or (
+            current is None and mutation.optimistic.status == Status.DELETED)
+        try:
+            task, side_effect_errors = mutation.future.result()
+            if untouched:
+                cache.upsert(task)
+            errors.extend(side_effect_errors)
+        except Exception as e:
+            if untouched:
+                cache.upsert(mutation.previous)
+            errors.append(f"Couldn't {mutation.label} '{mutation.previous.title}': {str(e)}")
+    st.session_state["pending_task_mutations"] = still_pending
+    return errors
@@ -0,0 +1,311 @@
+"""
+Realtime task change subscriptions
+Row-level task changes (INSERT/UPDATE/DELETE with the new row) are fanned out
+by a broker to every session of the same user. Each session queues them and
+applies them to its task cache on the next script run, so other tabs and
+devices stay current without refetching.
+"""
+import asyncio
+import base64
+from functools import lru_cache
+import json
+import queue
+import threading
+import time
+import weakref
+from typing import Callable, Dict, List, Optional
+import streamlit as st
+from config import SUPABASE_URL, SUPABASE_KEY, TASK_REALTIME_BACKEND
+from task_cache import TaskCache
+from task_model import Task, Status
+
+def token_expiry(access_token: Optional[str]) -> Optional[float]:
+    """exp claim (epoch seconds) of a JWT, read without verifying it; None if there isn't one"""
+    try:
+        payload = access_token.split(".")[1]
+        return float(json.loads(base64.urlsafe_b64decode(payload + "=" * (-len(payload) % 4)))["exp"])
+    except Exception:
+        return None
+
+def task_change(change_type: str, record: Dict, old_record: Optional[Dict] = None) -> Dict:
+    """A change message in Supabase Realtime's postgres_changes shape"""
+    return {"type": change_type, "record": record, "old_record": old_record or {}}
+
+class InMemoryBroker:
+    """
+    Fans changes out to subscribers in this process.
+
+    Sees only changes published by this process (other tabs on the same
+    server); also the stand-in broker for tests.
+    """
+    name = "memory"
+
+    def __init__(self):
+        self._subscribers: Dict[str, List[weakref.WeakMethod]] = {}
+        self._lock = threading.Lock()
+
+    def subscribe(self, user_id: str, access_token: Optional[str], callback: Callable[[Dict], None]) -> Callable[[], None]:
+        """
+        Deliver user_id's changes to callback (a bound method, held weakly so an
+        abandoned session's feed is dropped). Returns an unsubscribe function.
+        """
+        ref = weakref.WeakMethod(callback)
+        with self._lock:
+            self._subscribers.setdefault(user_id, []).append(ref)
+
+        def unsubscribe():
+            with self._lock:
+                refs = self._subscribers.get(user_id, [])
+                if ref in refs:
+                    refs.remove(ref)
+                if not refs:
+                    self._subscribers.pop(user_id, None)
+                    self._user_left(user_id)
+        return unsubscribe
+
+    def is_live(self, user_id: str) -> bool:
+        """
+        True while every change to user_id's tasks is being delivered, so caches
+        can skip refetching for age. Never for this broker: changes made
+        elsewhere (other replicas, the scheduler) aren't delivered.
+        """
+        return False
+
+    def refresh(self, user_id: str, access_token: Optional[str]):
+        """Called on every script run with the session's current token"""
+
+    def _user_left(self, user_id: str):
+        """Hook for brokers holding a connection per user (called with the lock held)"""
+
+    def publish(self, user_id: str, change: Dict):
+        with self._lock:
+            refs = list(self._subscribers.get(user_id, ()))
+        dead = []
+        for ref in refs:
+            callback = ref()
+            if callback is None:
+                dead.append(ref)
+            else:
+                callback(change)
+        if dead:
+            with self._lock:
+                refs = self._subscribers.get(user_id, [])
+                for ref in dead:
+                    if ref in refs:
+                        refs.remove(ref)
+                if not refs and user_id in self._subscribers:
+                    self._subscribers.pop(user_id)
+                    self._user_left(user_id)
+
+class SupabaseRealtimeBroker(InMemoryBroker):
+    """
+    Postgres changes of the tasks table from Supabase Realtime, one channel per
+    subscribed user (joined with the user's access token, so RLS applies).
+
+    A user's channel is live only once joined, while its socket is connected and
+    its token unexpired; a failed or dropped channel is rejoined on the next
+    refresh, and a new session token is passed on to the channel.
+
+    Needs the tasks table in the supabase_realtime publication (see supabase_schema.sql).
+    """
+    name = "supabase"
+
+    def __init__(self):
+        super().__init__()
+        if not SUPABASE_URL or not SUPABASE_KEY:
+            raise ValueError("Supabase URL and KEY must be set in environment variables")
+        self._clients: Dict[str, object] = {}
+        self._states: Dict[str, str] = {}  # user_id -> last RealtimeSubscribeStates value
+        self._tokens: Dict[str, Optional[str]] = {}
+        self._loop = asyncio.new_event_loop()
+        threading.Thread(target=self._loop.run_forever, name="task-realtime", daemon=True).start()
+
+    def subscribe(self, user_id: str, access_token: Optional[str], callback: Callable[[Dict], None]) -> Callable[[], None]:
+        unsubscribe = super().subscribe(user_id, access_token, callback)
+        self.refresh(user_id, access_token)
+        return unsubscribe
+
+    def is_live(self, user_id: str) -> bool:
+        with self._lock:
+            client = self._clients.get(user_id)
+            state = self._states.get(user_id)
+            expires = token_expiry(self._tokens.get(user_id))
+        return (client is not None and state == "SUBSCRIBED" and client.is_connected
+                and (expires is None or expires > time.time()))
+
+    def refresh(self, user_id: str, access_token: Optional[str]):
+        """Join user_id's channel if it isn't joined or joining (again, after a failure or drop) and pass on a new token"""
+        with self._lock:
+            if user_id not in self._subscribers:
+                return
+            new_token = self._tokens.get(user_id) != access_token
+            self._tokens[user_id] = access_token
+            client = self._clients.get(user_id)
+            reserved = user_id in self._clients and client is None  # Joining
+            failed = self._states.get(user_id) in ("CLOSED", "CHANNEL_ERROR", "TIMED_OUT")
+            join = user_id not in self._clients or (not reserved and (failed or not client.is_connected))
+            if join:
+                self._clients[user_id] = None  # Reserved until the channel is joined
+                self._states.pop(user_id, None)
+        if join:
+            if client is not None:
+                asyncio.run_coroutine_threadsafe(client.close(), self._loop)
+            asyncio.run_coroutine_threadsafe(self._join(user_id, access_token), self._loop)
+        elif new_token and client is not None:
+            asyncio.run_coroutine_threadsafe(client.set_auth(access_token), self._loop)
+
+    def _subscribe_state(self, user_id: str, state, error: Optional[Exception]):
+        with self._lock:
+            self._states[user_id] = getattr(state, "value", state)
+
+    async def _join(self, user_id: str, access_token: Optional[str]):
+        from realtime import AsyncRealtimeClient, RealtimePostgresChangesListenEvent
+        client = AsyncRealtimeClient(f"{SUPABASE_URL}/realtime/v1", SUPABASE_KEY)
+        try:
+            await client.connect()
+            if access_token:
+                await client.set_auth(access_token)
+            channel = client.channel(f"tasks:{user_id}")
+            channel.on_postgres_changes(RealtimePostgresChangesListenEvent.All,
+                                        lambda payload: self._receive(user_id, payload),
+                                        table="tasks", schema="public", filter=f"user_id=eq.{user_id}")
+            await channel.subscribe(lambda state, error: self._subscribe_state(user_id, state, error))
+        except Exception:
+            with self._lock:
+                self._clients.pop(user_id, None)  # Retried by the next refresh
+            return
+        with self._lock:
+            self._clients[user_id] = client
+            still_wanted = user_id in self._subscribers
+        if not still_wanted:
+            await client.close()
+
+    def _receive(self, user_id: str, payload: Dict):
+        data = payload.get("data", {})
+        change_type = getattr(data.get("type"), "value", data.get("type"))
+        InMemoryBroker.publish(self, user_id, task_change(
+            change_type, data.get("record") or {}, data.get("old_record")))
+
+    def _user_left(self, user_id: str):
+        self._states.pop(user_id, None)
+        self._tokens.pop(user_id, None)
+        client = self._clients.pop(user_id, None)
+        if client is not None:
+            asyncio.run_coroutine_threadsafe(client.close(), self._loop)
+
+BROKERS = {"memory": InMemoryBroker, "supabase": SupabaseRealtimeBroker}
+
+@lru_cache(maxsize=None)
+def get_broker(backend: str = TASK_REALTIME_BACKEND):
+    """Shared broker instance for a backend name (one per process)"""
+    if backend not in BROKERS:
+        raise ValueError(f"Unknown realtime backend: {backend}. Available: {', '.join(BROKERS)}")
+    return BROKERS[backend]()
+
+def publish_task_change(user_id: str, change_type: str, record: Dict):
+    """Tell the user's other sessions about a change this process wrote"""
+    try:
+        get_broker().publish(user_id, task_change(change_type, record))
+    except Exception:
+        pass  # Other sessions fall back to the task cache TTL
+
+def apply_task_change(cache: TaskCache, change: Dict) -> bool:
+    """Apply one change message to cache; True if it changed what the cache holds"""
+    record = change.get("record") or {}
+    if change.get("type") == "DELETE" or not record:
+        task_id = str((change.get("old_record") or record).get("id"))
+        if cache.get(task_id) is None:
+            return False
+        cache.remove(task_id)
+        return True
+    task = Task.from_record(record)
+    current = cache.get(task.id)
+    if task.status == Status.DELETED:
+        if current is None:
+            return False
+        cache.remove(task.id)
+        return True
+    if current is not None and _same_task(current, task):
+        return False  # Echo of this session's own write (or an optimistic change already shown)
+    cache.upsert(task)
+    return True
+
+def _same_task(a: Task, b: Task) -> bool:
+    """Equal in every column but updated_at (and description, when either isn't loaded)"""
+    first = a.to_record(include_description=False)
+    second = b.to_record(include_description=False)
+    first.pop("updated_at")
+    second.pop("updated_at")
+    if a.description_loaded and b.description_loaded and a.description != b.description:
+        return False
+    return first == second
+
+class TaskChangeFeed:
+    """A session's subscription: the broker thread queues changes, the script thread applies them"""
+
+    def __init__(self, user_id: str, access_token: Optional[str], broker=None):
+        self.user_id = user_id
+        self.access_token = access_token
+        self.broker = broker or get_broker()
+        self._queue: queue.SimpleQueue = queue.SimpleQueue()
+        self._unseen = 0  # Changes applied to the cache since take_unseen()
+        self._unsubscribe = self.broker.subscribe(user_id, access_token, self._receive)
+
+    def _receive(self, change: Dict):
+        self._queue.put(change)
+
+    def apply(self, cache: TaskCache) -> int:
+        """Apply queued changes to cache; returns how many changed it"""
+        changed = 0
+        while True:
+            try:
+                change = self._queue.get_nowait()
+            except queue.Empty:
+                self._unseen += changed
+                return changed
+            if apply_task_change(cache, change):
+                changed += 1
+
+    def take_unseen(self) -> int:
+        """How many changes apply() made to the cache since the last call (whoever called apply)"""
+        unseen, self._unseen = self._unseen, 0
+        return unseen
+
+    def clear(self):
+        """Drop queued changes (after a full fetch)"""
+        while True:
+            try:
+                self._queue.get_nowait()
+            except queue.Empty:
+                return
+
+    @property
+    def live(self) -> bool:
+        """True while the broker is delivering every change to this user's tasks"""
+        return self.broker.is_live(self.user_id)
+
+    def refresh(self, access_token: Optional[str]):
+        """Keep the subscription joined, with the session's current token"""
+        self.access_token = access_token
+        self.broker.refresh(self.user_id, access_token)
+
+    def close(self):
+        self._unsubscribe()
+
+def get_task_feed(user_id: str) -> Optional[TaskChangeFeed]:
+    """The session's change feed for user_id, subscribed on first use (None if the broker is unavailable)"""
+    feed = st.session_state.get("task_feed")
+    if feed is not None and feed.user_id == user_id:
+        try:
+            feed.refresh(st.session_state.get("sb_access_token"))
+        except Exception:
+            pass  # Not live until a later refresh succeeds; the cache TTL applies meanwhile
+        return feed
+    if feed is not None:
+        feed.close()
+    try:
+        feed = TaskChangeFeed(user_id, st.session_state.get("sb_access_token"))
+    except Exception:
+        return None
+    st.session_state["task_feed"] = feed
+    return feed
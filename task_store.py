@@ -0,0 +1,168 @@
+"""
+Local offline-first task store (SQLite)
+Task rows are kept in a local SQLite file and read and written there. Local
+changes are marked dirty per field and pushed to Supabase later; remote
+changes are pulled by their server-set synced_at. Conflicts are resolved
+per field, last writer (by updated_at) wins.
+"""
+from datetime import datetime
+import json
+import sqlite3
+import threading
+import uuid
+from typing import Dict, Iterable, List, Optional, Tuple
+import pytz
+from task_model import Task, to_epoch
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS tasks (
+    id TEXT PRIMARY KEY,
+    user_id TEXT NOT NULL,
+    record TEXT NOT NULL,
+    updated_ts INTEGER,
+    dirty_fields TEXT NOT NULL DEFAULT '[]',
+    local_only INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS idx_tasks_user_id ON tasks(user_id);
+CREATE TABLE IF NOT EXISTS sync_state (
+    user_id TEXT PRIMARY KEY,
+    pulled_at TEXT
+);
+"""
+
+class TaskStore:
+    """
+    Thread-safe local copy of users' task rows.
+
+    Each row keeps the PostgREST record, the fields changed locally since the
+    last push (dirty_fields) and whether the task was created offline
+    (local_only, pushed as an insert).
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        self._lock = threading.Lock()
+        with self._lock, self._conn:
+            if path != ":memory:":
+                self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.executescript(_SCHEMA)
+
+    def _row(self, task_id: str) -> Optional[sqlite3.Row]:
+        return self._conn.execute("SELECT * FROM tasks WHERE id = ?", (task_id,)).fetchone()
+
+    def _put(self, user_id: str, record: Dict, dirty_fields: Iterable[str], local_only: bool):
+        self._conn.execute(
+            "INSERT OR REPLACE INTO tasks (id, user_id, record, updated_ts, dirty_fields, local_only) "
+            "VALUES (?, ?, ?, ?, ?, ?)",
+            (str(record["id"]), user_id, json.dumps(record), to_epoch(record.get("updated_at"))[0],
+             json.dumps(sorted(dirty_fields)), int(local_only)))
+
+    def has_user(self, user_id: str) -> bool:
+        """True once user_id's tasks have been pulled at least once"""
+        with self._lock:
+            return self._conn.execute("SELECT 1 FROM sync_state WHERE user_id = ?", (user_id,)).fetchone() is not None
+
+    def user_of(self, task_id: str) -> Optional[str]:
+        with self._lock:
+            row = self._row(task_id)
+        return row["user_id"] if row else None
+
+    def tasks(self, user_id: str, status: Optional[str] = None) -> List[Task]:
+        """user_id's tasks, newest first (deleted ones only if status="deleted")"""
+        with self._lock:
+            rows = self._conn.execute("SELECT record FROM tasks WHERE user_id = ?", (user_id,)).fetchall()
+        records = [json.loads(row["record"]) for row in rows]
+        if status:
+            records = [record for record in records if record.get("status") == status]
+        else:
+            records = [record for record in records if record.get("status") != "deleted"]
+        tasks = [Task.from_record(record) for record in records]
+        tasks.sort(key=lambda task: task.created_ts or 0, reverse=True)
+        return tasks
+
+    def create(self, user_id: str, record: Dict) -> Task:
+        """Add a task created locally (pushed as an insert on the next sync)"""
+        now = datetime.now(pytz.UTC).isoformat()
+        record = dict(record, id=str(uuid.uuid4()), updated_at=now)
+        record.setdefault("created_at", now)
+        with self._lock, self._conn:
+            self._put(user_id, record, record.keys(), local_only=True)
+        return Task.from_record(record)
+
+    def update(self, task_id: str, updates: Dict) -> Optional[Task]:
+        """Apply updates locally and mark the fields dirty; None if the task isn't stored"""
+        with self._lock, self._conn:
+            row = self._row(task_id)
+            if row is None:
+                return None
+            record = dict(json.loads(row["record"]), **updates)
+            if "updated_at" not in updates:
+                record["updated_at"] = datetime.now(pytz.UTC).isoformat()
+            dirty = set(json.loads(row["dirty_fields"])) | set(updates)
+            self._put(row["user_id"], record, dirty, bool(row["local_only"]))
+        return Task.from_record(record)
+
+    def merge_remote(self, user_id: str, records: List[Dict]):
+        """
+        Merge rows pulled from Supabase.
+
+        Clean local rows are replaced. For dirty rows each dirty field keeps the
+        local value unless the remote row was updated later, in which case the
+        remote value wins and the field is no longer dirty.
+        """
+        with self._lock, self._conn:
+            for remote in records:
+                row = self._row(str(remote["id"]))
+                if row is None or row["dirty_fields"] == "[]":
+                    self._put(user_id, remote, (), local_only=False)
+                    continue
+                local = json.loads(row["record"])
+                remote_ts = to_epoch(remote.get("updated_at"))[0] or 0
+                local_newer = (row["updated_ts"] or 0) >= remote_ts
+                dirty = {field for field in json.loads(row["dirty_fields"]) if local_newer}
+                merged = dict(remote)
+                for field in dirty:
+                    merged[field] = local.get(field)
+                if dirty:
+                    merged["updated_at"] = local.get("updated_at")
+                self._put(user_id, merged, dirty, local_only=False)
+
+    def pending(self, user_id: str) -> List[Tuple[Dict, List[str], bool]]:
+        """(record, dirty fields, local_only) for every row with unpushed changes"""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT record, dirty_fields, local_only FROM tasks WHERE user_id = ? AND dirty_fields != '[]'",
+                (user_id,)).fetchall()
+        return [(json.loads(row["record"]), json.loads(row["dirty_fields"]), bool(row["local_only"])) for row in rows]
+
+    def mark_pushed(self, user_id: str, pushed: Dict, remote: Optional[Dict]):
+        """
+        Clear the dirty fields whose local value is still the pushed one and take
+        the returned remote row for everything else.
+        """
+        with self._lock, self._conn:
+            row = self._row(str(pushed["id"]))
+            if row is None:
+                return
+            local = json.loads(row["record"])
+            dirty = {field for field in json.loads(row["dirty_fields"])
+                     if field not in pushed or local.get(field) != pushed[field]}
+            merged = dict(remote or local)
+            for field in dirty:
+                merged[field] = local.get(field)
+            if dirty:
+                merged["updated_at"] = local.get("updated_at")
+            self._put(user_id, merged, dirty, local_only=False)
+
+    def pulled_at(self, user_id: str) -> Optional[str]:
+        """synced_at of the newest remote row seen for user_id"""
+        with self._lock:
+            row = self._conn.execute("SELECT pulled_at FROM sync_state WHERE user_id = ?", (user_id,)).fetchone()
+        return row["pulled_at"] if row else None
+
+    def set_pulled_at(self, user_id: str, pulled_at: Optional[str]):
+        with self._lock, self._conn:
+            self._conn.execute("INSERT OR REPLACE INTO sync_state (user_id, pulled_at) VALUES (?, ?)",
+                               (user_id, pulled_at))
@@ -0,0 +1,93 @@
+"""
+Recordings from st.audio_input through submit_transcription, with Gemini faked
+The widget returns an UploadedFile of type audio/wav; that type must reach
+decoding, or the clip is neither preprocessed nor segmented. Only transient
+Gemini errors are retried.
+"""
+import io
+import os
+
+os.environ.setdefault("GEMINI_API_KEY", "test")
+
+import httpx
+import numpy as np
+import pytest
+from google.genai import errors
+from pydub import AudioSegment
+from streamlit.runtime.uploaded_file_manager import UploadedFile, UploadedFileRec
+
+import audio_transcription
+from transcription_cache import TranscriptionCache
+
+def recording(seconds: int, frame_rate: int = 48000, channels: int = 2) -> UploadedFile:
+    """Like st.audio_input's result: 4 s tone bursts with 1 s pauses, as a WAV UploadedFile"""
+    t = np.arange(frame_rate * 4) / frame_rate
+    burst = (np.sin(2 * np.pi * 220 * t) * 12000).astype(np.int16)
+    period = np.concatenate([burst, np.zeros(frame_rate, dtype=np.int16)])
+    mono = np.tile(period, seconds // 5 + 1)[:frame_rate * seconds]
+    samples = np.repeat(mono, channels)
+    audio = AudioSegment(samples.tobytes(), frame_rate=frame_rate, sample_width=2, channels=channels)
+    buf = io.BytesIO()
+    audio.export(buf, format="wav")
+    return UploadedFile(UploadedFileRec("rec", "audio.wav", "audio/wav", buf.getvalue()), None)
+
+@pytest.fixture
+def uploads(monkeypatch):
+    """Clips sent to the fake Gemini as (bytes, mime type)"""
+    sent = []
+    monkeypatch.setattr(audio_transcription, "transcription_cache", TranscriptionCache(16))
+    monkeypatch.setattr(audio_transcription, "TRANSCRIPTION_SEGMENT_SECONDS", 60)
+    monkeypatch.setattr(audio_transcription, "transcribe_audio_bytes",
+                        lambda audio_bytes, mime_type: sent.append((audio_bytes, mime_type)) or "words")
+    return sent
+
+def test_wav_recording_is_segmented(uploads):
+    upload = recording(180)
+    assert audio_transcription.submit_transcription(upload.read(), mime_type=upload.type).result()
+    assert len(uploads) >= 2
+
+def test_recording_is_decoded_with_widget_type_and_preprocessed(uploads, monkeypatch):
+    decoded_as = []
+    load_audio = audio_transcription.load_audio
+    monkeypatch.setattr(audio_transcription, "load_audio",
+                        lambda audio_bytes, mime_type: decoded_as.append(mime_type) or load_audio(audio_bytes, mime_type))
+    upload = recording(20)
+    audio_transcription.transcribe_audio_segmented(upload.read(), upload.type, preprocess=True)
+    assert decoded_as == ["audio/wav"]
+    (uploaded, mime_type), = uploads
+    clip = AudioSegment.from_file(io.BytesIO(uploaded), format=mime_type.split("/")[1])
+    assert (clip.channels, clip.frame_rate) == (1, 16000)
+    assert len(uploaded) < upload.size
+
+@pytest.fixture
+def gemini(monkeypatch):
+    """Scripted generate_content: each call raises or returns the next outcome"""
+    outcomes = []
+    calls = []
+
+    def generate_content(model, contents):
+        calls.append(model)
+        outcome = outcomes.pop(0)
+        if isinstance(outcome, Exception):
+            raise outcome
+        return type("Response", (), {"text": outcome})()
+
+    monkeypatch.setattr(audio_transcription.client.models, "generate_content", generate_content)
+    monkeypatch.setattr(audio_transcription.time, "sleep", lambda seconds: None)
+    return outcomes, calls
+
+@pytest.mark.parametrize("code", [400, 401, 403, 429])
+def test_client_errors_are_not_retried(gemini, code):
+    outcomes, calls = gemini
+    outcomes.append(errors.ClientError(code, {"error": {"message": "no", "status": "X"}}))
+    with pytest.raises(Exception, match=str(code)):
+        audio_transcription.transcribe_audio_bytes(b"audio", "audio/wav")
+    assert len(calls) == 1
+
+@pytest.mark.parametrize("error", [errors.ServerError(503, {"error": {"message": "busy"}}),
+                                   httpx.ReadTimeout("slow"), httpx.ConnectError("down")])
+def test_transient_errors_are_retried(gemini, error):
+    outcomes, calls = gemini
+    outcomes.extend([error, "words"])
+    assert audio_transcription.transcribe_audio_bytes(b"audio", "audio/wav") == "words"
+    assert len(calls) == 2
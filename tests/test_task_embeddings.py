@@ -0,0 +1,99 @@
+"""
+Semantic task index with a fake embedding backend (offline)
+FakeEmbedder maps each known word to its own axis, so similarities are exact
+and every embedding call is counted.
+"""
+import os
+
+os.environ.setdefault("GEMINI_API_KEY", "test")
+
+import threading
+
+import numpy as np
+import pytest
+
+from task_cache import TaskCache
+from task_embeddings import EmbeddingCache, EmbeddingIndex
+from task_model import Task
+
+WORDS = ["slides", "deck", "invoice", "milk", "trip", "mom"]
+
+class FakeEmbedder:
+    name = "fake"
+    dimensions = len(WORDS)
+
+    def __init__(self):
+        self.calls = []
+        self.gate = threading.Event()
+        self.gate.set()
+
+    def embed(self, texts):
+        self.gate.wait()
+        self.calls.append(list(texts))
+        vectors = np.zeros((len(texts), self.dimensions), dtype=np.float32)
+        for row, text in enumerate(texts):
+            for word in text.lower().split():
+                if word in WORDS:
+                    vectors[row, WORDS.index(word)] = 1.0
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        return vectors / np.where(norms == 0, 1.0, norms)
+
+def task(task_id, title, status="pending"):
+    return Task.from_record({"id": task_id, "title": title, "status": status})
+
+@pytest.fixture
+def embedder():
+    return FakeEmbedder()
+
+@pytest.fixture
+def index(embedder):
+    return EmbeddingIndex(embedder, [task("1", "slides deck"), task("2", "pay invoice"), task("3", "buy milk")],
+                          EmbeddingCache())
+
+def test_top_k_orders_by_similarity(index):
+    ranked = index.top_k("deck", 3)
+    assert [task_id for task_id, _ in ranked][:1] == ["1"]
+    assert ranked[0][1] == pytest.approx(1 / np.sqrt(2))
+    assert index.match("invoice") == "2"
+    assert index.match("trip") is None
+
+def test_add_update_remove(index):
+    index.add(task("4", "trip mom"))
+    assert index.match("mom trip") == "4"
+    index.add(task("4", "milk"))  # Title changed
+    assert index.top_k("trip mom", 1)[0][1] == 0.0
+    index.remove("3")
+    index.remove("4")
+    assert {task_id for task_id, _ in index.top_k("milk", 5)} == {"1", "2"}
+    assert len(index) == 2
+
+def test_adding_never_embeds(index, embedder):
+    for n in range(100):
+        index.add(task(str(n), f"invoice {n}"))
+    assert embedder.calls == []
+    index.top_k("invoice", 1)
+    assert len(embedder.calls) == 2  # One batch of titles, then the reference
+
+def test_task_cache_upsert_doesnt_embed(embedder, monkeypatch):
+    monkeypatch.setattr("task_cache.EmbeddingIndex",
+                        lambda tasks: EmbeddingIndex(embedder, tasks, EmbeddingCache()))
+    cache = TaskCache("u1", [task("1", "slides deck"), task("2", "pay invoice")])
+    assert cache.resolve_reference("the deck") == "1"
+    calls = len(embedder.calls)
+    cache.upsert(task("5", "trip mom"))
+    cache.upsert(task("1", "slides deck", status="completed"))
+    assert len(embedder.calls) == calls
+    assert cache.semantic_index().match("mom trip") == "5"
+    assert cache.semantic_index().match("deck") is None
+
+def test_reference_vectors_are_not_cached(embedder):
+    cache = EmbeddingCache()
+    index = EmbeddingIndex(embedder, [task("1", "slides deck")], cache)
+    index.top_k("the invoice for mom", 1)
+    assert len(cache) == 1
+
+def test_slow_backend_times_out_then_serves(index, embedder):
+    embedder.gate.clear()
+    assert index.top_k("deck", 1, timeout=0.05) == []
+    embedder.gate.set()
+    assert index.top_k("deck", 1, timeout=5)[0][0] == "1"
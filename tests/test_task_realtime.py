@@ -0,0 +1,79 @@
+"""
+Realtime task changes between two sessions of the same user
+Each session is its own session_state; both share this process's in-memory
+broker, as two tabs on one server do.
+"""
+import os
+
+os.environ.setdefault("GEMINI_API_KEY", "test")
+os.environ["TASK_REALTIME_BACKEND"] = "memory"
+
+import pytest
+import streamlit as st
+
+import database
+from task_model import Task
+from task_realtime import apply_task_change, task_change
+
+ROW = {"id": "t1", "user_id": "u1", "title": "Buy milk", "status": "pending", "priority": "medium",
+       "created_at": "2026-01-01T00:00:00+00:00", "updated_at": "2026-01-01T00:00:00+00:00"}
+
+@pytest.fixture
+def sessions(monkeypatch):
+    """Two session states; use(session) makes one current, like Streamlit does per script run"""
+    monkeypatch.setattr(database, "get_tasks", lambda user_id, *args, **kwargs: [Task.from_record(ROW)])
+    first, second = {}, {}
+
+    def use(session):
+        monkeypatch.setattr(st, "session_state", session)
+
+    for session in (first, second):
+        use(session)
+        database.take_task_changes("u1")  # Full run: subscribe, fetch, render
+    yield first, second, use
+    for session in (first, second):
+        session["task_feed"].close()
+
+def test_change_reaches_other_session(sessions):
+    first, second, use = sessions
+    use(first)
+    database.publish_task_change("u1", "UPDATE", dict(ROW, title="Buy oat milk",
+                                                      updated_at="2026-01-01T00:01:00+00:00"))
+    use(second)
+    assert database.get_task_cache("u1").get("t1").title == "Buy oat milk"
+
+def test_delete_removes_task_from_other_session(sessions):
+    first, second, use = sessions
+    use(first)
+    database.publish_task_change("u1", "UPDATE", dict(ROW, status="deleted"))
+    use(second)
+    assert database.get_task_cache("u1").get("t1") is None
+
+def test_echo_of_own_write_is_skipped(sessions):
+    first, second, use = sessions
+    cache = first["task_cache"]
+    echo = task_change("UPDATE", dict(ROW, updated_at="2026-01-01T00:05:00+00:00"))
+    assert not apply_task_change(cache, echo)
+
+def test_fragment_sees_changes_applied_by_other_cache_reads(sessions):
+    first, second, use = sessions
+    use(first)
+    database.publish_task_change("u1", "UPDATE", dict(ROW, title="Buy oat milk",
+                                                      updated_at="2026-01-01T00:01:00+00:00"))
+
+    use(second)
+    # A row fragment reads the cache first and so applies the queued change ...
+    assert database.get_task_cache("u1").get("t1").title == "Buy oat milk"
+    # ... and the task_changes fragment must still rerun the app for it, once
+    assert database.take_task_changes("u1") == 1
+    assert database.take_task_changes("u1") == 0
+
+def test_full_run_absorbs_changes(sessions):
+    first, second, use = sessions
+    use(first)
+    database.publish_task_change("u1", "UPDATE", dict(ROW, title="Buy bread",
+                                                      updated_at="2026-01-01T00:02:00+00:00"))
+    use(second)
+    database.take_task_changes("u1")  # The full run renders it
+    assert database.take_task_changes("u1") == 0
+    assert second["task_cache"].get("t1").title == "Buy bread"
@@ -0,0 +1,53 @@
+"""
+Shared page theme
+The CSS and theme JS live in static/ and are served by Streamlit static serving
+(cached by the browser); every page only sends a short loader script.
+"""
+from functools import lru_cache
+import hashlib
+import os
+import streamlit as st
+
+STATIC_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "static")
+# Relative URL Streamlit serves STATIC_DIR at when server.enableStaticServing is on
+STATIC_URL = "app/static"
+
+@lru_cache(maxsize=None)
+def asset_version(filename: str) -> str:
+    """Short content hash of a static file, so browsers refetch it only when it changes"""
+    with open(os.path.join(STATIC_DIR, filename), "rb") as f:
+        return hashlib.blake2b(f.read(), digest_size=4).hexdigest()
+
+def static_url(filename: str) -> str:
+    """Versioned URL of a file in static/"""
+    return f"{STATIC_URL}/{filename}?v={asset_version(filename)}"
+
+# Streamlit serves static .css/.js as text/plain with nosniff, so the files can't be
+# used as <link>/<script src>; the loader fetches them (HTTP-cached) and inlines them
+# once per browser tab - page switches keep the same document.
+_LOADER = """<script>
+(function() {
+    if (window.skkadooshTheme) return;
+    window.skkadooshTheme = true;
+    fetch("%(css)s").then(r => r.text()).then(css => {
+        const style = document.createElement("style");
+        style.id = "skkadoosh-theme";
+        style.textContent = css;
+        document.head.appendChild(style);
+    });
+    fetch("%(js)s").then(r => r.text()).then(js => {
+        const script = document.createElement("script");
+        script.textContent = js;
+        document.head.appendChild(script);
+    });
+})();
+</script>"""
+
+@lru_cache(maxsize=None)
+def theme_tag() -> str:
+    """The loader script that adds static/theme.css and static/theme.js to the page once"""
+    return _LOADER % {"css": static_url("theme.css"), "js": static_url("theme.js")}
+
+def apply_theme():
+    """Load the shared theme on the current page (call right after st.set_page_config)"""
+    st.html(theme_tag(), unsafe_allow_javascript=True)
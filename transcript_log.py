@@ -0,0 +1,154 @@
+"""
+Write-behind transcript log
+Transcripts are queued in process and inserted by a background thread in
+multi-row batches, so no script run waits on transcript persistence. Rows that
+can't be inserted are spilled to a JSONL file and retried with the user's next
+batch.
+"""
+import atexit
+import json
+import os
+import queue
+import tempfile
+import threading
+import time
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+import pytz
+import streamlit as st
+from config import TRANSCRIPT_BATCH_SIZE, TRANSCRIPT_FLUSH_SECONDS, TRANSCRIPT_SPILL_PATH
+from database import insert_transcripts
+
+class TranscriptWriter:
+    """
+    Queue of transcript rows flushed by one daemon thread.
+
+    A batch is written when it reaches batch_size rows, flush_seconds after its
+    first row, or on flush(). Rows are inserted per user with that user's
+    latest access token (RLS ties each row to the token's user). Failed rows are
+    kept for a retry, and in the spill file if spill_path is set (created
+    owner-only); access tokens are never written to disk.
+    """
+
+    def __init__(self, batch_size: int = 20, flush_seconds: float = 5.0, spill_path: Optional[str] = None):
+        self.batch_size = batch_size
+        self.flush_seconds = flush_seconds
+        self.spill_path = spill_path
+        self._queue: queue.Queue = queue.Queue()
+        self._spilled: Dict[str, List[Dict]] = {}  # user id -> rows waiting for a retry
+        self._thread: Optional[threading.Thread] = None
+        self._start_lock = threading.Lock()
+        if spill_path:
+            self._load_spill()
+
+    def log(self, user_id: str, transcript_text: str, access_token: Optional[str]):
+        """Queue a transcript row; returns immediately"""
+        row = {"transcript_text": transcript_text, "created_at": datetime.now(pytz.UTC).isoformat()}
+        self._ensure_started()
+        self._queue.put((user_id, access_token, row))
+
+    def flush(self, timeout: float = 10.0) -> bool:
+        """Write everything queued so far; False if that didn't finish within timeout"""
+        if self._thread is None:
+            return True
+        done = threading.Event()
+        self._queue.put(done)
+        return done.wait(timeout)
+
+    def pending_spill(self) -> int:
+        """Rows waiting in the spill file"""
+        return sum(len(rows) for rows in self._spilled.values())
+
+    def _ensure_started(self):
+        with self._start_lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="transcript-writer", daemon=True)
+                self._thread.start()
+
+    def _run(self):
+        batch: List[Tuple[str, Optional[str], Dict]] = []
+        deadline = 0.0
+        while True:
+            timeout = max(0.0, deadline - time.monotonic()) if batch else None
+            try:
+                item = self._queue.get(timeout=timeout)
+            except queue.Empty:
+                item = None
+            if isinstance(item, threading.Event):
+                self._write(batch)
+                batch = []
+                item.set()
+                continue
+            if item is not None:
+                if not batch:
+                    deadline = time.monotonic() + self.flush_seconds
+                batch.append(item)
+            if batch and (len(batch) >= self.batch_size or time.monotonic() >= deadline):
+                self._write(batch)
+                batch = []
+
+    def _write(self, batch: List[Tuple[str, Optional[str], Dict]]):
+        """Insert batch grouped by user, along with any spilled rows of those users"""
+        rows_by_user: Dict[str, List[Dict]] = {}
+        tokens: Dict[str, Optional[str]] = {}
+        for user_id, access_token, row in batch:
+            rows_by_user.setdefault(user_id, []).append(row)
+            if access_token:
+                tokens[user_id] = access_token
+        spill_changed = False
+        for user_id, rows in rows_by_user.items():
+            spilled = self._spilled.pop(user_id, [])
+            spill_changed = spill_changed or bool(spilled)
+            try:
+                insert_transcripts(spilled + rows, tokens.get(user_id))
+            except Exception:
+                self._spilled[user_id] = spilled + rows
+                spill_changed = True
+        if spill_changed and self.spill_path:
+            self._save_spill()
+
+    def _load_spill(self):
+        """Read spilled rows, ignoring a missing file and unreadable lines"""
+        try:
+            with open(self.spill_path, "r", encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                        self._spilled.setdefault(entry["user_id"], []).append(
+                            {"transcript_text": entry["transcript_text"], "created_at": entry["created_at"]})
+                    except (ValueError, KeyError, TypeError):
+                        continue
+        except OSError:
+            return
+
+    def _save_spill(self):
+        """Rewrite the spill file with the rows still waiting (removed when empty)"""
+        try:
+            if not self._spilled:
+                if os.path.exists(self.spill_path):
+                    os.remove(self.spill_path)
+                return
+            directory = os.path.dirname(os.path.abspath(self.spill_path))
+            with tempfile.NamedTemporaryFile("w", dir=directory, delete=False, suffix=".jsonl",
+                                             encoding="utf-8") as tmp_file:
+                for user_id, rows in self._spilled.items():
+                    for row in rows:
+                        tmp_file.write(json.dumps({"user_id": user_id, **row}) + "\n")
+                tmp_path = tmp_file.name
+            os.replace(tmp_path, self.spill_path)
+        except OSError:
+            pass  # Rows stay in memory and are retried with the next batch
+
+# Shared by all sessions in this process
+transcript_writer = TranscriptWriter(TRANSCRIPT_BATCH_SIZE, TRANSCRIPT_FLUSH_SECONDS, TRANSCRIPT_SPILL_PATH or None)
+atexit.register(transcript_writer.flush)
+
+def log_transcript(user_id: str, transcript_text: str, access_token: Optional[str] = None):
+    """
+    Queue a transcript for the write-behind log.
+    
+    Uses the session's access token unless one is passed (background threads must pass it).
+    """
+    if access_token is None:
+        access_token = st.session_state.get("sb_access_token")
+    transcript_writer.log(user_id, transcript_text, access_token)
@@ -0,0 +1,93 @@
+"""
+Transcription cache keyed by audio content hash
+Repeated or re-submitted recordings are answered without calling Gemini.
+"""
+from collections import OrderedDict
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import time
+from typing import Optional
+
+def audio_content_hash(audio_bytes: bytes) -> str:
+    """Fast content hash of audio bytes (BLAKE2b, 128-bit)"""
+    return hashlib.blake2b(audio_bytes, digest_size=16).hexdigest()
+
+class TranscriptionCache:
+    """
+    Thread-safe LRU cache of transcripts keyed by audio content hash.
+
+    If path is set, entries are persisted to a JSON file so they survive
+    app restarts. The file is rewritten atomically, at most every save_seconds
+    after inserts (and by flush()), not on every insert.
+    """
+
+    def __init__(self, max_entries: int = 256, path: Optional[str] = None, save_seconds: float = 30.0):
+        self.max_entries = max_entries
+        self.path = path
+        self.save_seconds = save_seconds
+        self._entries: "OrderedDict[str, str]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._save_lock = threading.Lock()
+        self._dirty = False
+        self._saved_at = time.monotonic()
+        if path:
+            self._load()
+
+    def _load(self):
+        """Load persisted entries, ignoring a missing or corrupt file"""
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return
+        for key, transcript in list(data.items())[-self.max_entries:]:
+            self._entries[key] = transcript
+
+    def flush(self):
+        """Write entries to disk if any were added since the last write"""
+        if not self.path:
+            return
+        with self._save_lock:
+            with self._lock:
+                if not self._dirty:
+                    return
+                entries = dict(self._entries)
+                self._dirty = False
+                self._saved_at = time.monotonic()
+            directory = os.path.dirname(os.path.abspath(self.path))
+            try:
+                with tempfile.NamedTemporaryFile("w", encoding="utf-8", dir=directory,
+                                                 delete=False, suffix=".tmp") as tmp_file:
+                    json.dump(entries, tmp_file)
+                    tmp_path = tmp_file.name
+                os.replace(tmp_path, self.path)
+            except OSError:
+                with self._lock:
+                    self._dirty = True  # Persistence is best-effort; retried on the next save
+
+    def get(self, audio_hash: str) -> Optional[str]:
+        """Get a cached transcript, marking it as recently used"""
+        with self._lock:
+            transcript = self._entries.get(audio_hash)
+            if transcript is not None:
+                self._entries.move_to_end(audio_hash)
+            return transcript
+
+    def set(self, audio_hash: str, transcript: str):
+        """Cache a transcript, evicting the least recently used entries"""
+        with self._lock:
+            self._entries[audio_hash] = transcript
+            self._entries.move_to_end(audio_hash)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+            self._dirty = True
+            due = time.monotonic() - self._saved_at >= self.save_seconds
+        if due:
+            self.flush()
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._entries)
@@ -1,97 +1,139 @@
 """
 Utility functions
 """
-from datetime import datetime, timedelta
-import pytz
-from typing import List, Dict
+from dataclasses import dataclass
+from datetime import date, datetime, time, timedelta
+from functools import lru_cache
+import time as _time
+from typing import List, Dict, Optional
+from datetime_normalization import get_timezone
+from task_model import Task, Status
+
+@dataclass(frozen=True, slots=True)
+class ViewBoundaries:
+    """Day/week boundaries for one local date in one timezone (aware datetimes + epoch seconds)"""
+    timezone: str
+    date: date
+    today_start: datetime
+    tomorrow_start: datetime
+    week_end: datetime        # start of this week's Sunday
+    after_week_end: datetime  # start of the Monday after week_end
+    today_start_ts: int
+    tomorrow_start_ts: int
+    after_week_end_ts: int
+
+    @property
+    def week_end_date(self) -> date:
+        return self.week_end.date()
+
+def _local_day_start(tz, day: date) -> datetime:
+    """First instant of day in tz, also on days where midnight is skipped or repeated by DST"""
+    start = tz.localize(datetime.combine(day, time.min), is_dst=True)
+    if tz.normalize(start).date() != day:
+        # Midnight doesn't exist (spring forward at 00:00): the day starts at the transition
+        start = tz.normalize(tz.localize(datetime.combine(day, time.min), is_dst=False))
+    return start
+
+@lru_cache(maxsize=4096)
+def _boundaries_for_day(timezone: str, day: date) -> ViewBoundaries:
+    """Compute the boundaries of a local date; cached per (timezone, date)"""
+    tz = get_timezone(timezone)
+    days_until_sunday = (6 - day.weekday()) % 7 or 7
+    today_start = _local_day_start(tz, day)
+    tomorrow_start = _local_day_start(tz, day + timedelta(days=1))
+    week_end = _local_day_start(tz, day + timedelta(days=days_until_sunday))
+    after_week_end = _local_day_start(tz, day + timedelta(days=days_until_sunday + 1))
+    return ViewBoundaries(
+        timezone=timezone,
+        date=day,
+        today_start=today_start,
+        tomorrow_start=tomorrow_start,
+        week_end=week_end,
+        after_week_end=after_week_end,
+        today_start_ts=int(today_start.timestamp()),
+        tomorrow_start_ts=int(tomorrow_start.timestamp()),
+        after_week_end_ts=int(after_week_end.timestamp()),
+    )
+
+# Boundaries of the current local day per timezone; replaced once now passes tomorrow_start
+_current_boundaries: Dict[str, ViewBoundaries] = {}
+
+def get_view_boundaries(timezone: str = "UTC", now: Optional[datetime] = None) -> ViewBoundaries:
+    """
+    Day/week boundaries for the current local date in timezone.
+
+    Cached per (timezone, local date): the common case is a range check against
+    the cached day, and the entry rolls over at local midnight (DST-aware).
+    """
+    now_ts = now.timestamp() if now else _time.time()
+    cached = _current_boundaries.get(timezone)
+    if cached and cached.today_start_ts <= now_ts < cached.tomorrow_start_ts:
+        return cached
+    day = datetime.fromtimestamp(now_ts, get_timezone(timezone)).date()
+    boundaries = _boundaries_for_day(timezone, day)
+    if now is None:
+        _current_boundaries[timezone] = boundaries
+    return boundaries
 
 def get_today_start(timezone: str = "UTC") -> datetime:
     """Get start of today in specified timezone"""
-    tz = pytz.timezone(timezone)
-    now = datetime.now(tz)
-    return now.replace(hour=0, minute=0, second=0, microsecond=0)
+    return get_view_boundaries(timezone).today_start
 
 def get_week_end(timezone: str = "UTC") -> datetime:
     """Get end of this week (Sunday) in specified timezone"""
-    today = get_today_start(timezone)
-    days_until_sunday = (6 - today.weekday()) % 7
-    if days_until_sunday == 0:
-        days_until_sunday = 7
-    return today + timedelta(days=days_until_sunday)
+    return get_view_boundaries(timezone).week_end
 
-def filter_tasks_by_view(tasks: List[Dict], view: str, user_timezone: str = "UTC") -> List[Dict]:
+def filter_tasks_by_view(tasks: List[Task], view: str, user_timezone: str = "UTC") -> List[Task]:
     """Filter tasks based on view (today, week, upcoming)"""
-    tz = pytz.timezone(user_timezone)
-    now = datetime.now(tz)
-    today_start = get_today_start(user_timezone)
-    week_end = get_week_end(user_timezone)
+    boundaries = get_view_boundaries(user_timezone)
+    today_date = boundaries.date
+    week_end_date = boundaries.week_end_date
     
     filtered = []
     
     for task in tasks:
-        if task.get("status") in ["completed", "deleted"]:
+        if not task.is_open:
             continue
         
-        due_date_str = task.get("due_date")
-        if not due_date_str:
+        # Due dates are parsed once at fetch time; the timezone conversion is cached on the task
+        due_date = task.due_local(user_timezone)
+        if due_date is None:
+            if task.due_invalid:
+                # If parsing fails, include in "today" view
+                if view == "today":
+                    filtered.append(task)
             # Tasks without due dates go to "today" or "upcoming" based on view
-            if view == "today" or view == "upcoming":
+            elif view == "today" or view == "upcoming":
                 filtered.append(task)
             continue
         
-        try:
-            # Parse due date
-            if 'T' in due_date_str:
-                due_date = datetime.fromisoformat(due_date_str.replace('Z', '+00:00'))
-            else:
-                due_date = datetime.fromisoformat(due_date_str)
-                due_date = tz.localize(due_date)
-            
-            # Convert to user timezone if needed
-            if due_date.tzinfo is None:
-                due_date = tz.localize(due_date)
-            else:
-                due_date = due_date.astimezone(tz)
-            
-            due_date_only = due_date.date()
-            today_date = today_start.date()
-            week_end_date = week_end.date()
-            
-            if view == "today":
-                if due_date_only <= today_date:
-                    filtered.append(task)
-            elif view == "week":
-                if due_date_only <= week_end_date:
-                    filtered.append(task)
-            elif view == "upcoming":
-                if due_date_only > week_end_date:
-                    filtered.append(task)
-                    
-        except Exception as e:
-            # If parsing fails, include in "today" view
-            if view == "today":
+        due_date_only = due_date.date()
+        
+        if view == "today":
+            if due_date_only <= today_date:
+                filtered.append(task)
+        elif view == "week":
+            if due_date_only <= week_end_date:
+                filtered.append(task)
+        elif view == "upcoming":
+            if due_date_only > week_end_date:
                 filtered.append(task)
     
     return filtered
 
-def group_tasks_by_date(tasks: List[Dict]) -> Dict[str, List[Dict]]:
+def group_tasks_by_date(tasks: List[Task]) -> Dict[str, List[Task]]:
     """Group tasks by completion date"""
     grouped = {}
     
     for task in tasks:
-        if task.get("status") != "completed":
+        if task.status != Status.COMPLETED:
             continue
         
-        completed_at = task.get("completed_at")
-        if not completed_at:
+        if task.completed_ts is None:
             date_key = "No date"
         else:
-            try:
-                dt = datetime.fromisoformat(completed_at.replace('Z', '+00:00'))
-                # Use UTC for grouping completed tasks (or could use user timezone)
-                date_key = dt.strftime("%B %d, %Y")
-            except:
-                date_key = "Unknown date"
+            # Use UTC for grouping completed tasks (or could use user timezone)
+            date_key = task.completed_local("UTC").strftime("%B %d, %Y")
         
         if date_key not in grouped:
             grouped[date_key] = []